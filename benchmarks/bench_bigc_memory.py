@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""bytes per tracked character, measured with tracemalloc
+
+    python benchmarks/bench_bigc_memory.py [--characters 2000] [--history 100]
+
+``legacy`` rebuilds the former layout, a RefreshMatrix of weak methods in each
+instance dict; ``slots`` is BigC keeping all history, ``slots+trim`` keeps none.
+Each character has its user character loaded with ``--history`` entries a side.
+"""
+import argparse
+import gc
+import tracemalloc
+from collections import Counter
+
+from bgmtinygrail.tinygrail import bigc
+from bgmtinygrail.tinygrail.bigc import BigC
+from bgmtinygrail.tinygrail.model import TUserCharacter
+from bgmtinygrail.tinygrail.player import Player
+from bgmtinygrail.tinygrail.refresher_matrix import RefreshMatrix
+
+
+def user_character_data(history):
+    entry = {"Amount": 1, "Price": 10.0, "Id": 1, "CharacterId": 1, "TradeTime": "2020-01-01T00:00:00", "Type": 0}
+    return {"Bids": [{"Id": 1, "Price": 8, "Amount": 10, "Type": 0}],
+            "Asks": [{"Id": 2, "Price": 20, "Amount": 3, "Type": 0}],
+            "AskHistory": [entry] * history, "BidHistory": [entry] * history, "Amount": 5}
+
+
+class LegacyBigC:
+    """the per instance layout BigC had before"""
+
+    def __init__(self, player, character):
+        self.player = player
+        self.character = character
+        self.optimistic = False
+        self.fetches = Counter()
+        self.refresh_matrix = RefreshMatrix(list(BigC.refresh_layout.tokens))
+        self.refresh_matrix.batch_register([(token, getattr(self, name)) for token, name in
+                                            zip(BigC.refresh_layout.tokens, BigC.refresh_layout._refresher)])
+        for token, interval in BigC.refresh_layout.interval.items():
+            self.refresh_matrix.interval[token] = interval
+        self._initial_price = None
+        self._depth = None
+        self._user_character = bigc.user_character(player, character)
+        self.refresh_matrix.mark_refreshed('my_asks', 'my_bids', 'amount', 'user_character')
+
+    def __getattr__(self, name):
+        # the refreshers, only registered here
+        if name in BigC.refresh_layout._refresher:
+            return self._noop
+        raise AttributeError(name)
+
+    def _noop(self):
+        pass
+
+
+def measure(factory, characters):
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    kept = [factory(cid) for cid in range(characters)]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    size = sum(stat.size_diff for stat in after.compare_to(before, 'filename'))
+    del kept
+    return size / characters
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--characters', type=int, default=2000)
+    parser.add_argument('--history', type=int, default=100)
+    args = parser.parse_args()
+
+    data = user_character_data(args.history)
+    bigc.user_character = lambda player, cid: TUserCharacter.parse_obj(data)
+    player = Player('')
+
+    def compact(history):
+        def factory(cid):
+            big_c = BigC(player, cid, history=history)
+            big_c.refreshes('user_character')
+            return big_c
+        return factory
+
+    for name, factory in [('legacy', lambda cid: LegacyBigC(player, cid)),
+                          ('slots', compact(None)),
+                          ('slots+trim', compact(0))]:
+        print(f"{name:<10} {measure(factory, args.characters):10.0f} bytes/character")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""StrategicalTrader.tick against a recorded tinygrail
+
+    python benchmarks/bench_offline_tick.py record ACCOUNT CASSETTE.jsonl.gz CID [CID ...]
+    python benchmarks/bench_offline_tick.py replay CASSETTE.jsonl.gz [CID ...] [--rounds 20]
+
+``record`` ticks every given character once against the real server, as the
+daemon would, and keeps the traffic. ``replay`` ticks them again and again
+against :class:`OfflineTinygrail`, without any network; characters default to
+every ``chara/user/{cid}`` in the cassette. Strategies are kept in
+``tinygrail.db`` of the working directory like everywhere else, so run it
+somewhere disposable.
+"""
+import argparse
+import re
+import statistics
+import time
+
+from bgmtinygrail.tinygrail.cassette import Cassette, OfflineTinygrail
+from bgmtinygrail.tinygrail.player import Player
+
+
+def record(args):
+    from bgmtinygrail.db import accounts as db_accounts
+    from bgmtinygrail.model_link.accounts import translate
+    from bgmtinygrail.trader import StrategicalTrader
+
+    _, _, player = translate(db_accounts.retrieve(args.account))
+    player.cassette = cassette = Cassette()
+    trader = StrategicalTrader(player)
+    for cid in args.cids:
+        trader.tick(cid)
+    cassette.save(args.cassette)
+    print(f"{len(cassette.interactions)} interactions recorded into {args.cassette}")
+
+
+def replay(args):
+    from bgmtinygrail.trader import StrategicalTrader
+
+    offline = OfflineTinygrail.load(args.cassette)
+    cids = args.cids or sorted({int(m[1]) for i in offline.interactions
+                                if (m := re.fullmatch(r"chara/user/(\d+)", i.path))})
+    trader = StrategicalTrader(Player('', cassette=offline))
+    latencies = []
+    begin = time.perf_counter()
+    for _ in range(args.rounds):
+        for cid in cids:
+            start = time.perf_counter()
+            trader.tick(cid)
+            latencies.append(time.perf_counter() - start)
+    elapsed = time.perf_counter() - begin
+    latencies.sort()
+    print(f"{len(latencies)} ticks over {len(cids)} characters in {elapsed:.2f} s, "
+          f"{len(latencies) / elapsed:.1f} ticks/s")
+    print(f"latency ms: median {statistics.median(latencies) * 1000:.2f} | "
+          f"p90 {latencies[int(len(latencies) * 0.9)] * 1000:.2f} | max {latencies[-1] * 1000:.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    sub = parser.add_subparsers(dest='mode', required=True)
+    p = sub.add_parser('record')
+    p.add_argument('account')
+    p.add_argument('cassette')
+    p.add_argument('cids', nargs='+', type=int)
+    p.set_defaults(run=record)
+    p = sub.add_parser('replay')
+    p.add_argument('cassette')
+    p.add_argument('cids', nargs='*', type=int)
+    p.add_argument('--rounds', type=int, default=20)
+    p.set_defaults(run=replay)
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Player._process_response: validated vs trusted fast path
+
+    python benchmarks/bench_process_response.py [--items 3000] [--repeat 5] [RECORDED.json ...]
+
+Recorded payloads are raw response bodies of ``chara/user/chara/0/1/{length}``
+(parsed as RHolding) or ``chara/list`` (parsed as RCharacterList), guessed from
+their shape. Without any, payloads of the same shape are synthesized.
+"""
+import argparse
+import json
+import random
+import timeit
+
+import requests
+
+from bgmtinygrail.tinygrail.model import RHolding, RCharacterList
+from bgmtinygrail.tinygrail.player import Player, orjson
+
+
+def synthesize_character(cid):
+    return {
+        "CharacterId": cid, "Change": random.randint(-10, 10), "UserTotal": random.randint(1, 10000),
+        "UserAmount": random.randint(0, 100), "AirDate": "2019-08-08T00:00:00", "Asks": random.randint(0, 50),
+        "Bids": random.randint(0, 50), "Bonus": 0, "Current": round(random.uniform(1, 100), 2),
+        "Fluctuation": random.uniform(-1, 1), "Icon": f"https://lain.bgm.tv/pic/crt/g/{cid}.jpg", "Id": cid,
+        "LastDeal": "2020-07-01T12:34:56.789+08:00", "LastModifier": 0, "LastOrder": "2020-07-01T12:34:56+08:00",
+        "Level": random.randint(1, 10), "MarketValue": random.uniform(1e4, 1e7), "Name": f"角色{cid}",
+        "Price": round(random.uniform(1, 100), 2), "Rate": random.uniform(0.1, 10),
+        "Sacrifices": random.randint(0, 5000), "State": random.randint(0, 5000),
+        "SubjectId": random.randint(1, 300000), "SubjectName": f"作品{cid}", "Total": random.randint(1e4, 1e6),
+        "Type": 0,
+    }
+
+
+def synthesize(items):
+    characters = [synthesize_character(cid) for cid in range(1, items + 1)]
+    return [
+        ('RHolding', RHolding, {"State": 0, "Value": {"TotalItems": items, "Items": characters}}),
+        ('RCharacterList', RCharacterList, {"State": 0, "Value": characters}),
+    ]
+
+
+def load(path):
+    with open(path, 'rb') as fp:
+        data = json.load(fp)
+    if isinstance(data.get('Value'), list):
+        return path, RCharacterList, data
+    return path, RHolding, data
+
+
+def as_response(data):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = json.dumps(data, ensure_ascii=False).encode('utf-8')
+    return response
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('recorded', nargs='*')
+    parser.add_argument('--items', type=int, default=3000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    payloads = [load(path) for path in args.recorded] or synthesize(args.items)
+    player = Player('')
+    print(f"orjson: {'available' if orjson is not None else 'missing, trusted path uses json'}")
+    for name, model, data in payloads:
+        response = as_response(data)
+        assert (player._process_response(response, as_model=model, trusted=True)
+                == player._process_response(response, as_model=model))
+        validated = min(timeit.repeat(lambda: player._process_response(response, as_model=model),
+                                      number=1, repeat=args.repeat))
+        trusted = min(timeit.repeat(lambda: player._process_response(response, as_model=model, trusted=True),
+                                    number=1, repeat=args.repeat))
+        print(f"{name:<16} {len(response.content) / 1024:8.0f} KiB | "
+              f"validated {validated * 1000:8.1f} ms | trusted {trusted * 1000:8.1f} ms | "
+              f"x{validated / trusted:.1f}")
+
+
+if __name__ == '__main__':
+    main()
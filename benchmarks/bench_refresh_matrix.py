@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""RefreshMatrix.refreshes on the BigC token layout: indexed vs the former scanning one
+
+    python benchmarks/bench_refresh_matrix.py [--number 100000]
+
+``fresh`` is the hot path of every BigC property read; ``stale`` invalidates
+and refreshes the tokens ensure_bids/ensure_asks touch after each order.
+"""
+import argparse
+import timeit
+from collections import defaultdict
+from datetime import datetime, timedelta
+from weakref import WeakMethod
+
+from bgmtinygrail.tinygrail.refresher_matrix import RefreshMatrix
+
+TOKENS = ['my_asks', 'my_bids', 'amount', 'user_character', 'ico_or_character', 'ico', 'character', 'my_ico',
+          'charts', 'all_asks', 'all_bids', 'my_auction']
+
+
+class ScanningRefreshMatrix:
+    """the implementation before the index, kept here for comparison"""
+
+    def __init__(self, tokens):
+        self.tokens = set(tokens)
+        self.last_refresh = defaultdict(lambda: None)
+        self.interval = defaultdict(lambda: timedelta(2))
+        self.refresher_pairs = []
+
+    def batch_register(self, batches):
+        for token, func in batches:
+            self.refresher_pairs.append((token, WeakMethod(func)))
+
+    def refreshes(self, *tokens):
+        for token in tokens:
+            last_refresh = self.last_refresh.get(token, None)
+            interval = self.interval.get(token, None)
+            if last_refresh is None or (interval is not None and last_refresh + interval < datetime.now()):
+                refresher = [wfr() for tok, wfr in self.refresher_pairs if tok == token and wfr() is not None][0]
+                refresher()
+                for update_token, weak_func_ref in self.refresher_pairs:
+                    if weak_func_ref() == refresher:
+                        self.last_refresh[update_token] = datetime.now()
+
+    def invalidates(self, *tokens):
+        for token in tokens:
+            self.last_refresh.pop(token, None)
+
+
+class FakeBigC:
+    def __init__(self, matrix_cls):
+        self.refresh_matrix = matrix_cls(TOKENS)
+        self.refresh_matrix.batch_register([
+            ('my_asks', self.user_character), ('my_bids', self.user_character), ('amount', self.user_character),
+            ('user_character', self.user_character), ('ico_or_character', self.character_info),
+            ('ico', self.character_info), ('character', self.character_info), ('my_ico', self.other),
+            ('charts', self.other), ('all_asks', self.depth), ('all_bids', self.depth), ('my_auction', self.other),
+        ])
+        self.refresh_matrix.interval['my_bids'] = timedelta(seconds=2)
+
+    def user_character(self):
+        pass
+
+    def character_info(self):
+        pass
+
+    def depth(self):
+        pass
+
+    def other(self):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--number', type=int, default=100000)
+    args = parser.parse_args()
+
+    for name, matrix_cls in [('scanning', ScanningRefreshMatrix), ('indexed', RefreshMatrix)]:
+        c = FakeBigC(matrix_cls)
+        m = c.refresh_matrix
+        m.refreshes(*TOKENS)
+        fresh = min(timeit.repeat(lambda: m.refreshes('my_bids'), number=args.number, repeat=3))
+
+        def stale():
+            m.invalidates('my_bids', 'all_bids', 'amount')
+            m.refreshes('my_bids', 'all_bids', 'amount')
+
+        stale = min(timeit.repeat(stale, number=args.number // 10, repeat=3))
+        print(f"{name:<9} fresh {fresh / args.number * 1e9:8.0f} ns/call | "
+              f"stale {stale / (args.number // 10) * 1e9:8.0f} ns/call")
+
+
+if __name__ == '__main__':
+    main()
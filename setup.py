@@ -17,7 +17,8 @@ setup(
         'tabulate[widechars]',
         'termcolor',
     ],
-    extras_requires={
+    extras_require={
+        'fast': ['orjson'],
         'tests': ['pytest', 'pytest_mock'],
     },
 )
@@ -17,8 +17,23 @@ def daemon():
 @click.option("--daemon-type", type=click.Choice(['trader']), default='trader')
 @click.option("--trader-type", type=click.Choice(['fundamental', 'graceful', 'strategical']), default='strategical')
 @click.option("--wait-seconds", type=int, default=20)
+@click.option("--min-wait-seconds", type=float, default=None,
+              help="wait while there is trading, --wait-seconds if not given")
+@click.option("--max-wait-seconds", type=float, default=None,
+              help="waits double up to this while nothing happens, --wait-seconds if not given")
 @click.option("--account")
-def start(daemon_type, trader_type, account, wait_seconds):
+@click.option("--accounts", default=None, help="comma separated, traded by this one process")
+@click.option("--all-accounts", is_flag=True, help="trade all accounts in this one process")
+@click.option("--metrics-file", type=click.Path(dir_okay=False), default=None,
+              help="rewritten after every tick, JSON if it ends with .json, Prometheus text otherwise; "
+                   "with several accounts, the account name goes before the extension")
+@click.option("-j", "--workers", type=click.IntRange(min=1), default=1, help="characters ticked at once")
+@click.option("--tick-budget", type=float, default=None,
+              help="seconds a tick starts characters for, most important first; the rest wait for the next tick")
+@click.option("--history-poll-seconds", type=float, default=None,
+              help="poll the history in a thread of its own this often and tick on new fills at once")
+def start(daemon_type, trader_type, account, accounts, all_accounts, wait_seconds, min_wait_seconds, max_wait_seconds,
+          metrics_file, workers, tick_budget, history_poll_seconds):
     if daemon_type == 'trader':
         from ..daemon.trader_daemon import TraderDaemon
         daemon_cls = TraderDaemon
@@ -26,7 +41,15 @@ def start(daemon_type, trader_type, account, wait_seconds):
         print("no such daemon")
         raise click.exceptions.Exit(13)
 
-    _, login, player = translate(db_accounts.retrieve(account))
+    if all_accounts:
+        names = db_accounts.list_all()
+    elif accounts is not None:
+        names = [name.strip() for name in accounts.split(',') if name.strip()]
+    else:
+        names = None
+    if names is not None and (account is not None or not names):
+        print("give either --account, --accounts or --all-accounts")
+        raise click.exceptions.Exit(16)
 
     if trader_type == 'fundamental':
         from ..trader import FundamentalTrader
@@ -41,14 +64,33 @@ def start(daemon_type, trader_type, account, wait_seconds):
         print("no such trader")
         raise click.exceptions.Exit(14)
 
-    d = daemon_cls(player, login, trader_cls=trader_cls)
+    def account_daemon(name, metrics_path, metrics=None):
+        _, login, player = translate(db_accounts.retrieve(name), metrics=metrics)
+        return daemon_cls(player, login, trader_cls=trader_cls, metrics_path=metrics_path, workers=workers,
+                          tick_budget=tick_budget, history_poll_interval=history_poll_seconds)
+
+    if names is None:
+        d = account_daemon(account, metrics_file)
+    else:
+        from ..daemon.multi_account import MultiAccountDaemon
+        from ..tinygrail.metrics import Metrics
+
+        def metrics_path(name):
+            if metrics_file is None:
+                return None
+            root, ext = os.path.splitext(metrics_file)
+            return f"{root}.{name}{ext}"
+
+        # each account counts its own requests, for its own metrics file and tick summaries
+        d = MultiAccountDaemon({name: account_daemon(name, metrics_path(name), Metrics()) for name in names},
+                               tick_budget=tick_budget)
 
     if d.as_systemd_unit:
         logging.config.fileConfig('logging-journald.conf')
     else:
         logging.config.fileConfig('logging.conf')
 
-    d.run_forever(wait_seconds)
+    d.run_forever(wait_seconds, min_wait_seconds=min_wait_seconds, max_wait_seconds=max_wait_seconds)
 
 
 @daemon.group()
@@ -65,12 +107,13 @@ def generate_config():
 @click.option('-A', "--account")
 @click.option("--dynamical-account", 'account',
               flag_value='%i', default=True)
+@click.option("--all-accounts", is_flag=True, help="one unit trading all accounts instead of a template per account")
 @click.option('-o', '--output', type=click.File())
 @click.option('--output-stdout', 'output',
               flag_value='-', default=True)
 @click.option('--output-default', 'output',
               flag_value=str(Path('~/.config/systemd/user/bgmtinygraildaemon@.service').expanduser().resolve()))
-def systemd(working_directory, virtualenv, watchdog_seconds, daemon_type, trader_type, account, output):
+def systemd(working_directory, virtualenv, watchdog_seconds, daemon_type, trader_type, account, all_accounts, output):
     virtualenv = virtualenv or os.environ['VIRTUAL_ENV']
     if virtualenv is None:
         click.echo("Should run with virtualenv", err=True)
@@ -80,7 +123,8 @@ def systemd(working_directory, virtualenv, watchdog_seconds, daemon_type, trader
     print()
     print("[Service]")
     print(f"WorkingDirectory={working_directory or os.getcwd()}")
-    print(f"ExecStart={virtualenv or os.environ['VIRTUAL_ENV']}/bin/bgmtinygrail daemon start --account {account}"
+    accounts = "--all-accounts" if all_accounts else f"--account {account}"
+    print(f"ExecStart={virtualenv or os.environ['VIRTUAL_ENV']}/bin/bgmtinygrail daemon start {accounts}"
           + (f" --daemon-type {daemon_type}" if daemon_type is not None else "")
           + (f" --trader-type {trader_type}" if trader_type is not None else ""))
     print("Restart=always")
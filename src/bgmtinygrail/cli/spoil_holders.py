@@ -1,16 +1,21 @@
 import click
 
 from ._base import TG_PLAYER
-from ..tinygrail.api import spoil_holders as api_spoil_holders
+from ..tinygrail.api import iter_spoil_holders, SPOIL_CONCURRENCY
 from ..tinygrail.model import TMinimalUserCharacter, TAuction
 from ..tinygrail.player import Player
+from ..tinygrail.rate_limit import TokenBucket
 
 
 @click.command()
 @click.argument('player', type=TG_PLAYER)
 @click.argument('cid', type=int)
-def spoil_holders(player: Player, cid: int):
-    holders = api_spoil_holders(player, cid)
+@click.option('-j', '--concurrency', type=int, default=SPOIL_CONCURRENCY)
+@click.option('--rate', type=float, default=None, help="requests per second, on top of the per-host limit")
+def spoil_holders(player: Player, cid: int, concurrency: int, rate: float):
+    if rate is not None:
+        player.rate_limit = TokenBucket(rate, concurrency)
+    holders = iter_spoil_holders(player, cid, concurrency=concurrency)
     auction = None
     for muc, holder in holders:
         if isinstance(muc, TMinimalUserCharacter):
@@ -2,8 +2,11 @@ import json.decoder
 import logging
 import os
 import sys
+import threading
+import time
 import traceback
 from abc import ABC, abstractmethod
+from collections import Counter
 from datetime import date, datetime, timedelta
 from enum import Enum
 from typing import *
@@ -33,26 +36,51 @@ class TooMuchExceptionsError(Exception):
     pass
 
 
+class Cadence:
+    """seconds to wait before the next tick: ``minimum`` while busy, doubling up to ``maximum`` while idle"""
+    __slots__ = ('minimum', 'maximum', 'factor', 'seconds')
+
+    def __init__(self, seconds: float, minimum: float = None, maximum: float = None, *, factor: float = 2.0):
+        self.minimum = seconds if minimum is None else minimum
+        self.maximum = seconds if maximum is None else maximum
+        self.factor = factor
+        self.seconds = min(max(seconds, self.minimum), self.maximum)
+
+    def busy(self):
+        self.seconds = self.minimum
+
+    def idle(self):
+        self.seconds = min(self.seconds * self.factor, self.maximum)
+
+
 class Daemon(ABC):
     player: Player
     login: Login
     error_time: List[datetime]
+    worker_errors: Counter  # thread name -> errors, as safe_run may run in workers
     error_tolerance_period: int
     error_tolerance_count: int
     as_systemd_unit: bool
     last_daily: Optional[date]
     last_hourly: Optional[datetime]
+    cadence: Optional[Cadence]  # set by run_forever, ticks tell it whether they found anything to do
+    watchdog_interval: float  # seconds between watchdog notifications while waiting or working
 
     def __init__(self, player, login, *args, **kwargs):
         self.player = player
         self.login = login
         self.error_time = []
+        self.worker_errors = Counter()
+        self._error_lock = threading.Lock()
         self.error_tolerance_period = 5
         self.error_tolerance_count = 5
         self.as_systemd_unit = ('INVOCATION_ID' in os.environ  # systemd >= v252
                                 or 'BT_AS_SYSTEMD_UNIT' in os.environ)  # < v252 or for testing
         self.last_daily = None
         self.last_hourly = None
+        self.cadence = None
+        self.watchdog_interval = 5.0
+        self._wake = threading.Event()
 
     def notify_ready(self):
         if self.as_systemd_unit:
@@ -62,6 +90,25 @@ class Daemon(ABC):
         if self.as_systemd_unit:
             notify(Notification.WATCHDOG)
 
+    def wake_up(self):
+        """ends the wait for the next tick now, may be called from any thread"""
+        self._wake.set()
+
+    def _wait(self, seconds: float):
+        # in slices, the watchdog is notified and the progress shown while waiting
+        deadline = time.monotonic() + seconds
+        tty = sys.stdout.isatty()
+        while (left := deadline - time.monotonic()) > 0:
+            if self._wake.wait(min(left, 1.0 if tty else self.watchdog_interval)):
+                logger.debug("woken up")
+                break
+            self.notify_watchdog()
+            if tty:
+                print(f"{seconds - left:.0f}/{seconds:.0f} seconds passed", end="\r")
+        self._wake.clear()
+        if tty:
+            print(f"{seconds:.0f}/{seconds:.0f} seconds passed, executing...", end="\r")
+
     def safe_run(self, tick_function: Callable[..., _TV], *args, **kwargs) -> Union[_TV, None]:
         # we want exception not breaking
         # noinspection PyBroadException
@@ -71,9 +118,13 @@ class Daemon(ABC):
             raise
         except Exception as e:
             now = datetime.now()
-            self.error_time.append(now)
-            while self.error_time and now - self.error_time[0] < timedelta(minutes=self.error_tolerance_period):
-                self.error_time.pop(0)
+            with self._error_lock:
+                self.error_time.append(now)
+                self.worker_errors[threading.current_thread().name] += 1
+                # only errors within the tolerance period count
+                while self.error_time and now - self.error_time[0] > timedelta(minutes=self.error_tolerance_period):
+                    self.error_time.pop(0)
+                too_much = len(self.error_time) > self.error_tolerance_count
             if isinstance(e, ReadTimeout):
                 logger.warning("Server not reachable: Read Timeout")
             elif isinstance(e, ConnectionError):
@@ -93,7 +144,7 @@ class Daemon(ABC):
                     traceback.print_exc(file=fp)
                 logger.warning(f"Ticking not successful, "
                                f"traceback is at: `exception@{now.isoformat().replace(':', '.')}.log`.")
-            if len(self.error_time) > self.error_tolerance_count:
+            if too_much:
                 logger.error(f"There has been too much (>{self.error_tolerance_count}) errors "
                              f"in past {self.error_tolerance_period} minutes, stopping.")
                 raise TooMuchExceptionsError from None
@@ -105,8 +156,10 @@ class Daemon(ABC):
                     finalize_function=None,
                     daily_function=None,
                     hourly_function=None,
+                    min_wait_seconds=None,
+                    max_wait_seconds=None,
                     ):
-        from time import sleep
+        self.cadence = Cadence(wait_seconds, min_wait_seconds, max_wait_seconds)
         try:
             self.safe_run(start_function or self.start)
             while True:
@@ -128,13 +181,7 @@ class Daemon(ABC):
                 # tick
                 self.safe_run(tick_function or self.tick)
                 self.notify_watchdog()
-                if sys.stdout.isatty():
-                    for waited in range(wait_seconds):
-                        print(f"{waited}/{wait_seconds} seconds passed", end="\r")
-                        sleep(1)
-                    print(f"{wait_seconds}/{wait_seconds} seconds passed, executing...", end="\r")
-                else:
-                    sleep(wait_seconds)
+                self._wait(self.cadence.seconds)
         except KeyboardInterrupt:
             if sys.stdout.isatty():
                 print("\rbreak")
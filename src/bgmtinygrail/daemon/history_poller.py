@@ -0,0 +1,103 @@
+"""polling the user history in a thread of its own, new entries become typed events on a queue
+
+The trader daemon ticks characters as their history shows fills. Polled inside a
+tick, a fill waits for the characters ticked before it; polled here, it waits no
+longer than the poll interval.
+"""
+import logging
+import queue
+import threading
+from enum import Enum
+from typing import *
+
+from ..tinygrail.api import get_history
+from ..tinygrail.model.history import (BHistory, THistoryAskDeal, THistoryBidDeal, THistoryBidDealRest,
+                                      THistoryChaosDamage, THistoryEnterICO, THistoryGensokyoResult,
+                                      THistoryGuidepostDamage, THistoryIceBergAskDeal, THistoryIcebergBidDeal,
+                                      THistoryICOFail, THistoryICOResult, THistoryICORest,
+                                      THistoryScratchBonusResult, THistoryStartICO)
+from ..tinygrail.player import Player
+
+__all__ = ['EventKind', 'HistoryEvent', 'HistoryPoller', 'classify']
+
+logger = logging.getLogger('history_poller')
+
+
+class EventKind(Enum):
+    BID_DEAL = 'bid_deal'
+    ASK_DEAL = 'ask_deal'
+    ICO = 'ico'
+    SCRATCH = 'scratch'
+    DAMAGE = 'damage'  # chaos cube and guidepost used on us
+    OTHER = 'other'
+
+
+_KINDS = [
+    (EventKind.BID_DEAL, (THistoryBidDeal, THistoryBidDealRest, THistoryIcebergBidDeal)),
+    (EventKind.ASK_DEAL, (THistoryAskDeal, THistoryIceBergAskDeal)),
+    (EventKind.ICO, (THistoryEnterICO, THistoryStartICO, THistoryICORest, THistoryICOFail, THistoryICOResult)),
+    (EventKind.SCRATCH, (THistoryScratchBonusResult, THistoryGensokyoResult)),
+    (EventKind.DAMAGE, (THistoryChaosDamage, THistoryGuidepostDamage)),
+]
+
+
+class HistoryEvent(NamedTuple):
+    kind: EventKind
+    character_id: Optional[int]
+    history: BHistory
+
+
+def classify(history: BHistory) -> HistoryEvent:
+    kind = next((kind for kind, classes in _KINDS if isinstance(history, classes)), EventKind.OTHER)
+    return HistoryEvent(kind, getattr(history, 'character_id', None), history)
+
+
+class HistoryPoller(threading.Thread):
+    player: Player
+    last_history_id: int
+    interval: float
+    events: 'queue.Queue[HistoryEvent]'
+
+    def __init__(self, player: Player, since_id: int, *, interval: float = 5.0,
+                 on_events: Callable[[List[HistoryEvent]], None] = None):
+        super().__init__(name='history-poller', daemon=True)
+        self.player = player
+        self.last_history_id = since_id
+        self.interval = interval
+        self.on_events = on_events
+        self.events = queue.Queue()
+        self._stopping = threading.Event()
+
+    def poll(self) -> List[HistoryEvent]:
+        """fetches the history since the last poll and queues its events, oldest first"""
+        histories = get_history(self.player, since_id=self.last_history_id)
+        if not histories:
+            return []
+        self.last_history_id = histories[0].id
+        events = [classify(history) for history in reversed(histories)]
+        for event in events:
+            self.events.put(event)
+        return events
+
+    def drain(self) -> List[HistoryEvent]:
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def run(self):
+        while not self._stopping.is_set():
+            # the thread outlives any error, the next poll may well succeed
+            # noinspection PyBroadException
+            try:
+                events = self.poll()
+                if events and self.on_events is not None:
+                    self.on_events(events)
+            except Exception as e:
+                logger.warning(f"polling history failed: {e!r}")
+            self._stopping.wait(self.interval)
+
+    def stop(self):
+        self._stopping.set()
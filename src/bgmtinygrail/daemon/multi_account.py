@@ -0,0 +1,119 @@
+"""several accounts traded by one process
+
+Accounts in one process share what is process-wide already: the transport and
+its connection pool, the market cache, single flight and the BigC registry. Each
+account keeps its own trader, scheduler, request metrics and error budget; an
+account running out of it is stopped while the others go on.
+
+A tick goes through the accounts in turn, each starting first once in a while,
+and gives each an equal share of the tick budget. The next tick comes as soon as
+the busiest account wants it.
+"""
+from datetime import datetime, timedelta
+from typing import *
+
+from ._base import logger, Cadence, Daemon, TooMuchExceptionsError
+from .trader_daemon import TraderDaemon
+
+__all__ = ['MultiAccountDaemon']
+
+
+class MultiAccountDaemon(Daemon):
+    accounts: Dict[str, TraderDaemon]
+    stopped: Set[str]  # accounts out of their error budget
+    tick_budget: Optional[float]  # seconds shared by the accounts, per tick
+
+    def __init__(self, accounts: Dict[str, TraderDaemon], *args, tick_budget=None, **kwargs):
+        super().__init__(None, None, *args, **kwargs)
+        self.accounts = accounts
+        self.stopped = set()
+        self.tick_budget = tick_budget
+        self._turn = 0
+        for account in accounts.values():
+            # a history poller of any account wakes the process up
+            account._wake = self._wake
+
+    @property
+    def active(self) -> List[str]:
+        return [name for name in self.accounts if name not in self.stopped]
+
+    def _each(self, function: Callable[[str, TraderDaemon], Any]) -> bool:
+        """runs ``function`` on the active accounts in their turn, an account out of its error budget is stopped"""
+        names = self.active
+        if not names:
+            raise TooMuchExceptionsError
+        shift = self._turn % len(names)
+        done = True
+        for name in names[shift:] + names[:shift]:
+            account = self.accounts[name]
+            try:
+                done &= bool(account.safe_run(function, name, account))
+            except TooMuchExceptionsError:
+                logger.error(f"account {name}: too much errors, stopped")
+                self.stopped.add(name)
+                account.safe_run(account.finalize)
+                done = False
+            self.notify_watchdog()
+        if not self.active:
+            raise TooMuchExceptionsError
+        return done
+
+    def start(self):
+        for account in self.accounts.values():
+            account.cadence = Cadence(self.cadence.seconds, self.cadence.minimum, self.cadence.maximum,
+                                      factor=self.cadence.factor)
+
+        def start(name, account):
+            account.start()
+            return True
+
+        self._each(start)
+        self.notify_ready()
+
+    def tick(self):
+        active = self.active
+        if self.tick_budget is not None and active:
+            for name in active:
+                self.accounts[name].tick_budget = self.tick_budget / len(active)
+
+        def tick(name, account):
+            logger.info(f"account {name}")
+            account.tick()
+            return True
+
+        try:
+            self._each(tick)
+        finally:
+            self._turn += 1
+            cadences = [self.accounts[name].cadence for name in self.active]
+            if cadences:
+                self.cadence.seconds = min(cadence.seconds for cadence in cadences)
+
+    def daily(self):
+        today = (datetime.now() - timedelta(hours=1)).date()
+
+        def daily(name, account):
+            if account.last_daily is None or account.last_daily < today:
+                if not account.daily():
+                    return False
+                account.last_daily = today
+            return True
+
+        return self._each(daily)
+
+    def hourly(self):
+        hour = datetime.now().replace(minute=0, second=0, microsecond=0)
+
+        def hourly(name, account):
+            if account.last_hourly is None or account.last_hourly < hour:
+                if not account.hourly():
+                    return False
+                account.last_hourly = hour
+            return True
+
+        return self._each(hourly)
+
+    def finalize(self):
+        for name in self.active:
+            account = self.accounts[name]
+            account.safe_run(account.finalize)
@@ -0,0 +1,133 @@
+"""which characters a tick goes through, and in which order
+
+Characters are due from being tracked until they are ticked, like the former
+urgent and slow sets. A due character has a priority: the minutes it has been
+waiting, plus a bonus per history event not yet acted on, plus a term growing
+with the log of its position value, all scaled by a weight the trader gives it.
+A tick goes through them in that order until its time budget is spent.
+
+Workers of a parallel tick mark characters ticked while the daemon schedules and
+marks others, so all of it happens under a lock.
+"""
+import heapq
+import math
+import threading
+from time import monotonic
+from typing import *
+
+__all__ = ['CharacterScheduler']
+
+
+class _Entry:
+    __slots__ = ('since', 'events', 'value', 'weight')
+
+    def __init__(self, now: float):
+        self.since = now
+        self.events = 0
+        self.value = 0.0
+        self.weight = 1.0
+
+
+class CharacterScheduler:
+    event_bonus: float  # priority of one pending history event, in minutes of staleness
+    value_bonus: float  # priority per e-fold of position value
+    idle_per_tick: int  # characters without pending events ticked at most, as the former slow sample
+
+    def __init__(self, *, event_bonus: float = 60.0, value_bonus: float = 1.0, idle_per_tick: int = 3):
+        self.event_bonus = event_bonus
+        self.value_bonus = value_bonus
+        self.idle_per_tick = idle_per_tick
+        self._entries: Dict[int, _Entry] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, cid: int):
+        with self._lock:
+            return cid in self._entries
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._entries))
+
+    def _entry(self, cid: int) -> _Entry:
+        # callers hold the lock
+        entry = self._entries.get(cid)
+        if entry is None:
+            entry = self._entries[cid] = _Entry(monotonic())
+        return entry
+
+    def track(self, cid: int):
+        with self._lock:
+            self._entry(cid)
+
+    def mark_urgent(self, cid: int, events: int = 1):
+        with self._lock:
+            self._entry(cid).events += events
+
+    # value and weight only apply to characters due, a character ticked meanwhile is not tracked again
+
+    def set_value(self, cid: int, value: float):
+        with self._lock:
+            entry = self._entries.get(cid)
+            if entry is not None:
+                entry.value = value
+
+    def set_weight(self, cid: int, weight: float):
+        with self._lock:
+            entry = self._entries.get(cid)
+            if entry is not None:
+                entry.weight = weight
+
+    def events(self, cid: int) -> int:
+        with self._lock:
+            entry = self._entries.get(cid)
+            return entry.events if entry is not None else 0
+
+    def ticked(self, cid: int, events: int = None):
+        """done with ``cid``; given the ``events`` seen as its tick started, later ones keep it due"""
+        with self._lock:
+            entry = self._entries.pop(cid, None)
+            if entry is not None and events is not None and entry.events > events:
+                left = self._entries[cid] = _Entry(monotonic())
+                left.events = entry.events - events
+                left.value = entry.value
+                left.weight = entry.weight
+
+    @property
+    def urgent(self) -> Set[int]:
+        with self._lock:
+            return {cid for cid, entry in self._entries.items() if entry.events}
+
+    @property
+    def idle(self) -> Set[int]:
+        with self._lock:
+            return {cid for cid, entry in self._entries.items() if not entry.events}
+
+    def _priority(self, entry: _Entry, now: float) -> float:
+        return entry.weight * ((now - entry.since) / 60
+                               + entry.events * self.event_bonus
+                               + math.log1p(max(entry.value, 0.0)) * self.value_bonus)
+
+    def priority(self, cid: int, now: float = None) -> float:
+        with self._lock:
+            return self._priority(self._entries[cid], monotonic() if now is None else now)
+
+    def schedule(self) -> List[int]:
+        """due characters by priority, those with pending events first, then at most ``idle_per_tick`` others"""
+        now = monotonic()
+        with self._lock:
+            heap = [(not entry.events, -self._priority(entry, now), cid) for cid, entry in self._entries.items()]
+        heapq.heapify(heap)
+        order = []
+        idle = 0
+        while heap:
+            no_events, _, cid = heapq.heappop(heap)
+            if no_events:
+                if idle >= self.idle_per_tick:
+                    break
+                idle += 1
+            order.append(cid)
+        return order
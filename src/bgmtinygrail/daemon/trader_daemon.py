@@ -1,14 +1,23 @@
 #!/usr/bin/env python3
+import math
+import os
 import re
-from random import sample
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from typing import *
 
 from ._base import logger, Daemon
+from .history_poller import HistoryPoller
+from .scheduler import CharacterScheduler
 from ..model_link.sync_asks_collect import sync_asks_collect
 from ..tinygrail import ServerSentError
 from ..tinygrail.api import all_holding, all_bids
 from ..tinygrail.api import get_daily_bonus, get_weekly_share, scratch_bonus2, scratch_gensokyo, scratch_gensokyo_price
 from ..tinygrail.api import get_history
+from ..tinygrail.bigc import BigC
+from ..tinygrail.bigc_registry import big_c_registry
 from ..trader import *
 
 
@@ -23,15 +32,33 @@ def all_bidding_ids(player):
 class TraderDaemon(Daemon):
     trader: ABCTrader
     last_history_id: int
-    urgent_chars: Set[int]
-    slow_chars: Set[int]
+    scheduler: CharacterScheduler
+    metrics_path: Optional[str]
+    workers: int  # characters ticked at once
+    tick_budget: Optional[float]  # seconds a tick starts characters for, the rest waits for the next tick
+    history_poll_interval: Optional[float]  # history is polled in a thread of its own if set, in ticks otherwise
+    history_poller: Optional[HistoryPoller]
 
-    def __init__(self, player, login, /, *args, trader_cls=GracefulTrader, **kwargs):
+    def __init__(self, player, login, /, *args, trader_cls=GracefulTrader, metrics_path=None, workers=1,
+                 tick_budget=None, history_poll_interval=None, **kwargs):
         super().__init__(player, login, *args, **kwargs)
         self.trader = trader_cls(player)
+        self.metrics_path = metrics_path
+        self.workers = workers
+        self.tick_budget = tick_budget
+        self.history_poll_interval = history_poll_interval
+        self.history_poller = None
+        self._character_locks: DefaultDict[int, threading.Lock] = defaultdict(threading.Lock)
         self.last_history_id = 0
-        self.urgent_chars = set()
-        self.slow_chars = set()
+        self.scheduler = CharacterScheduler()
+
+    @property
+    def urgent_chars(self) -> Set[int]:
+        return self.scheduler.urgent
+
+    @property
+    def slow_chars(self) -> Set[int]:
+        return self.scheduler.idle
 
     def _update_character_due_to_history(self, full_update=False) -> List[int]:
         if full_update or self.last_history_id == 0:
@@ -50,23 +77,120 @@ class TraderDaemon(Daemon):
             self.last_history_id = histories[0].id
         return sorted(update_characters)
 
+    def _changed_characters(self) -> List[int]:
+        if self.history_poller is None:
+            return self._update_character_due_to_history()
+        changed = set()
+        for event in self.history_poller.drain():
+            logger.debug(f"history event {event.kind.name} on {event.character_id}")
+            if event.character_id is not None:
+                changed.add(event.character_id)
+        return sorted(changed)
+
+    def _take_new_events(self, queue: Deque[int]):
+        """characters the poller saw changing during the tick go first among those not started yet"""
+        if self.history_poller is None:
+            return
+        for cid in self._changed_characters():
+            self.scheduler.mark_urgent(cid)
+            if cid in queue:
+                queue.remove(cid)
+            queue.appendleft(cid)
+
     def tick(self):
-        self.urgent_chars.update(self._update_character_due_to_history())
-        to_update = sorted(self.urgent_chars.union(sample(self.slow_chars, k=3) if len(self.slow_chars) > 3
-                                                   else self.slow_chars))
-        logger.debug(f"{to_update=}")
-        for cid in to_update:
+        before = self.player.metrics.snapshot()
+        started = time.perf_counter()
+        with self._error_lock:
+            errors_before = self.worker_errors.copy()
+        prefetched = {}
+        try:
+            changed = self._changed_characters()
+            for cid in changed:
+                self.scheduler.mark_urgent(cid)
+            for cid in self.scheduler:
+                self.scheduler.set_weight(cid, self.trader.importance(cid))
+            to_update = self.scheduler.schedule()
+            logger.debug(f"{to_update=}")
+            # a few batch requests for what every tick reads, held fresh until this tick ends
+            prefetched = self.safe_run(BigC.prefetch, self.player, to_update, big_cs=self.trader.big_c,
+                                       until=math.inf) or {}
+            deadline = None if self.tick_budget is None else time.monotonic() + self.tick_budget
+            if self.workers > 1:
+                self._tick_parallel(to_update, deadline)
+            else:
+                queue = deque(to_update)
+                while queue:
+                    if deadline is not None and time.monotonic() > deadline:
+                        break
+                    cid = queue.popleft()
+                    logger.info(f"on {cid}")
+                    self.safe_run(self._tick_one, cid)
+                    self.notify_watchdog()
+                    self._take_new_events(queue)
+            if self.scheduler:
+                logger.info(f"{len(self.scheduler)} characters left for later ticks")
+            if self.cadence is not None:
+                # fills come in bursts, ticks follow closely while they do or while urgent ones are left
+                if changed or self.urgent_chars:
+                    self.cadence.busy()
+                else:
+                    self.cadence.idle()
+            sync_asks_collect(self.player, self.login, True)
+        finally:
+            for big_c in prefetched.values():
+                big_c.release()
+            logger.info(f"tick took {time.perf_counter() - started:.2f}s: {(self.player.metrics - before).summary()}")
+            with self._error_lock:
+                errors = self.worker_errors - errors_before
+            if errors:
+                logger.warning(f"errors by worker: {dict(sorted(errors.items()))}")
+            logger.debug(f"big_c registry: {big_c_registry.stats()}")
+            self.dump_metrics()
+
+    def dump_metrics(self):
+        if self.metrics_path is None:
+            return
+        if self.metrics_path.endswith('.json'):
+            content = self.player.metrics.json()
+        else:
+            content = self.player.metrics.prometheus()
+        with open(self.metrics_path + '.tmp', mode='w', encoding='utf-8') as fp:
+            fp.write(content)
+        os.replace(self.metrics_path + '.tmp', self.metrics_path)
+
+    def _tick_parallel(self, cids: List[int], deadline: Optional[float] = None):
+        queue = deque(cids)
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='tick') as executor:
+            # submitted as workers free up, in priority order, until the deadline
+            pending = set()
+            while True:
+                while queue and len(pending) < self.workers and (deadline is None or time.monotonic() <= deadline):
+                    pending.add(executor.submit(self._tick_locked, queue.popleft()))
+                if not pending:
+                    break
+                done, pending = wait(pending, timeout=self.watchdog_interval, return_when=FIRST_COMPLETED)
+                self.notify_watchdog()
+                for future in done:
+                    future.result()  # only TooMuchExceptionsError gets out of safe_run
+                self._take_new_events(queue)
+
+    def _tick_locked(self, cid):
+        # a missing lock is created by the C factory in one step, no two threads get different ones
+        lock = self._character_locks[cid]
+        if not lock.acquire(blocking=False):
+            logger.info(f"on {cid}: already ticking, skipped")
+            return
+        try:
             logger.info(f"on {cid}")
             self.safe_run(self._tick_one, cid)
-            self.notify_watchdog()
-        sync_asks_collect(self.player, self.login, True)
+        finally:
+            lock.release()
 
     def _tick_one(self, cid):
+        # fills coming in while ticking are left for another tick
+        seen = self.scheduler.events(cid)
         self.trader.tick(cid)
-        if cid in self.urgent_chars:
-            self.urgent_chars.remove(cid)
-        if cid in self.slow_chars:
-            self.slow_chars.remove(cid)
+        self.scheduler.ticked(cid, seen)
 
     def daily(self):
         self.notify_watchdog()
@@ -136,18 +260,32 @@ class TraderDaemon(Daemon):
 
     def hourly(self):
         abi = set(all_bidding_ids(self.player))
-        ahi = set(all_holding_ids(self.player))
+        holdings = all_holding(self.player)
+        ahi = {h.character_id for h in holdings}
 
-        self.slow_chars.update(abi)
+        for cid in abi:
+            self.scheduler.track(cid)
         logger.debug(f"{sorted(self.slow_chars)=}")
 
         # holding but not bidding, indicating worn out bidding
-        self.urgent_chars.update(ahi - abi)
         # bidding but not holding, includes force-view
-        self.urgent_chars.update(abi - ahi)
+        for cid in (ahi - abi) | (abi - ahi):
+            self.scheduler.mark_urgent(cid)
         logger.debug(f"{sorted(self.urgent_chars)=}")
+
+        for h in holdings:
+            self.scheduler.set_value(h.character_id, h.state * h.current)
         return True
 
     def start(self):
         super().start()
         self._update_character_due_to_history(full_update=True)
+        if self.history_poll_interval is not None:
+            self.history_poller = HistoryPoller(self.player, self.last_history_id, interval=self.history_poll_interval,
+                                                on_events=lambda events: self.wake_up())
+            self.history_poller.start()
+
+    def finalize(self):
+        if self.history_poller is not None:
+            self.history_poller.stop()
+        super().finalize()
@@ -1,5 +1,6 @@
 from . import _base
 from . import accounts
+from . import charts
 from . import strategy
 
 _base.create_all()
@@ -0,0 +1,53 @@
+from typing import List, Optional
+
+from sqlalchemy import Float
+
+from ._base import *
+
+
+class Chartum(CacheBase):
+    __tablename__ = 'charts'
+
+    character_id = Column(Integer, primary_key=True)
+    time = Column(String(32), primary_key=True)  # as sent by tinygrail, ISO 8601
+    begin = Column(Float, nullable=False)
+    end = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    amount = Column(Integer, nullable=False)
+    price = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<Chartum(character_id={self.character_id!r}, time={self.time!r})>"
+
+
+_COLUMNS = ('time', 'begin', 'end', 'low', 'high', 'amount', 'price')
+
+
+@auto_session(DbCacheSession, writes=False)
+def get(character_id: int, *, session=None) -> List[dict]:
+    rows = session.query(Chartum).filter_by(character_id=character_id).order_by(Chartum.time)
+    return [{column: getattr(row, column) for column in _COLUMNS} for row in rows]
+
+
+@auto_session(DbCacheSession, writes=False)
+def last_time(character_id: int, *, session=None) -> Optional[str]:
+    row = session.query(Chartum.time).filter_by(character_id=character_id).order_by(Chartum.time.desc()).first()
+    return row[0] if row else None
+
+
+@auto_session(DbCacheSession, writes=False)
+def initial_price(character_id: int, *, session=None) -> Optional[float]:
+    row = session.query(Chartum.begin).filter_by(character_id=character_id).order_by(Chartum.time).first()
+    return row[0] if row else None
+
+
+@auto_session(DbCacheSession)
+def merge(character_id: int, since: Optional[str], charts: List[dict], *, session=None):
+    """replaces what is stored from ``since`` on, the candles of that day may have grown meanwhile"""
+    query = session.query(Chartum).filter_by(character_id=character_id)
+    if since is not None:
+        query = query.filter(Chartum.time >= since)
+    query.delete(synchronize_session=False)
+    session.add_all(Chartum(character_id=character_id, **chartum) for chartum in charts
+                    if since is None or chartum['time'] >= since)
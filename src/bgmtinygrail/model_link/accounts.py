@@ -5,6 +5,7 @@ import lazy_object_proxy
 from ..bgmd.api import user_info
 from ..bgmd.login import Login
 from ..db import accounts as db_accounts
+from ..tinygrail.metrics import Metrics
 from ..tinygrail.player import Player
 
 __all__ = []
@@ -16,14 +17,14 @@ class LoginPlayer(NamedTuple):
     tinygrail: Player
 
 
-def translate(acc: db_accounts.Account) -> LoginPlayer:
+def translate(acc: db_accounts.Account, *, metrics: Metrics = None) -> LoginPlayer:
     user = user_info(acc.id)
     bangumi = Login(chii_auth=acc.chii_auth, ua=acc.ua, user=user)
 
     def update_identity(new_identity):
         db_accounts.update(acc.friendly_name, tinygrail_identity=new_identity)
 
-    tinygrail = Player(acc.tinygrail_identity, on_identity_refresh=update_identity)
+    tinygrail = Player(acc.tinygrail_identity, on_identity_refresh=update_identity, metrics=metrics)
     return LoginPlayer(acc.friendly_name, bangumi, tinygrail)
 
 
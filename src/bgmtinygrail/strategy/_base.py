@@ -1,11 +1,11 @@
 import logging
 from abc import ABC, abstractmethod
 from enum import Enum
-from functools import lru_cache
 from typing import *
 
-from ..tinygrail.bigc import BigC
+from ..tinygrail.bigc_registry import big_c_registry
 from ..tinygrail.model import TBid, TAsk
+from ..tinygrail.price_discovery import fast_buy, fast_sell
 from ..tinygrail.player import Player
 
 logger = logging.getLogger('strategy')
@@ -22,9 +22,8 @@ class Strategy(Enum):
     MANUAL_CONTROL = 100
 
 
-@lru_cache()
-def _big_c(player, cid):
-    return BigC(player, cid)
+def _big_c(player, cid, optimistic=False, history=None):
+    return big_c_registry.get(player, cid, optimistic=optimistic, history=history)
 
 
 class ABCCharaStrategy(ABC):
@@ -57,9 +56,7 @@ class ABCCharaStrategy(ABC):
 
     @property
     def big_c(self):
-        res = _big_c(self.player, self.cid)
-        res.update()
-        return res
+        return _big_c(self.player, self.cid, self.trader.optimistic, self.trader.history)
 
     @property
     def _fundamental(self):
@@ -81,33 +78,20 @@ class ABCCharaStrategy(ABC):
         price = price or self._exchange_price
         logger.debug(f"fast forward #{self.cid:<5} | {price}")
         big_c = self.big_c
-        amount = 100
-        big_c.ensure_bids([], force_updates='after')
-        while not big_c.bids:
-            big_c.ensure_bids([TBid(Price=price, Amount=amount)], force_updates='after')
-            amount *= 2
-        big_c.ensure_bids([], force_updates='after')
+        big_c.ensure_bids([])
+        fast_buy(big_c, price)
+        big_c.ensure_bids([])
 
     def _fast_seller(self, amount=None, low=10, high=100000):
         if amount is None:
             amount = self.big_c.total_holding
         logger.debug(f"fast seller #{self.cid:<5} | ({low}-{high}) / {amount}")
         big_c = self.big_c
-        big_c.ensure_bids([], force_updates='before')
-        big_c.ensure_asks([], force_updates='after')
-        while amount:
-            pin = round(0.618 * high + 0.382 * low, 2)
-            if pin == high or pin == low:
-                break
-            big_c.ensure_asks([TAsk(Price=pin, Amount=1)], force_updates='after')
-            if big_c.asks:
-                big_c.ensure_asks([], force_updates='after')
-                high = pin
-            else:
-                low = pin
-                amount -= 1
+        big_c.ensure_bids([])
+        big_c.ensure_asks([])
+        amount = fast_sell(big_c, amount, low, high)
         if amount:
-            big_c.ensure_asks([TAsk(Price=low, Amount=amount)], force_updates='after')
+            big_c.ensure_asks([TAsk(Price=low, Amount=amount)])
 
     def _output_balanced(self):
         exchange_price = self._exchange_price
@@ -1,3 +1,4 @@
+from . import aio_api
 from . import api
 from . import bigc
 from . import model
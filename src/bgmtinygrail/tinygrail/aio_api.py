@@ -0,0 +1,370 @@
+"""asyncio counterparts of :mod:`.api`, running on :attr:`Player.aio_session`"""
+import asyncio
+import itertools
+import logging
+import time
+
+from pydantic import ValidationError
+
+from .api import CHARTS_EPOCH
+from .chunk_tuner import character_list_tuner
+from .model import *
+from .paginate import aio_paginate
+from .player import Player, APIResponseSchemeNotMatch, dummy_player, ServerSentError, AIO_RETRY_ON
+from .rate_limit import Priority
+
+logger = logging.getLogger('tinygrail.aio_api')
+
+
+async def _collect(items: AsyncIterator) -> list:
+    return [item async for item in items]
+
+
+def _paged(player: Player, url_prefix: str, model, *, priority=Priority.READ, stream=False):
+    async def fetch(page, page_size):
+        value = (await player.aio_get_data(f"{url_prefix}/{page}/{page_size}", as_model=model, priority=priority,
+                                           trusted=True)).value
+        return value.total_items, value.items
+
+    items = aio_paginate(fetch)
+    return items if stream else _collect(items)
+
+
+BATCH_WORKERS = 4
+
+
+async def batch_character_info(player: Player, lst: List[int], splits: int = None, *,
+                               workers: int = BATCH_WORKERS) -> List[Union[TCharacter, TICO]]:
+    lst = [int(c) for c in lst]
+    semaphore = asyncio.Semaphore(workers)
+
+    async def attempt(chunk):
+        start = time.perf_counter()
+        try:
+            obj = await player.aio_post_data('chara/list', chunk, as_model=RCharacterList,
+                                             priority=Priority.READ, trusted=True)
+        except AIO_RETRY_ON:
+            character_list_tuner.failed()
+            raise
+        character_list_tuner.observe(len(chunk), time.perf_counter() - start)
+        return obj.value
+
+    async def post(chunk):
+        try:
+            return await player.transport.aio_retrying(lambda: attempt(chunk), AIO_RETRY_ON)
+        finally:
+            semaphore.release()
+
+    tasks = []
+    offset = 0
+    try:
+        while offset < len(lst):
+            await semaphore.acquire()
+            size = splits or character_list_tuner.size
+            tasks.append(asyncio.ensure_future(post(lst[offset:offset + size])))
+            offset += size
+        values = await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
+    return [c for value in values for c in value]
+
+
+async def character_info(player: Player, cid: int, *, fresh: bool = False) -> Union[TCharacter, TICO]:
+    return (await player.aio_get_data(f"chara/{cid}", as_model=RCharacterish, fresh=fresh)).value
+
+
+async def depth(player: Player, cid: int, *, fresh: bool = False) -> TDepth:
+    return (await player.aio_get_data(f"chara/depth/{cid}", as_model=RDepth, fresh=fresh)).value
+
+
+async def user_character(player: Player, cid: int) -> TUserCharacter:
+    return (await player.aio_get_data(f"chara/user/{cid}", as_model=RUserCharacter)).value
+
+
+def blueleaf_chara_all(player: Player, *, stream=False) -> Union[Awaitable[List[TBlueleafCharacter]],
+                                                                  AsyncIterator[TBlueleafCharacter]]:
+    return _paged(player, "chara/user/chara/blueleaf", RBlueleafCharacter, stream=stream)
+
+
+async def chara_charts(player: Player, cid: int, since: str = CHARTS_EPOCH) -> List[TChartum]:
+    return (await player.aio_get_data(f"chara/charts/{cid}/{since}", as_model=RCharts)).value
+
+
+def all_asks(player: Player, *, stream=False) -> Union[Awaitable[List[TCharacter]], AsyncIterator[TCharacter]]:
+    return _paged(player, "chara/asks/0", RAllAsks, stream=stream)
+
+
+def all_bids(player: Player, *, stream=False) -> Union[Awaitable[List[TCharacter]], AsyncIterator[TCharacter]]:
+    return _paged(player, "chara/bids/0", RAllAsks, stream=stream)
+
+
+async def iter_holding(player: Player, page_size: int = 50) -> AsyncIterator[TCharaUserChara]:
+    for page in itertools.count(1):
+        holdings = (await player.aio_get_data(f"chara/user/chara/0/{page}/{page_size}",
+                                              as_model=RCharaUserChara)).value.items
+        if holdings:
+            for holding in holdings:
+                yield holding
+        else:
+            break
+
+
+def all_holding(player: Player, *, stream=False) -> Union[Awaitable[List[THolding]], AsyncIterator[THolding]]:
+    return _paged(player, "chara/user/chara/0", RHolding, stream=stream)
+
+
+async def get_full_holding(player: Player) -> Dict[int, Tuple[int, int]]:
+    holdings, temples = await asyncio.gather(all_holding(player), user_temples(player))
+    characters = {}
+    for c in holdings:
+        characters[c.id] = (c.state, c.sacrifices)
+    for c in temples:
+        if c.character_id not in characters:
+            characters[c.character_id] = 0, c.sacrifices
+    return characters
+
+
+async def get_full_holding_2(player: Player) -> Dict[int, Union[TTemple, THolding]]:
+    holdings, temples = await asyncio.gather(all_holding(player), user_temples(player))
+    characters = {}
+    for c in holdings:
+        characters[c.character_id] = c
+    for c in temples:
+        if c.character_id not in characters:
+            characters[c.character_id] = c
+    return characters
+
+
+async def create_bid(player: Player, cid: int, bid: TBid):
+    url = f"chara/bid/{cid}/{bid.price}/{bid.amount}"
+    if bid.type == 1:
+        url += "/true"
+    return await player.aio_post_data(url, data=None, as_model=RString)
+
+
+async def create_ask(player: Player, cid: int, ask: TAsk):
+    url = f"chara/ask/{cid}/{ask.price}/{ask.amount}"
+    if ask.type == 1:
+        url += "/true"
+    return await player.aio_post_data(url, data=None, as_model=RString)
+
+
+async def cancel_bid(player: Player, bid: TBid):
+    assert bid.id is not None, ValueError
+    url = f"chara/bid/cancel/{bid.id}"
+    return await player.aio_post_data(url, data=None, as_model=RString)
+
+
+async def cancel_ask(player: Player, ask: TAsk):
+    assert ask.id is not None, ValueError
+    url = f"chara/ask/cancel/{ask.id}"
+    return await player.aio_post_data(url, data=None, as_model=RString)
+
+
+async def get_initial_price(player: Player, cid: int):
+    cc = await chara_charts(player, cid)
+    return cc[0].begin
+
+
+async def character_auction(player: Player, cid: int) -> TAuction:
+    url = f"chara/user/{cid}/tinygrail/false"
+    return (await player.aio_get_data(url, as_model=RAuction)).value
+
+
+def user_temples(player: Player, *, stream=False) -> Union[Awaitable[List[TTemple]], AsyncIterator[TTemple]]:
+    return _paged(player, "chara/user/temple/0", RAllTemples, stream=stream)
+
+
+async def magic_chaos(player: Player, attacker_cid: int) -> TScratchBonus:
+    url = f"magic/chaos/{attacker_cid}"
+    return (await player.aio_post_data(url, data=None, as_model=RScratchLikeOnce)).value
+
+
+async def magic_guidepost(player: Player, attacker_cid: int, target_cid: int) -> TScratchBonus:
+    url = f"magic/guidepost/{attacker_cid}/{target_cid}"
+    return (await player.aio_post_data(url, data=None, as_model=RScratchLikeOnce)).value
+
+
+async def magic_stardust(player: Player, supplier_cid: int, demand_cid: int, amount: int,
+                         use_type: Literal['position', 'temple']):
+    if use_type == 'position':
+        is_temple = 'false'
+    elif use_type == 'temple':
+        is_temple = 'true'
+    else:
+        raise ValueError(f"You can only use 'position' or 'temple', not {use_type!r}")
+    url = f"magic/stardust/{supplier_cid}/{demand_cid}/{amount}/{is_temple}"
+    return await player.aio_post_data(url, data=None, as_model=None)
+
+
+async def get_my_ico(player: Player, ico_id: int) -> TMyICO:
+    return (await player.aio_get_data(f"chara/initial/{ico_id}", as_model=RMyICO)).value
+
+
+def _parse_history_page(jso) -> List[BHistory]:
+    try:
+        return RHistory(**jso).value.items
+    except (APIResponseSchemeNotMatch, ValidationError):
+        lst = []
+        raw_histories = jso['Value']['Items']
+        for raw_history in raw_histories:
+            try:
+                lst.append(HistoryParser(History=raw_history).history)
+            except ValidationError:
+                logger.error(f"Bad history: {raw_history}")
+        return lst
+
+
+async def get_history(player: Player, *, since_id: int = 0, page_limit: int = None,
+                      page_size: int = 50) -> List[BHistory]:
+    fetched: Dict[int, BHistory] = {}
+    page_id_iterator = (itertools.count(1) if page_limit is None else range(1, page_limit + 1))
+    for page in page_id_iterator:
+        jso = await player.aio_get_data(f"chara/user/balance/{page}/{page_size}", as_model=None)
+        lst = _parse_history_page(jso)
+        for history in lst:
+            if history.id > since_id:
+                fetched[history.id] = history
+            else:
+                break  # for history in lst
+        if not lst or lst[-1].id <= since_id:
+            break  # for page in page_id_iterator
+    return [fetched[cid] for cid in sorted(fetched.keys(), reverse=True)]
+
+
+async def iter_history(player: Player, *, page_size: int = 50) -> AsyncIterator[BHistory]:
+    for page in itertools.count(1):
+        jso = await player.aio_get_data(f"chara/user/balance/{page}/{page_size}", as_model=None,
+                                        priority=Priority.BACKGROUND)
+        lst = _parse_history_page(jso)
+        if not lst:
+            break
+        for history in lst:
+            yield history
+
+
+async def scratch_bonus2(player: Player) -> List[TScratchBonus]:
+    return (await player.aio_get_data("event/scratch/bonus2", as_model=RScratchBonus)).value
+
+
+async def scratch_gensokyo(player: Player) -> List[TScratchBonus]:
+    return (await player.aio_get_data("event/scratch/bonus2/true", as_model=RScratchBonus)).value
+
+
+async def scratch_gensokyo_price(player: Player) -> int:
+    sp = (await player.aio_get_data("event/daily/count/10", as_model=RInteger)).value
+    return 2000 * (2 ** sp)
+
+
+async def user_assets(player: Player) -> TUserAssets:
+    return (await player.aio_get_data("chara/user/assets", as_model=RUserAssets)).value
+
+
+async def minimal_user_character(player: Player, cid: int, user_name: Optional[Union[int, str]], *,
+                                 priority=Priority.READ) -> Union[TMinimalUserCharacter, TAuction]:
+    if user_name is None:
+        user_name = 0
+    url = f"chara/user/{cid}/{user_name}/false"
+    return (await player.aio_get_data(url, as_model=RMinimalUserCharacter, priority=priority)).value
+
+
+def all_holders(player: Player, cid: int, *,
+                stream=False) -> Union[Awaitable[List[TCharacterHolder]], AsyncIterator[TCharacterHolder]]:
+    return _paged(player, f"chara/users/{cid}", RCharacterHolder, priority=Priority.BACKGROUND, stream=stream)
+
+
+SPOIL_CONCURRENCY = 8
+
+
+async def iter_spoil_holders(player: Player, cid: int, *, concurrency: int = SPOIL_CONCURRENCY
+                             ) -> AsyncIterator[Tuple[Union[TMinimalUserCharacter, TAuction], TCharacterHolder]]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def lookup(holder):
+        try:
+            return await minimal_user_character(player, cid, holder.name, priority=Priority.BACKGROUND), holder
+        except ServerSentError as e:
+            logger.warning(f"spoil_holders #{cid}: {holder.name}: {e.state=!r}, {e.message=!r}")
+            return None
+        finally:
+            semaphore.release()
+
+    pending = set()
+    try:
+        async for holder in all_holders(player, cid, stream=True):
+            await semaphore.acquire()
+            pending.add(asyncio.ensure_future(lookup(holder)))
+            done = {task for task in pending if task.done()}
+            pending -= done
+            for task in done:
+                if task.result() is not None:
+                    yield task.result()
+        for task in asyncio.as_completed(pending):
+            result = await task
+            if result is not None:
+                yield result
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def spoil_holders(player: Player, cid: int, *, concurrency: int = SPOIL_CONCURRENCY
+                        ) -> List[Tuple[Union[TMinimalUserCharacter, TAuction], TCharacterHolder]]:
+    return [pair async for pair in iter_spoil_holders(player, cid, concurrency=concurrency)]
+
+
+async def top_week() -> List[TTopWeek]:
+    return (await dummy_player.aio_get_data(f"chara/topweek",
+                                            as_model=RTopWeek)).value
+
+
+async def my_auctions(player: Player, character_ids: List[int]) -> List[TMyAuction]:
+    return (await player.aio_post_data("chara/auction/list", data=character_ids,
+                                       as_model=RLMyAuction, priority=Priority.READ)).value
+
+
+async def do_auction(player: Player, cid: int, price: float, amount: int):
+    return (await player.aio_post_data(f"chara/auction/{cid}/{price}/{amount}", data=None,
+                                       as_model=RString)).value
+
+
+async def get_weekly_share(player: Player) -> str:
+    return (await player.aio_get_data(f"event/share/bonus", as_model=RString)).value
+
+
+async def get_daily_bonus(player: Player) -> str:
+    return (await player.aio_get_data(f"event/bangumi/bonus/daily", as_model=RString)).value
+
+
+async def _iter_initials(player: Player, url_prefix: str, page_size: int) -> AsyncIterator[TICO]:
+    for page in itertools.count(1):
+        initials = (await player.aio_get_data(f"{url_prefix}/{page}/{page_size}", as_model=RMultiICO)).value
+        if initials:
+            for initial in initials:
+                yield initial
+        else:
+            break
+
+
+def iter_most_recent_initials(*, page_size: int = 50) -> AsyncIterator[TICO]:
+    return _iter_initials(dummy_player, "chara/mri", page_size)
+
+
+def iter_most_valuable_initials(*, page_size: int = 50) -> AsyncIterator[TICO]:
+    return _iter_initials(dummy_player, "chara/mvi", page_size)
+
+
+def iter_recent_active_initials(*, page_size: int = 50) -> AsyncIterator[TICO]:
+    return _iter_initials(dummy_player, "chara/rai", page_size)
+
+
+async def iter_my_initials(player: Player, *, page_size: int) -> AsyncIterator[TICO]:
+    for page in itertools.count(1):
+        initials = (await player.aio_get_data(f"chara/user/initial/0/{page}/{page_size}",
+                                              as_model=RLICO)).value.items
+        if initials:
+            for initial in initials:
+                yield initial
+        else:
+            break
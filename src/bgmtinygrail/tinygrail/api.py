@@ -1,65 +1,97 @@
 import itertools
 import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED, as_completed
 
 from pydantic import ValidationError
 
+from .chunk_tuner import character_list_tuner
 from .model import *
-from .player import Player, APIResponseSchemeNotMatch, dummy_player
+from .paginate import paginate
+from .player import Player, APIResponseSchemeNotMatch, dummy_player, ServerSentError, RETRY_ON
+from .rate_limit import Priority
 
 logger = logging.getLogger('tinygrail.api')
 
-REQUEST_TIMEOUT = 10
 
+def _paged(player: Player, url_prefix: str, model, *, priority=Priority.READ, stream=False):
+    def fetch(page, page_size):
+        value = player.get_data(f"{url_prefix}/{page}/{page_size}", as_model=model, priority=priority,
+                                trusted=True).value
+        return value.total_items, value.items
 
-def batch_character_info(player: Player, lst: List[int], splits=1000) -> List[Union[TCharacter, TICO]]:
+    items = paginate(fetch)
+    return items if stream else list(items)
+
+
+BATCH_WORKERS = 4
+
+
+def batch_character_info(player: Player, lst: List[int], splits: int = None, *,
+                         workers: int = BATCH_WORKERS) -> List[Union[TCharacter, TICO]]:
+    """chunks are posted concurrently, sized by :data:`character_list_tuner` unless ``splits`` is given"""
     lst = [int(c) for c in lst]
-    ans = []
-    while lst:
-        head50 = lst[:splits]
-        lst = lst[splits:]
-        obj = player.post_data('chara/list', head50, as_model=RCharacterList)
-        ans.extend(obj.value)
-    return ans
+
+    def attempt(chunk):
+        start = time.perf_counter()
+        try:
+            obj = player.post_data('chara/list', chunk, as_model=RCharacterList,
+                                   priority=Priority.READ, trusted=True)
+        except RETRY_ON:
+            character_list_tuner.failed()
+            raise
+        character_list_tuner.observe(len(chunk), time.perf_counter() - start)
+        return obj.value
+
+    def post(chunk):
+        return player.transport.retrying(lambda: attempt(chunk), RETRY_ON)
+
+    results: Dict[int, list] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='batch_character_info') as executor:
+        pending = {}
+        offset = 0
+        while offset < len(lst) or pending:
+            while offset < len(lst) and len(pending) < workers:
+                size = splits or character_list_tuner.size
+                pending[executor.submit(post, lst[offset:offset + size])] = offset
+                offset += size
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+    return [c for offset in sorted(results) for c in results[offset]]
 
 
-def character_info(player: Player, cid: int) -> Union[TCharacter, TICO]:
-    return player.get_data(f"chara/{cid}", as_model=RCharacterish).value
+def character_info(player: Player, cid: int, *, fresh: bool = False) -> Union[TCharacter, TICO]:
+    return player.get_data(f"chara/{cid}", as_model=RCharacterish, fresh=fresh).value
 
 
-def depth(player: Player, cid: int) -> TDepth:
-    return player.get_data(f"chara/depth/{cid}", as_model=RDepth).value
+def depth(player: Player, cid: int, *, fresh: bool = False) -> TDepth:
+    return player.get_data(f"chara/depth/{cid}", as_model=RDepth, fresh=fresh).value
 
 
 def user_character(player: Player, cid: int) -> TUserCharacter:
     return player.get_data(f"chara/user/{cid}", as_model=RUserCharacter).value
 
 
-def blueleaf_chara_all(player: Player) -> List[TBlueleafCharacter]:
-    length = player.get_data("chara/user/chara/blueleaf/1/1",
-                             RBlueleafCharacter).value.total_items
-    if length == 0:
-        return []
-    lst = player.get_data(f"chara/user/chara/blueleaf/1/{length}",
-                          RBlueleafCharacter).value.items
-    return lst
+def blueleaf_chara_all(player: Player, *,
+                       stream=False) -> Union[List[TBlueleafCharacter], Iterator[TBlueleafCharacter]]:
+    return _paged(player, "chara/user/chara/blueleaf", RBlueleafCharacter, stream=stream)
+
+
+CHARTS_EPOCH = "2019-08-08"
 
 
-def chara_charts(player: Player, cid: int) -> List[TChartum]:
-    return player.get_data(f"chara/charts/{cid}/2019-08-08", as_model=RCharts).value
+def chara_charts(player: Player, cid: int, since: str = CHARTS_EPOCH) -> List[TChartum]:
+    """candles from ``since`` (``YYYY-MM-DD``) on"""
+    return player.get_data(f"chara/charts/{cid}/{since}", as_model=RCharts).value
 
 
-def all_asks(player: Player) -> List[TCharacter]:
-    length = player.get_data("chara/asks/0/1/1", as_model=RAllAsks).value.total_items
-    if length == 0:
-        return []
-    return player.get_data(f"chara/asks/0/1/{length}", as_model=RAllAsks).value.items
+def all_asks(player: Player, *, stream=False) -> Union[List[TCharacter], Iterator[TCharacter]]:
+    return _paged(player, "chara/asks/0", RAllAsks, stream=stream)
 
 
-def all_bids(player: Player) -> List[TCharacter]:
-    length = player.get_data("chara/bids/0/1/1", as_model=RAllAsks).value.total_items
-    if length == 0:
-        return []
-    return player.get_data(f"chara/bids/0/1/{length}", as_model=RAllAsks).value.items
+def all_bids(player: Player, *, stream=False) -> Union[List[TCharacter], Iterator[TCharacter]]:
+    return _paged(player, "chara/bids/0", RAllAsks, stream=stream)
 
 
 def iter_holding(player: Player, page_size: int = 50) -> List[TCharaUserChara]:
@@ -72,11 +104,8 @@ def iter_holding(player: Player, page_size: int = 50) -> List[TCharaUserChara]:
             break
 
 
-def all_holding(player: Player) -> List[THolding]:
-    length = player.get_data("chara/user/chara/0/1/1", as_model=RHolding).value.total_items
-    if length == 0:
-        return []
-    return player.get_data(f"chara/user/chara/0/1/{length}", as_model=RHolding).value.items
+def all_holding(player: Player, *, stream=False) -> Union[List[THolding], Iterator[THolding]]:
+    return _paged(player, "chara/user/chara/0", RHolding, stream=stream)
 
 
 def get_full_holding(player: Player) -> Dict[int, Tuple[int, int]]:
@@ -135,13 +164,8 @@ def character_auction(player: Player, cid: int) -> TAuction:
     return player.get_data(url, as_model=RAuction).value
 
 
-def user_temples(player: Player) -> List[TTemple]:
-    length = player.get_data("chara/user/temple/0/1/1",
-                             as_model=RAllTemples).value.total_items
-    if length == 0:
-        return []
-    return player.get_data(f"chara/user/temple/0/1/{length}",
-                           as_model=RAllTemples).value.items
+def user_temples(player: Player, *, stream=False) -> Union[List[TTemple], Iterator[TTemple]]:
+    return _paged(player, "chara/user/temple/0", RAllTemples, stream=stream)
 
 
 def magic_chaos(player: Player, attacker_cid: int) -> TScratchBonus:
@@ -163,9 +187,7 @@ def magic_stardust(player: Player, supplier_cid: int, demand_cid: int, amount: i
     else:
         raise ValueError(f"You can only use 'position' or 'temple', not {use_type!r}")
     url = f"magic/stardust/{supplier_cid}/{demand_cid}/{amount}/{is_temple}"
-    response = player.session.post(url, json=None, timeout=REQUEST_TIMEOUT)
-    jso = response.json()
-    return jso
+    return player.post_data(url, data=None, as_model=None)
 
 
 def get_my_ico(player: Player, ico_id: int) -> TMyICO:
@@ -199,7 +221,8 @@ def get_history(player: Player, *, since_id: int = 0, page_limit: int = None, pa
 
 def iter_history(player: Player, *, page_size: int = 50) -> Iterator[BHistory]:
     for page in itertools.count(1):
-        jso = player.get_data(f"chara/user/balance/{page}/{page_size}", as_model=None)
+        jso = player.get_data(f"chara/user/balance/{page}/{page_size}", as_model=None,
+                              priority=Priority.BACKGROUND)
         try:
             lst: List[BHistory] = RHistory(**jso).value.items
         except APIResponseSchemeNotMatch:
@@ -233,28 +256,51 @@ def user_assets(player: Player) -> TUserAssets:
     return player.get_data("chara/user/assets", as_model=RUserAssets).value
 
 
-def minimal_user_character(player: Player, cid: int, user_name: Optional[Union[int, str]]) -> TMinimalUserCharacter:
+def minimal_user_character(player: Player, cid: int, user_name: Optional[Union[int, str]], *,
+                           priority=Priority.READ) -> Union[TMinimalUserCharacter, TAuction]:
     if user_name is None:
         user_name = 0
     url = f"chara/user/{cid}/{user_name}/false"
-    return player.get_data(url, as_model=RMinimalUserCharacter).value
+    return player.get_data(url, as_model=RMinimalUserCharacter, priority=priority).value
+
+
+def all_holders(player: Player, cid: int, *,
+                stream=False) -> Union[List[TCharacterHolder], Iterator[TCharacterHolder]]:
+    return _paged(player, f"chara/users/{cid}", RCharacterHolder, priority=Priority.BACKGROUND, stream=stream)
+
+
+SPOIL_CONCURRENCY = 8
+
+
+def _spoil_holders(player: Player, cid: int, concurrency: int):
+    def lookup(index, holder):
+        try:
+            return index, minimal_user_character(player, cid, holder.name, priority=Priority.BACKGROUND), holder
+        except ServerSentError as e:
+            logger.warning(f"spoil_holders #{cid}: {holder.name}: {e.state=!r}, {e.message=!r}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='spoil_holders') as executor:
+        pending = set()
+        for index, holder in enumerate(all_holders(player, cid, stream=True)):
+            if len(pending) >= concurrency:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                yield from filter(None, (future.result() for future in done))
+            pending.add(executor.submit(lookup, index, holder))
+        yield from filter(None, (future.result() for future in as_completed(pending)))
 
 
-def all_holders(player: Player, cid: int) -> List[TCharacterHolder]:
-    length = player.get_data(f"chara/users/{cid}/1/1",
-                             as_model=RCharacterHolder).value.total_items
-    if length == 0:
-        return []
-    return player.get_data(f"chara/users/{cid}/1/{length}",
-                           as_model=RCharacterHolder).value.items
+def iter_spoil_holders(player: Player, cid: int, *, concurrency: int = SPOIL_CONCURRENCY
+                       ) -> Iterator[Tuple[Union[TMinimalUserCharacter, TAuction], TCharacterHolder]]:
+    """in the order lookups complete; holders the server refuses to tell about are logged and skipped"""
+    for _, muc, holder in _spoil_holders(player, cid, concurrency):
+        yield muc, holder
 
 
-def spoil_holders(player: Player, cid: int) -> List[Tuple[TMinimalUserCharacter, TCharacterHolder]]:
-    holders = all_holders(player, cid)
-    result: List[Tuple[TMinimalUserCharacter, TCharacterHolder]] = []
-    for holder in holders:
-        result.append((minimal_user_character(player, cid, holder.name), holder))
-    return result
+def spoil_holders(player: Player, cid: int, *, concurrency: int = SPOIL_CONCURRENCY
+                  ) -> List[Tuple[Union[TMinimalUserCharacter, TAuction], TCharacterHolder]]:
+    return [(muc, holder) for _, muc, holder in sorted(_spoil_holders(player, cid, concurrency),
+                                                       key=lambda t: t[0])]
 
 
 def top_week() -> List[TTopWeek]:
@@ -264,7 +310,7 @@ def top_week() -> List[TTopWeek]:
 
 def my_auctions(player: Player, character_ids: List[int]) -> List[TMyAuction]:
     return player.post_data("chara/auction/list", data=character_ids,
-                            as_model=RLMyAuction).value
+                            as_model=RLMyAuction, priority=Priority.READ).value
 
 
 def do_auction(player: Player, cid: int, price: float, amount: int):
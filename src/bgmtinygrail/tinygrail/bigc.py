@@ -1,10 +1,17 @@
+import threading
+from collections import Counter
+from functools import partial
 from warnings import warn
 
 from .api import *
+from .market_cache import TRADE_KINDS, market_cache
+from .reconcile import Reconciliation, reconcile
 from .refresher_matrix import *
 
 logger = logging.getLogger('big_c')
 
+_T = TypeVar('_T')
+
 _INTERNAL_RATE = 0.1
 
 _USER_CHARACTER_THROTTLE_DELTA = timedelta(seconds=2)
@@ -12,51 +19,131 @@ _CHARACTER_INFO_THROTTLE_DELTA = timedelta(seconds=2)
 _CHARTS_THROTTLE_DELTA = timedelta(seconds=2)
 _DEPTH_THROTTLE_DELTA = timedelta(seconds=2)
 
+# tokens filled by a single request
+_USER_CHARACTER_TOKENS = ('my_asks', 'my_bids', 'amount', 'user_character')
+_CHARACTER_INFO_TOKENS = ('ico_or_character', 'ico', 'character')
+_DEPTH_TOKENS = ('all_asks', 'all_bids')
+
+
+# tokens BigC.prefetch fills from batch endpoints, and the refresh tokens they fill
+PREFETCHABLE = ('character', 'my_auction')
+_PREFETCH_FILLS = {'character': 'ico_or_character', 'my_auction': 'my_auction'}
+
+
+def _no_auction(cid: int) -> TMyAuction:
+    return TMyAuction(Price=0, Amount=0, Bid='0001-01-01T01:01', CharacterId=cid, Type=0)
+
+
+def _order_id(result) -> Optional[int]:
+    try:
+        return int(result.value)
+    except (AttributeError, TypeError, ValueError):
+        return None
+
 
 class BigC:
+    __slots__ = ('player', 'character', 'optimistic', 'history', 'fetches', '_deadlines', '_apply_lock',
+                 '_user_character', '_character_info', '_my_ico', '_charts', '_initial_price', '_depth', '_my_auction',
+                 '_traded', '__weakref__')
+    refresh_layout: ClassVar[RefreshLayout] = RefreshLayout([
+        ('my_asks', 'update_user_character'),
+        ('my_bids', 'update_user_character'),
+        ('amount', 'update_user_character'),
+        ('user_character', 'update_user_character'),
+        ('ico_or_character', '_load_character_info'),
+        ('ico', 'update_character_info_ico_only'),
+        ('character', 'update_character_info_on_market_only'),
+        ('my_ico', 'update_my_ico'),
+        ('charts', '_load_charts'),
+        ('all_asks', '_load_depth'),
+        ('all_bids', '_load_depth'),
+        ('my_auction', 'update_my_auction'),
+    ], interval={
+        'charts': timedelta(days=1),
+        **{token: _USER_CHARACTER_THROTTLE_DELTA for token in _USER_CHARACTER_TOKENS},
+        **{token: _CHARACTER_INFO_THROTTLE_DELTA for token in _CHARACTER_INFO_TOKENS},
+        **{token: _DEPTH_THROTTLE_DELTA for token in _DEPTH_TOKENS},
+    })
+
     # user character
     player: Player
     character: int
-    refresh_matrix: RefreshMatrix
+    fetches: Counter  # endpoint -> requests made, for telling how much a tick costs
+    optimistic: bool  # apply own orders to the cached state instead of fetching it again
+    history: Optional[int]  # how many of the latest bid and ask history entries are kept, all if None
+    _traded: FrozenSet[str]  # market data kinds to fetch without joining requests in flight, after our own order
 
-    _user_character: TUserCharacter
+    _user_character: Optional[TUserCharacter]
     _character_info: Union[TCharacter, TICO]
     _my_ico: Optional[TMyICO]
     _charts: List[TChartum]
-    _depth: TDepth
+    _initial_price: Optional[float]
+    _depth: Optional[TDepth]
     _my_auction: TMyAuction
 
-    def __init__(self, player: Player, character: int):
+    def __init__(self, player: Player, character: int, *, optimistic: bool = False, history: Optional[int] = None):
         self.player = player
         self.character = character
-        self.refresh_matrix = RefreshMatrix([
-            'my_asks', 'my_bids', 'amount', 'user_character',
-            'ico_or_character', 'ico', 'character', 'my_ico',
-            'charts', 'all_asks', 'all_bids', 'my_auction',
-        ])
-        self.refresh_matrix.batch_register([
-            ('my_asks', self.update_user_character),
-            ('my_bids', self.update_user_character),
-            ('amount', self.update_user_character),
-            ('user_character', self.update_user_character),
-            ('ico_or_character', self.update_character_info),
-            ('ico', self.update_character_info_ico_only),
-            ('character', self.update_character_info_on_market_only),
-            ('my_ico', self.update_my_ico),
-            ('charts', self.update_charts),
-            ('all_asks', self.update_depth),
-            ('all_bids', self.update_depth),
-            ('my_auction', self.update_my_auction),
-        ])
-        self.refresh_matrix.interval['charts'] = timedelta(days=1)
+        self.optimistic = optimistic
+        self.history = history
+        self.fetches = Counter()
+        self._deadlines = self.refresh_layout.deadlines()
+        self._initial_price = None
+        self._user_character = None
+        self._depth = None
+        self._traded = frozenset()
+        self._apply_lock = threading.Lock()  # orders may be applied from several threads, see reconcile
+
+    @classmethod
+    def prefetch(cls, player: Player, cids: Iterable[int], tokens: Iterable[Token] = PREFETCHABLE, *,
+                 big_cs: Callable[[int], 'BigC'] = None, until: float = None) -> Dict[int, 'BigC']:
+        """fills ``tokens`` of the BigCs of ``cids`` with a few requests to batch endpoints for all of them
+
+        BigCs come from ``big_cs``, the shared registry by default. Characters the batch endpoints do not know
+        are left to fetch their own. ``until``, a :func:`time.monotonic` stamp, keeps what is filled fresh that
+        long in place of the throttle interval, until :meth:`release` at the latest.
+        """
+        tokens = set(tokens)
+        if not tokens.issubset(PREFETCHABLE):
+            raise InvalidRefreshToken(f"Tokens {tokens.difference(PREFETCHABLE)} cannot be prefetched")
+        if big_cs is None:
+            from .bigc_registry import big_c_registry
+            big_cs = partial(big_c_registry.get, player)
+        instances = {cid: big_cs(cid) for cid in cids}
+        if not instances:
+            return instances
+        if 'character' in tokens:
+            for info in batch_character_info(player, list(instances)):
+                market_cache.put('character', info.character_id, info)
+                big_c = instances.get(info.character_id)
+                if big_c is not None:
+                    big_c._character_info = info
+                    big_c._mark_refreshed('ico_or_character', until=until)
+        if 'my_auction' in tokens:
+            auctions = {auction.character_id: auction for auction in my_auctions(player, list(instances))}
+            for cid, big_c in instances.items():
+                big_c._my_auction = auctions.get(cid) or _no_auction(cid)
+                big_c._mark_refreshed('my_auction', until=until)
+        return instances
+
+    def release(self, tokens: Iterable[Token] = PREFETCHABLE):
+        """ends what :meth:`prefetch` held fresh, it is fetched again when next read"""
+        self.invalidates(*(_PREFETCH_FILLS[token] for token in tokens))
 
     def invalidates(self, *tokens: Token):
-        self.refresh_matrix.invalidates(*tokens)
+        self.refresh_layout.invalidates(self._deadlines, *tokens)
 
     def refreshes(self, *tokens: Token):
-        self.refresh_matrix.refreshes(*tokens)
+        self.refresh_layout.refreshes(self, self._deadlines, *tokens)
+
+    def is_stale(self, token: Token) -> bool:
+        return self.refresh_layout.is_stale(self._deadlines, token)
+
+    def _mark_refreshed(self, *tokens: Token, until: float = None):
+        self.refresh_layout.mark_refreshed(self._deadlines, *tokens, until=until)
 
     def update(self, **kwargs):
+        """fetches everything now; reading properties fetches only what is read and stale"""
         if 'ignore_throttle' in kwargs:
             warn(DeprecationWarning("ignore_throttle is deprecated"))
         self.update_user_character()
@@ -67,12 +154,55 @@ class BigC:
     def update_user_character(self, **kwargs):
         if 'ignore_throttle' in kwargs:
             warn(DeprecationWarning("ignore_throttle is deprecated"))
-        self._user_character = user_character(self.player, self.character)
+        result = user_character(self.player, self.character)
+        if self.history is not None:
+            result = result.copy(update={'ask_history': result.ask_history[:self.history],
+                                         'bid_history': result.bid_history[:self.history]})
+        self._user_character = result
+        self.fetches['user_character'] += 1
+        self._mark_refreshed(*_USER_CHARACTER_TOKENS)
+
+    def _market(self, kind: str, fetch: Callable[[], _T], fresh: bool) -> _T:
+        # lazy refreshes read through the shared cache, explicit updates fetch and leave the result there
+        if not fresh:
+            return market_cache.get(kind, self.character, fetch)
+        value = fetch()
+        market_cache.put(kind, self.character, value)
+        return value
 
     def update_character_info(self, **kwargs):
         if 'ignore_throttle' in kwargs:
             warn(DeprecationWarning("ignore_throttle is deprecated"))
-        self._character_info = character_info(self.player, self.character)
+        self._load_character_info(fresh=True)
+
+    def _load_character_info(self, fresh=False):
+        self._character_info = self._market('character', self._fetch_character_info, fresh)
+        self._mark_refreshed('ico_or_character')
+
+    def _fresh(self, kind: str) -> bool:
+        # a request in flight may have started before our order, its answer would not show it
+        fresh = kind in self._traded
+        if fresh:
+            self._traded = self._traded - {kind}
+        return fresh
+
+    def _fetch_character_info(self):
+        self.fetches['character_info'] += 1
+        return character_info(self.player, self.character, fresh=self._fresh('character'))
+
+    def _fetch_charts(self):
+        # imported here, importing the db creates its files
+        from ..db import charts as db_charts
+        last_time = db_charts.last_time(self.character)
+        since = last_time[:10] if last_time is not None else None
+        self.fetches['charts'] += 1
+        fetched = chara_charts(self.player, self.character, since or CHARTS_EPOCH)
+        db_charts.merge(self.character, since, [chartum.dict() for chartum in fetched])
+        return [TChartum.construct(**row) for row in db_charts.get(self.character)]
+
+    def _fetch_depth(self):
+        self.fetches['depth'] += 1
+        return depth(self.player, self.character, fresh=self._fresh('depth'))
 
     def update_character_info_ico_only(self):
         self.refreshes('ico_or_character')
@@ -82,6 +212,7 @@ class BigC:
     def update_my_ico(self):
         self.refreshes('ico')
         self._my_ico = get_my_ico(self.player, self.ico_id)
+        self.fetches['my_ico'] += 1
 
     def update_character_info_on_market_only(self):
         self.refreshes('ico_or_character')
@@ -91,20 +222,29 @@ class BigC:
     def update_charts(self, **kwargs):
         if 'ignore_throttle' in kwargs:
             warn(DeprecationWarning("ignore_throttle is deprecated"))
-        self._charts = chara_charts(self.player, self.character)
+        self._load_charts(fresh=True)
+
+    def _load_charts(self, fresh=False):
+        self._charts = self._market('charts', self._fetch_charts, fresh)
+        self._mark_refreshed('charts')
 
     def update_depth(self, **kwargs):
         if 'ignore_throttle' in kwargs:
             warn(DeprecationWarning("ignore_throttle is deprecated"))
-        self._depth = depth(self.player, self.character)
+        self._load_depth(fresh=True)
+
+    def _load_depth(self, fresh=False):
+        self._depth = self._market('depth', self._fetch_depth, fresh)
+        self._mark_refreshed(*_DEPTH_TOKENS)
 
     def update_my_auction(self):
         self.refreshes('character')
         auctions = my_auctions(self.player, [self.character])
+        self.fetches['my_auction'] += 1
         if auctions:
             self._my_auction = auctions[0]
         else:
-            self._my_auction = TMyAuction(Price=0, Amount=0, Bid='0001-01-01T01:01', CharacterId=self.character, Type=0)
+            self._my_auction = _no_auction(self.character)
 
     @property
     def current_price_rounded(self):
@@ -112,9 +252,17 @@ class BigC:
 
     @property
     def initial_price(self):
+        # never changes once there is a first candle, so it is kept, and the store spares the charts request
+        if self._initial_price is None:
+            from ..db import charts as db_charts
+            self._initial_price = db_charts.initial_price(self.character)
+        if self._initial_price is not None:
+            return self._initial_price
         try:
-            return self.charts[0].begin
+            self._initial_price = self.charts[0].begin
+            return self._initial_price
         except IndexError:
+            self.refreshes('ico_or_character')
             level = self._character_info.level
             return sum(i * i for i in range(level + 1)) * 100000 / (2500 + 7500 * level)
 
@@ -124,7 +272,6 @@ class BigC:
 
     @property
     def fundamental(self):
-        self.update_character_info()
         return self.rate / _INTERNAL_RATE
 
     @property
@@ -141,85 +288,107 @@ class BigC:
     def my_holding(self):
         return self.amount + sum(ask.amount for ask in self.my_asks)
 
+    def _order(self, tokens: Tuple[Token, ...], call: Callable[[], RString],
+               apply: Optional[Callable[[RString], bool]] = None):
+        """runs an order operation, then either applies it to the cached state or invalidates ``tokens``
+
+        Applied state is not marked refreshed, it is still reconciled with the server after its interval.
+        """
+        applied = False
+        try:
+            result = call()
+            applied = apply is not None and apply(result)
+            return result
+        finally:
+            market_cache.traded(self.character)
+            self._traded = frozenset(TRADE_KINDS)
+            if not applied:
+                self.invalidates(*tokens)
+
+    def _may_fill(self, order: Union[TBid, TAsk]) -> bool:
+        """whether the order might be filled right away, judged from the depth"""
+        if isinstance(order, TBid):
+            self.refreshes('all_asks')
+            return any(ask.price <= order.price for ask in self._depth.asks)
+        self.refreshes('all_bids')
+        return any(bid.price >= order.price for bid in self._depth.bids)
+
+    def _applies(self, order: Union[TBid, TAsk]) -> bool:
+        return self.optimistic and self._user_character is not None and not self._may_fill(order)
+
+    def _apply_order(self, order: Union[TBid, TAsk], sign: int):
+        """adds (``sign=1``) or removes (``sign=-1``) an own order of ours from the cached state"""
+        with self._apply_lock:
+            self._apply_order_locked(order, sign)
+
+    def _apply_order_locked(self, order: Union[TBid, TAsk], sign: int):
+        is_bid = isinstance(order, TBid)
+        side = 'bids' if is_bid else 'asks'
+        mine = getattr(self._user_character, side)
+        if sign > 0:
+            mine = mine + [order]
+        else:
+            mine = [o for o in mine if o.id != order.id]
+        update = {side: mine}
+        if not is_bid:
+            update['amount'] = self._user_character.amount - sign * order.amount
+        self._user_character = self._user_character.copy(update=update)
+        if self._depth is None or order.type != 0:
+            return
+        # the depth is shared through the market cache, so it is copied rather than changed in place
+        levels = {level.price: level.amount for level in getattr(self._depth, side)}
+        levels[order.price] = levels.get(order.price, 0) + sign * order.amount
+        model = TBid if is_bid else TAsk
+        depth = [model(Price=price, Amount=amount) for price, amount in levels.items() if amount > 0]
+        depth.sort(key=lambda level: level.price, reverse=is_bid)
+        self._depth = self._depth.copy(update={side: depth})
+
+    def _apply_created(self, order: Union[TBid, TAsk], result: RString) -> bool:
+        order_id = _order_id(result)
+        if order_id is None:
+            return False
+        self._apply_order(order.copy(update={'id': order_id}), 1)
+        return True
+
+    def _apply_cancelled(self, order: Union[TBid, TAsk], result: RString) -> bool:
+        self._apply_order(order, -1)
+        return True
+
     def create_bid(self, bid: TBid, **kwargs):
         if 'force_updates' in kwargs:
             warn(DeprecationWarning("force_updates is deprecated"))
-        self.invalidates('my_bids', 'all_bids', 'amount')
-        result = create_bid(self.player, self.character, bid)
-        return result
+        apply = partial(self._apply_created, bid) if self._applies(bid) else None
+        return self._order(('my_bids', 'all_bids', 'amount'),
+                           lambda: create_bid(self.player, self.character, bid), apply)
 
     def create_ask(self, ask: TAsk, **kwargs):
         if 'force_updates' in kwargs:
             warn(DeprecationWarning("force_updates is deprecated"))
-        self.invalidates('my_asks', 'all_asks', 'amount')
-        result = create_ask(self.player, self.character, ask)
-        return result
+        apply = partial(self._apply_created, ask) if self._applies(ask) else None
+        return self._order(('my_asks', 'all_asks', 'amount'),
+                           lambda: create_ask(self.player, self.character, ask), apply)
 
     def cancel_bid(self, bid: TBid, **kwargs):
         if 'force_updates' in kwargs:
             warn(DeprecationWarning("force_updates is deprecated"))
-        self.invalidates('my_bids', 'all_bids', 'amount')
-        result = cancel_bid(self.player, bid)
-        return result
+        apply = partial(self._apply_cancelled, bid) if self.optimistic and self._user_character is not None else None
+        return self._order(('my_bids', 'all_bids', 'amount'), lambda: cancel_bid(self.player, bid), apply)
 
     def cancel_ask(self, ask: TAsk, **kwargs):
         if 'force_updates' in kwargs:
             warn(DeprecationWarning("force_updates is deprecated"))
-        self.invalidates('my_asks', 'all_asks', 'amount')
-        result = cancel_ask(self.player, ask)
-        return result
+        apply = partial(self._apply_cancelled, ask) if self.optimistic and self._user_character is not None else None
+        return self._order(('my_asks', 'all_asks', 'amount'), lambda: cancel_ask(self.player, ask), apply)
 
-    def ensure_bids(self, bids: List[TBid], **kwargs):
+    def ensure_bids(self, bids: List[TBid], **kwargs) -> Reconciliation:
         if 'force_updates' in kwargs:
             warn(DeprecationWarning("force_updates is deprecated"))
-        now_bids = self.my_bids
-        now_bids = sorted(now_bids)
-        bids = sorted(bids)
-        while now_bids and bids:
-            if now_bids[0] < bids[0]:
-                logger.info(f"Cancel: {now_bids[0]!r}")
-                self.cancel_bid(now_bids.pop(0))
-            elif now_bids[0] > bids[0]:
-                logger.info(f"Create: {bids[0]!r}")
-                self.create_bid(bids.pop(0))
-            else:
-                logger.info(f"Equals: {now_bids[0]!r}")
-                now_bids.pop(0)
-                bids.pop(0)
-
-        for now_bid in now_bids:
-            self.cancel_bid(now_bid)
-
-        for bid in bids:
-            self.create_bid(bid)
-
-    def ensure_asks(self, asks: List[TAsk], **kwargs):
+        return reconcile(self, 'bids', bids)
+
+    def ensure_asks(self, asks: List[TAsk], **kwargs) -> Reconciliation:
         if 'force_updates' in kwargs:
             warn(DeprecationWarning("force_updates is deprecated"))
-        now_asks = self.my_asks
-        now_asks = sorted(now_asks)
-        asks = sorted(asks)
-        should_create = []
-        while now_asks and asks:
-            if now_asks[0] < asks[0]:
-                logger.info(f"Cancel: {now_asks[0]!r}")
-                self.cancel_ask(now_asks.pop(0))
-            elif now_asks[0] > asks[0]:
-                logger.info(f"Create: {asks[0]!r}")
-                should_create.append(asks.pop(0))
-            else:
-                logger.info(f"Equals: {now_asks[0]!r}")
-                now_asks.pop(0)
-                asks.pop(0)
-
-        for now_ask in now_asks:
-            self.cancel_ask(now_ask)
-
-        for ask in should_create:
-            self.create_ask(ask)
-
-        for ask in asks:
-            self.create_ask(ask)
+        return reconcile(self, 'asks', asks)
 
     @property
     def bids(self):
@@ -0,0 +1,76 @@
+"""one BigC per player and character, shared by traders and strategies
+
+BigCs keep the state they fetched, so they are worth keeping while in use. The
+registry holds at most ``capacity`` of them, drops the least recently used one
+beyond that, and drops any not asked for within ``idle``.
+"""
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from time import monotonic
+from typing import *
+
+from .bigc import BigC
+from .player import Player
+
+__all__ = ['BigCRegistry', 'big_c_registry']
+
+
+class BigCRegistry:
+    capacity: int
+    idle: Optional[timedelta]
+
+    def __init__(self, capacity: int = 4096, *, idle: Optional[timedelta] = timedelta(hours=1)):
+        self.capacity = capacity
+        self.idle = idle
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: 'OrderedDict[Tuple[Player, int], Tuple[float, BigC]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, player: Player, cid: int, **kwargs) -> BigC:
+        """the BigC of ``player`` on ``cid``; ``kwargs`` for :class:`BigC` only apply to one created here"""
+        key = player, cid
+        now = monotonic()
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self.hits += 1
+                big_c = entry[1]
+            else:
+                self.misses += 1
+                big_c = BigC(player, cid, **kwargs)
+            self._entries[key] = now, big_c
+            self._evict(now)
+        return big_c
+
+    def _evict(self, now: float):
+        oldest = now - self.idle.total_seconds() if self.idle is not None else None
+        while self._entries:
+            last_used, _ = next(iter(self._entries.values()))
+            if len(self._entries) <= self.capacity and (oldest is None or last_used >= oldest):
+                break
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def purge(self, cid: int, player: Optional[Player] = None) -> int:
+        """drops the BigCs of ``cid``, of all players unless one is given, returns how many"""
+        with self._lock:
+            keys = [key for key in self._entries if key[1] == cid and (player is None or key[0] is player)]
+            for key in keys:
+                del self._entries[key]
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+
+big_c_registry = BigCRegistry()
@@ -0,0 +1,225 @@
+"""recording of Player traffic, and an offline tinygrail replaying it
+
+Record::
+
+    cassette = Cassette()
+    player = Player(identity, cassette=cassette)
+    ...  # trade as usual
+    cassette.save('session.jsonl.gz')
+
+Replay::
+
+    player = Player('', cassette=OfflineTinygrail.load('session.jsonl.gz'))
+
+Only method, path, request body, status and response body are kept; cookies and
+the identity are never written to disk.
+"""
+import gzip
+import itertools
+import json
+import re
+import threading
+from collections import defaultdict
+from typing import *
+
+import requests
+
+__all__ = ['Interaction', 'Cassette', 'OfflineTinygrail']
+
+
+class Interaction(NamedTuple):
+    method: str
+    path: str
+    body: Optional[str]  # request json, serialized
+    status: int
+    content: str
+
+
+def _dumps_body(data) -> Optional[str]:
+    return None if data is None else json.dumps(data, separators=(',', ':'), sort_keys=True)
+
+
+def _make_response(status: int, content: Union[str, bytes]) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response._content = content.encode('utf-8') if isinstance(content, str) else content
+    return response
+
+
+class Cassette:
+    replaying: ClassVar[bool] = False
+    interactions: List[Interaction]
+
+    def __init__(self, interactions: Iterable[Interaction] = ()):
+        self.interactions = list(interactions)
+        self._lock = threading.Lock()
+
+    def record(self, method: str, path: str, data, response: requests.Response):
+        self.record_content(method, path, data, response.status_code, response.content)
+
+    def record_content(self, method: str, path: str, data, status: int, content: bytes):
+        interaction = Interaction(method, path, _dumps_body(data), status, content.decode('utf-8', errors='replace'))
+        with self._lock:
+            self.interactions.append(interaction)
+
+    def replay(self, method: str, path: str, data) -> requests.Response:
+        raise NotImplementedError("a plain cassette only records")
+
+    def save(self, path):
+        with self._lock, gzip.open(path, 'wt', encoding='utf-8') as fp:
+            for interaction in self.interactions:
+                fp.write(json.dumps(interaction, ensure_ascii=False, separators=(',', ':')))
+                fp.write('\n')
+
+    @classmethod
+    def load(cls, path):
+        with gzip.open(path, 'rt', encoding='utf-8') as fp:
+            return cls(Interaction(*json.loads(line)) for line in fp if line.strip())
+
+
+_USER_CHARACTER = re.compile(r"chara/user/(?P<cid>\d+)")
+_DEPTH = re.compile(r"chara/depth/(?P<cid>\d+)")
+_CREATE = re.compile(r"chara/(?P<side>bid|ask)/(?P<cid>\d+)/(?P<price>[\d.]+)/(?P<amount>\d+)(?P<dark>/true)?")
+_CANCEL = re.compile(r"chara/(?P<side>bid|ask)/cancel/(?P<oid>\d+)")
+
+
+class OfflineTinygrail(Cassette):
+    """Serves recorded responses, and keeps order book state for order endpoints.
+
+    Repeated requests are answered in recorded order, repeating the last answer
+    once exhausted. ``chara/user/{cid}`` and ``chara/depth/{cid}`` start from their
+    first recording and then follow ``chara/bid``, ``chara/ask`` and their
+    cancels, which match against the recorded depth. Requests never recorded
+    get a ``State: 1`` answer, surfacing as ``ServerSentError``.
+    """
+    replaying: ClassVar[bool] = True
+
+    def __init__(self, interactions: Iterable[Interaction] = ()):
+        super().__init__(interactions)
+        self._answers: DefaultDict[Tuple[str, str, Optional[str]], List[Interaction]] = defaultdict(list)
+        self._cursors: DefaultDict[Tuple[str, str, Optional[str]], int] = defaultdict(int)
+        for interaction in self.interactions:
+            self._answers[interaction.method, interaction.path, interaction.body].append(interaction)
+        self._users: Dict[int, dict] = {}
+        self._depths: Dict[int, dict] = {}
+        self._orders: Dict[Tuple[str, int], int] = {}  # (side, order id) -> cid
+        self._order_ids = itertools.count(1 << 30)
+
+    def replay(self, method: str, path: str, data) -> requests.Response:
+        with self._lock:
+            if method == 'GET' and (m := _USER_CHARACTER.fullmatch(path)):
+                return self._ok(self._user(int(m['cid'])))
+            if method == 'GET' and (m := _DEPTH.fullmatch(path)):
+                return self._ok(self._depth_view(int(m['cid'])))
+            if method == 'POST' and (m := _CREATE.fullmatch(path)):
+                return self._create(m['side'], int(m['cid']), float(m['price']), int(m['amount']),
+                                    1 if m['dark'] else 0)
+            if method == 'POST' and (m := _CANCEL.fullmatch(path)):
+                return self._cancel(m['side'], int(m['oid']))
+            return self._recorded(method, path, _dumps_body(data))
+
+    @staticmethod
+    def _ok(value):
+        return _make_response(200, json.dumps({"State": 0, "Value": value}, ensure_ascii=False))
+
+    @staticmethod
+    def _error(message):
+        return _make_response(200, json.dumps({"State": 1, "Message": message}, ensure_ascii=False))
+
+    def _recorded(self, method, path, body):
+        key = method, path, body
+        answers = self._answers.get(key)
+        if not answers:
+            return self._error(f"not in cassette: {method} {path}")
+        cursor = self._cursors[key]
+        self._cursors[key] = min(cursor + 1, len(answers) - 1)
+        return _make_response(answers[cursor].status, answers[cursor].content)
+
+    def _first_value(self, path):
+        for interaction in self._answers.get(('GET', path, None), []):
+            try:
+                value = json.loads(interaction.content)['Value']
+            except (ValueError, KeyError, TypeError):
+                continue
+            if isinstance(value, dict):
+                return value
+        return None
+
+    def _user(self, cid):
+        if cid not in self._users:
+            user = self._first_value(f"chara/user/{cid}") or {}
+            self._users[cid] = {"Bids": list(user.get("Bids", [])), "Asks": list(user.get("Asks", [])),
+                                "AskHistory": list(user.get("AskHistory", [])),
+                                "BidHistory": list(user.get("BidHistory", [])),
+                                "Amount": user.get("Amount", 0)}
+            for side, orders in (('bid', self._users[cid]["Bids"]), ('ask', self._users[cid]["Asks"])):
+                for order in orders:
+                    if order.get("Id") is not None:
+                        self._orders[side, order["Id"]] = cid
+        return self._users[cid]
+
+    def _depth(self, cid):
+        if cid not in self._depths:
+            depth = self._first_value(f"chara/depth/{cid}") or {}
+            mine = {(order["Price"], order["Amount"])
+                    for order in self._user(cid)["Bids"] + self._user(cid)["Asks"]}
+            # the book of everybody else, own orders are added back when served
+            self._depths[cid] = {
+                "Asks": [dict(o) for o in depth.get("Asks", []) if (o["Price"], o["Amount"]) not in mine],
+                "Bids": [dict(o) for o in depth.get("Bids", []) if (o["Price"], o["Amount"]) not in mine],
+            }
+        return self._depths[cid]
+
+    def _depth_view(self, cid):
+        depth, user = self._depth(cid), self._user(cid)
+        strip = ("Price", "Amount", "Type")
+        return {
+            "Asks": sorted(depth["Asks"] + [{k: o[k] for k in strip if k in o} for o in user["Asks"]],
+                           key=lambda o: o["Price"]),
+            "Bids": sorted(depth["Bids"] + [{k: o[k] for k in strip if k in o} for o in user["Bids"]],
+                           key=lambda o: -o["Price"]),
+        }
+
+    def _create(self, side, cid, price, amount, dark):
+        user, depth = self._user(cid), self._depth(cid)
+        if side == 'ask':
+            if user["Amount"] < amount:
+                return self._error("持仓数量不足")
+            user["Amount"] -= amount
+            counter = sorted((o for o in depth["Bids"] if o["Price"] >= price), key=lambda o: -o["Price"])
+        else:
+            counter = sorted((o for o in depth["Asks"] if o["Price"] <= price), key=lambda o: o["Price"])
+        rest = amount
+        for order in counter:
+            if not rest:
+                break
+            filled = min(rest, order["Amount"])
+            order["Amount"] -= filled
+            rest -= filled
+            if side == 'bid':
+                user["Amount"] += filled
+            history = {"Amount": filled, "Price": order["Price"], "Id": next(self._order_ids),
+                       "CharacterId": cid, "TradeTime": "2020-01-01T00:00:00", "Type": 0}
+            user["BidHistory" if side == 'bid' else "AskHistory"].insert(0, history)
+        book = "Bids" if side == 'ask' else "Asks"
+        depth[book] = [o for o in depth[book] if o["Amount"] > 0]
+        oid = next(self._order_ids)
+        if rest:
+            user["Bids" if side == 'bid' else "Asks"].append(
+                {"Id": oid, "Price": price, "Amount": rest, "Type": dark})
+            self._orders[side, oid] = cid
+        return _make_response(200, json.dumps({"State": 0, "Value": str(oid)}))
+
+    def _cancel(self, side, oid):
+        cid = self._orders.pop((side, oid), None)
+        if cid is None:
+            return self._error("委托不存在")
+        user = self._user(cid)
+        key = "Bids" if side == 'bid' else "Asks"
+        for order in user[key]:
+            if order.get("Id") == oid:
+                user[key].remove(order)
+                if side == 'ask':
+                    user["Amount"] += order["Amount"]
+                break
+        return _make_response(200, json.dumps({"State": 0, "Value": "取消成功"}, ensure_ascii=False))
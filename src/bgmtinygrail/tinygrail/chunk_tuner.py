@@ -0,0 +1,47 @@
+"""chunk sizes of batched requests, adapted to how long chunks take
+
+Response size and server time of a batch grow with the number of items in it,
+so sizing by observed seconds per item keeps a chunk at about ``target``
+seconds, well inside the read timeout. A failed chunk halves the size.
+"""
+import threading
+from typing import *
+
+__all__ = ['ChunkTuner', 'character_list_tuner']
+
+
+class ChunkTuner:
+    size: int
+    seconds_per_item: Optional[float]
+
+    def __init__(self, initial=1000, *, minimum=50, maximum=5000, target=2.0, smoothing=0.3):
+        self.size = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.target = target
+        self.smoothing = smoothing
+        self.seconds_per_item = None
+        self._lock = threading.Lock()
+
+    def _clamp(self, size):
+        return max(self.minimum, min(self.maximum, int(size)))
+
+    def observe(self, items: int, seconds: float):
+        if items <= 0:
+            return
+        with self._lock:
+            per_item = seconds / items
+            if self.seconds_per_item is None:
+                self.seconds_per_item = per_item
+            else:
+                self.seconds_per_item += self.smoothing * (per_item - self.seconds_per_item)
+            if self.seconds_per_item > 0:
+                self.size = self._clamp(self.target / self.seconds_per_item)
+
+    def failed(self):
+        with self._lock:
+            self.size = self._clamp(self.size // 2)
+
+
+# chara/list, shared by every player as they hit the same server
+character_list_tuner = ChunkTuner()
@@ -0,0 +1,71 @@
+"""process-wide cache of market data that is the same for every player
+
+Character info, charts and depth of a character do not depend on who asks, so
+BigCs of different accounts share one copy here. Entries expire after a short
+TTL, and trades drop the entries of the traded character right away.
+"""
+import threading
+from collections import OrderedDict
+from time import monotonic
+from typing import *
+
+__all__ = ['MarketCache', 'market_cache']
+
+_T = TypeVar('_T')
+
+# seconds; BigC token intervals still decide how often a BigC asks at all
+DEFAULT_TTL = {
+    'character': 2.0,
+    'depth': 2.0,
+    'charts': 86400.0,
+}
+# what a bid, ask or cancel on a character changes
+TRADE_KINDS = ('character', 'depth')
+
+
+class MarketCache:
+    ttl: Dict[str, float]
+
+    def __init__(self, ttl: Dict[str, float] = None, *, max_entries: int = 4096):
+        self.ttl = dict(DEFAULT_TTL if ttl is None else ttl)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Tuple[str, int], Tuple[float, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, kind: str, cid: int, fetch: Callable[[], _T]) -> _T:
+        key = kind, cid
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+        value = fetch()
+        self.put(kind, cid, value)
+        return value
+
+    def put(self, kind: str, cid: int, value: Any):
+        key = kind, cid
+        with self._lock:
+            self._entries[key] = monotonic() + self.ttl.get(kind, 0.0), value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, cid: int, *kinds: str):
+        with self._lock:
+            for kind in kinds or self.ttl:
+                self._entries.pop((kind, cid), None)
+
+    def traded(self, cid: int):
+        self.invalidate(cid, *TRADE_KINDS)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+market_cache = MarketCache()
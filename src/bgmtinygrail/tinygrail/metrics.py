@@ -0,0 +1,172 @@
+"""per-endpoint call counts, latencies, bytes and errors of Player requests
+
+URLs are folded into endpoint templates, e.g. ``chara/depth/{cid}``, so that the
+numbers of different characters add up. Latency is wall time of a single attempt,
+rate limiting included, as that is what a tick pays for.
+"""
+import json
+import re
+import threading
+from bisect import bisect_left
+from typing import *
+
+__all__ = ['endpoint_template', 'EndpointStats', 'Metrics', 'default_metrics']
+
+_TEMPLATES = [(re.compile(pattern), template) for pattern, template in [
+    (r"chara/\d+", "chara/{cid}"),
+    (r"chara/depth/\d+", "chara/depth/{cid}"),
+    (r"chara/charts/\d+/[\d-]+", "chara/charts/{cid}/{date}"),
+    (r"chara/user/\d+", "chara/user/{cid}"),
+    (r"chara/user/\d+/[^/]+/false", "chara/user/{cid}/{user}/false"),
+    (r"chara/users/\d+/\d+/\d+", "chara/users/{cid}/{page}/{size}"),
+    (r"chara/(bid|ask)/\d+/[\d.]+/\d+(/true)?", r"chara/\1/{cid}/{price}/{amount}\2"),
+    (r"chara/(bid|ask)/cancel/\d+", r"chara/\1/cancel/{id}"),
+    (r"chara/auction/\d+/[\d.]+/\d+", "chara/auction/{cid}/{price}/{amount}"),
+    (r"chara/initial/\d+", "chara/initial/{ico_id}"),
+    (r"chara/(asks|bids)/0/\d+/\d+", r"chara/\1/0/{page}/{size}"),
+    (r"chara/(mri|mvi|rai)/\d+/\d+", r"chara/\1/{page}/{size}"),
+    (r"chara/user/(chara|temple|initial)/0/\d+/\d+", r"chara/user/\1/0/{page}/{size}"),
+    (r"chara/user/chara/blueleaf/\d+/\d+", "chara/user/chara/blueleaf/{page}/{size}"),
+    (r"chara/user/balance/\d+/\d+", "chara/user/balance/{page}/{size}"),
+    (r"event/daily/count/\d+", "event/daily/count/{n}"),
+    (r"magic/chaos/\d+", "magic/chaos/{cid}"),
+    (r"magic/guidepost/\d+/\d+", "magic/guidepost/{cid}/{target}"),
+    (r"magic/stardust/\d+/\d+/\d+/\w+", "magic/stardust/{cid}/{target}/{amount}/{temple}"),
+]]
+_NUMBERS = re.compile(r"(?<=/)\d[\d.]*(?=/|$)")
+
+
+def endpoint_template(path: str) -> str:
+    for pattern, template in _TEMPLATES:
+        m = pattern.fullmatch(path)
+        if m:
+            return m.expand(template)
+    return _NUMBERS.sub("{n}", path)
+
+
+# upper bounds in seconds, Prometheus style
+BUCKETS = (0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, float('inf'))
+
+
+class EndpointStats:
+    __slots__ = ('count', 'errors', 'bytes', 'seconds', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.errors: Dict[str, int] = {}
+        self.bytes = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(BUCKETS)
+
+    def copy(self):
+        c = EndpointStats()
+        c.count, c.errors, c.bytes, c.seconds, c.buckets = (
+            self.count, dict(self.errors), self.bytes, self.seconds, list(self.buckets))
+        return c
+
+    def __sub__(self, other: 'EndpointStats'):
+        c = EndpointStats()
+        c.count = self.count - other.count
+        c.errors = {k: v - other.errors.get(k, 0) for k, v in self.errors.items() if v - other.errors.get(k, 0)}
+        c.bytes = self.bytes - other.bytes
+        c.seconds = self.seconds - other.seconds
+        c.buckets = [a - b for a, b in zip(self.buckets, other.buckets)]
+        return c
+
+    def quantile(self, q):
+        """upper bound of the bucket holding the q-quantile"""
+        if not self.count:
+            return 0.0
+        rank, seen = q * self.count, 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return bound
+        return BUCKETS[-1]
+
+    def as_dict(self):
+        return {'count': self.count, 'errors': dict(self.errors), 'bytes': self.bytes, 'seconds': self.seconds,
+                'buckets': dict(zip(map(str, BUCKETS), self.buckets))}
+
+
+class Metrics:
+    stats: Dict[Tuple[str, str], EndpointStats]
+
+    def __init__(self):
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, method: str, path: str, seconds: float, nbytes: int = 0, error: BaseException = None):
+        key = method, endpoint_template(path)
+        with self._lock:
+            try:
+                s = self.stats[key]
+            except KeyError:
+                s = self.stats[key] = EndpointStats()
+            s.count += 1
+            s.bytes += nbytes
+            s.seconds += seconds
+            s.buckets[bisect_left(BUCKETS, seconds)] += 1
+            if error is not None:
+                name = type(error).__name__
+                s.errors[name] = s.errors.get(name, 0) + 1
+
+    def snapshot(self) -> 'Metrics':
+        m = Metrics()
+        with self._lock:
+            m.stats = {k: v.copy() for k, v in self.stats.items()}
+        return m
+
+    def __sub__(self, other: 'Metrics') -> 'Metrics':
+        m = Metrics()
+        for key, s in self.snapshot().stats.items():
+            d = s - other.stats[key] if key in other.stats else s
+            if d.count:
+                m.stats[key] = d
+        return m
+
+    def as_dict(self):
+        with self._lock:
+            return {f"{method} {endpoint}": s.as_dict() for (method, endpoint), s in sorted(self.stats.items())}
+
+    def json(self) -> str:
+        return json.dumps(self.as_dict(), ensure_ascii=False)
+
+    def prometheus(self, prefix='tinygrail') -> str:
+        lines = [
+            f"# TYPE {prefix}_requests_total counter",
+            f"# TYPE {prefix}_request_errors_total counter",
+            f"# TYPE {prefix}_response_bytes_total counter",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        with self._lock:
+            items = sorted((k, v.copy()) for k, v in self.stats.items())
+        for (method, endpoint), s in items:
+            labels = f'method="{method}",endpoint="{endpoint}"'
+            lines.append(f"{prefix}_requests_total{{{labels}}} {s.count}")
+            for error, n in sorted(s.errors.items()):
+                lines.append(f'{prefix}_request_errors_total{{{labels},error="{error}"}} {n}')
+            lines.append(f"{prefix}_response_bytes_total{{{labels}}} {s.bytes}")
+            cumulative = 0
+            for bound, n in zip(BUCKETS, s.buckets):
+                cumulative += n
+                le = "+Inf" if bound == float('inf') else repr(float(bound))
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f"{prefix}_request_duration_seconds_sum{{{labels}}} {s.seconds}")
+            lines.append(f"{prefix}_request_duration_seconds_count{{{labels}}} {s.count}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self, top=5) -> str:
+        """one line, busiest endpoints by total time first"""
+        with self._lock:
+            items = sorted(self.stats.items(), key=lambda kv: -kv[1].seconds)
+        count = sum(s.count for _, s in items)
+        seconds = sum(s.seconds for _, s in items)
+        errors = sum(sum(s.errors.values()) for _, s in items)
+        nbytes = sum(s.bytes for _, s in items)
+        busiest = ", ".join(f"{endpoint} {s.count}x {s.seconds:.2f}s p90<={s.quantile(0.9)}s"
+                            for (_, endpoint), s in items[:top])
+        return f"{count} requests, {errors} errors, {nbytes / 1024:.0f} KiB, {seconds:.2f}s | {busiest}"
+
+
+default_metrics = Metrics()
@@ -0,0 +1,151 @@
+"""validation-free construction of models from trusted responses
+
+Only plain shapes are supported: scalars, datetimes, nested models, ``Optional``,
+``List`` and ``Union`` of those. Anything else, or data that does not fit, raises
+:class:`UntrustedData` so that the caller can fall back to full validation.
+"""
+from datetime import datetime
+from typing import *
+
+from pydantic import BaseModel
+from pydantic.datetime_parse import parse_datetime
+from pydantic.fields import ModelField, SHAPE_LIST, SHAPE_SINGLETON
+
+__all__ = ['UntrustedData', 'trusted_construct']
+
+_MT = TypeVar("_MT", bound=BaseModel)
+_Converter = Callable[[Any], Any]
+
+
+class UntrustedData(ValueError):
+    pass
+
+
+def _to_int(v):
+    if type(v) is int:
+        return v
+    if type(v) is float and v.is_integer():
+        return int(v)
+    raise UntrustedData(v)
+
+
+def _to_float(v):
+    if type(v) is float:
+        return v
+    if type(v) is int:
+        return float(v)
+    raise UntrustedData(v)
+
+
+def _to_str(v):
+    if type(v) is str:
+        return v
+    raise UntrustedData(v)
+
+
+def _to_bool(v):
+    if type(v) is bool:
+        return v
+    raise UntrustedData(v)
+
+
+def _to_datetime(v):
+    try:
+        return datetime.fromisoformat(v)
+    except (TypeError, ValueError):
+        pass
+    try:
+        return parse_datetime(v)
+    except (TypeError, ValueError):
+        raise UntrustedData(v) from None
+
+
+_SCALARS: Dict[type, _Converter] = {
+    int: _to_int,
+    float: _to_float,
+    str: _to_str,
+    bool: _to_bool,
+    datetime: _to_datetime,
+}
+
+# model -> [(name, alias, converter, required, default)], None when unsupported
+_plans: Dict[Type[BaseModel], Optional[List[Tuple[str, str, _Converter, bool, Any]]]] = {}
+
+
+def _converter(field: ModelField) -> _Converter:
+    if field.shape == SHAPE_LIST:
+        item = _converter(field.sub_fields[0])
+
+        def convert(v):
+            if type(v) is not list:
+                raise UntrustedData(v)
+            return [item(x) for x in v]
+    elif field.shape == SHAPE_SINGLETON and field.sub_fields:
+        members = [_converter(f) for f in field.sub_fields]
+
+        def convert(v):
+            for member in members:
+                try:
+                    return member(v)
+                except UntrustedData:
+                    pass
+            raise UntrustedData(v)
+    elif field.shape == SHAPE_SINGLETON and isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+        model = field.type_
+
+        def convert(v):
+            return trusted_construct(model, v)
+    elif field.shape == SHAPE_SINGLETON and field.type_ in _SCALARS:
+        convert = _SCALARS[field.type_]
+    else:
+        raise UntrustedData(f"unsupported field {field!r}")
+
+    if not field.allow_none:
+        return convert
+
+    def convert_optional(v):
+        return None if v is None else convert(v)
+
+    return convert_optional
+
+
+def _plan(model: Type[BaseModel]):
+    try:
+        return _plans[model]
+    except KeyError:
+        pass
+    plan = None
+    if not (model.__validators__ or model.__pre_root_validators__ or model.__post_root_validators__
+            or getattr(model, '__private_attributes__', None)):
+        try:
+            plan = [(name, field.alias, _converter(field), field.required, field.default)
+                    for name, field in model.__fields__.items()]
+        except UntrustedData:
+            pass
+    _plans[model] = plan
+    return plan
+
+
+def trusted_construct(model: Type[_MT], data) -> _MT:
+    plan = _plan(model)
+    if plan is None:
+        raise UntrustedData(f"{model.__name__} cannot be constructed without validation")
+    if type(data) is not dict:
+        raise UntrustedData(data)
+    values = {}
+    defaulted = []
+    for name, alias, convert, required, default in plan:
+        try:
+            values[name] = convert(data[alias])
+        except KeyError:
+            if required:
+                raise UntrustedData(f"{model.__name__}.{name} is missing") from None
+            values[name] = default
+            defaulted.append(name)
+    fields_set = set(values)
+    fields_set.difference_update(defaulted)
+    # what BaseModel.construct does, minus its per-call bookkeeping
+    m = model.__new__(model)
+    object.__setattr__(m, '__dict__', values)
+    object.__setattr__(m, '__fields_set__', fields_set)
+    return m
@@ -0,0 +1,68 @@
+"""fetching of ``{page}/{size}`` endpoints, a bounded window of pages at a time
+
+The first page tells the total; the remaining pages are then fetched concurrently,
+at most ``window`` of them in flight or waiting to be consumed, and items come
+out in page order.
+"""
+import asyncio
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import *
+
+__all__ = ['PAGE_SIZE', 'WINDOW', 'paginate', 'aio_paginate']
+
+_T = TypeVar('_T')
+
+PAGE_SIZE = 200
+WINDOW = 4
+
+# (page, page size) -> (total items, items of the page)
+_Fetch = Callable[[int, int], Tuple[int, List[_T]]]
+_AioFetch = Callable[[int, int], Awaitable[Tuple[int, List[_T]]]]
+
+
+def _page_count(total, page_size):
+    return -(-total // page_size)
+
+
+def paginate(fetch: _Fetch, *, page_size: int = None, window: int = None) -> Iterator[_T]:
+    page_size, window = page_size or PAGE_SIZE, window or WINDOW
+    total, items = fetch(1, page_size)
+    yield from items
+    pages = _page_count(total, page_size)
+    if pages <= 1:
+        return
+    with ThreadPoolExecutor(max_workers=window, thread_name_prefix='paginate') as executor:
+        pending = deque()
+        next_page = 2
+        try:
+            while pending or next_page <= pages:
+                while next_page <= pages and len(pending) < window:
+                    pending.append(executor.submit(fetch, next_page, page_size))
+                    next_page += 1
+                _, items = pending.popleft().result()
+                yield from items
+        finally:
+            for future in pending:
+                future.cancel()
+
+
+async def aio_paginate(fetch: _AioFetch, *, page_size: int = None, window: int = None) -> AsyncIterator[_T]:
+    page_size, window = page_size or PAGE_SIZE, window or WINDOW
+    total, items = await fetch(1, page_size)
+    for item in items:
+        yield item
+    pages = _page_count(total, page_size)
+    pending = deque()
+    next_page = 2
+    try:
+        while pending or next_page <= pages:
+            while next_page <= pages and len(pending) < window:
+                pending.append(asyncio.ensure_future(fetch(next_page, page_size)))
+                next_page += 1
+            _, items = await pending.popleft()
+            for item in items:
+                yield item
+    finally:
+        for future in pending:
+            future.cancel()
@@ -1,16 +1,34 @@
+import asyncio
 import http.cookies
+import json
+import re
+import threading
+import time
 from json import JSONDecodeError
 from typing import *
 
 import aiohttp
 import requests
 from pydantic import BaseModel, ValidationError
+from requests.exceptions import ReadTimeout, ConnectionError
 
+from .cassette import Cassette
+from .metrics import Metrics, default_metrics
 from .model import RErrorMessage
+from .model._trusted import UntrustedData, trusted_construct
+from .rate_limit import Priority, TokenBucket, host_bucket
+from .single_flight import SingleFlight, default_single_flight
+from .transport import Transport, default_transport
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
 
 _MT = TypeVar("_MT", bound=BaseModel)
 
-__all__ = ['APIResponseSchemeNotMatch', 'ServerNotReachable', 'ServerSentError', 'Player', 'dummy_player']
+__all__ = ['APIResponseSchemeNotMatch', 'ServerNotReachable', 'ServerSentError', 'Player', 'dummy_player',
+           'RETRY_ON', 'AIO_RETRY_ON']
 
 
 class APIResponseSchemeNotMatch(ValueError):
@@ -30,22 +48,46 @@ class ServerSentError(Exception):
         self.message = message
 
 
+# responses of these do not depend on who is asking, so players may share them
+_PUBLIC_URL = re.compile(r"chara/(?:\d+|depth/\d+|charts/\d+/[\d-]+|topweek"
+                         r"|users/\d+/\d+/\d+|(?:mri|mvi|rai)/\d+/\d+)")
+
+# errors worth another attempt of a request
+RETRY_ON = (ServerNotReachable, ReadTimeout, ConnectionError)
+AIO_RETRY_ON = (ServerNotReachable, asyncio.TimeoutError, aiohttp.ClientConnectionError)
+
+
 class Player:
-    def __init__(self, identity, on_identity_refresh=None, api_host="https://tinygrail.com/api/"):
+    def __init__(self, identity, on_identity_refresh=None, api_host="https://tinygrail.com/api/", *,
+                 transport: Transport = None, rate_limit: TokenBucket = None,
+                 single_flight: SingleFlight = None, cassette: Cassette = None,
+                 metrics: Metrics = None):
         self.identity = identity
         self.on_identity_refresh = []
         if callable(on_identity_refresh):
             self.on_identity_refresh.append(on_identity_refresh)
         self.api_host = api_host
+        self.transport = transport or default_transport
+        self.rate_limit = rate_limit
+        self.single_flight = single_flight or default_single_flight
+        self.cassette = cassette
+        self.metrics = metrics or default_metrics
         self._session = None
         self._aio_session = None
+        self._lock = threading.Lock()  # players are shared by the workers of a daemon
 
     @property
     def session(self):
         if self._session is not None:
             return self._session
+        with self._lock:
+            if self._session is None:
+                self._session = self._new_session()
+        return self._session
 
+    def _new_session(self):
         session = requests.Session()
+        self.transport.mount(session)
 
         session.cookies['.AspNetCore.Identity.Application'] = self.identity
 
@@ -54,8 +96,6 @@ class Player:
             'Content-Type': 'application/json',
         }
 
-        self._session = session
-
         return session
 
     def _process_url(self, url):
@@ -66,22 +106,25 @@ class Player:
         else:
             return self.api_host + url
 
-    def _process_response(self, response, *, as_model=None):
-        if 500 <= response.status_code < 600:
-            raise ServerNotReachable(response.status_code)
-        new_identity = response.cookies.get('.AspNetCore.Identity.Application', domain='tinygrail.com')
-        if new_identity is not None:
+    def _refresh_identity(self, new_identity):
+        # concurrent responses bring the same new identity, callbacks run once for it
+        if new_identity is None or new_identity == self.identity:
+            return
+        with self._lock:
+            if new_identity == self.identity:
+                return
             self.identity = new_identity
             for f in self.on_identity_refresh:
                 f(new_identity)
 
-        try:
-            rd = response.json()
-        except JSONDecodeError:
-            raise APIResponseSchemeNotMatch(response, None) from None
-
+    def _process_data(self, response, rd, *, as_model=None, trusted=False):
         if as_model is None:
             return rd
+        if trusted:
+            try:
+                return trusted_construct(as_model, rd)
+            except UntrustedData:
+                pass
         try:
             return as_model(**rd)
         except ValidationError as e:
@@ -96,18 +139,130 @@ class Player:
             except ValidationError:
                 raise APIResponseSchemeNotMatch(response, rd) from e
 
-    def get_data(self, url, as_model=None, **kwargs):
+    @staticmethod
+    def _decode(content: bytes, trusted):
+        if trusted and orjson is not None:
+            try:
+                return orjson.loads(content)
+            except orjson.JSONDecodeError:
+                pass  # e.g. NaN, which only the standard decoder accepts
+        return json.loads(content)
+
+    def _process_response(self, response, *, as_model=None, trusted=False):
+        if 500 <= response.status_code < 600:
+            raise ServerNotReachable(response.status_code)
+        self._refresh_identity(response.cookies.get('.AspNetCore.Identity.Application', domain='tinygrail.com'))
+
+        try:
+            rd = self._decode(response.content, trusted)
+        except (JSONDecodeError, UnicodeDecodeError):
+            raise APIResponseSchemeNotMatch(response, None) from None
+
+        return self._process_data(response, rd, as_model=as_model, trusted=trusted)
+
+    async def _aio_process_response(self, response, *, as_model=None, trusted=False):
+        if 500 <= response.status < 600:
+            raise ServerNotReachable(response.status)
+        morsel = response.cookies.get('.AspNetCore.Identity.Application')
+        if morsel is not None:
+            self._refresh_identity(morsel.value)
+
+        try:
+            rd = self._decode(await response.read(), trusted)
+        except (JSONDecodeError, UnicodeDecodeError):
+            raise APIResponseSchemeNotMatch(response, None) from None
+
+        return self._process_data(response, rd, as_model=as_model, trusted=trusted)
+
+    def _flight_key(self, url, as_model, kwargs):
+        if set(kwargs) - {'timeout'}:
+            return None
+        if url.startswith(self.api_host) and _PUBLIC_URL.fullmatch(url, len(self.api_host)):
+            return url, as_model
+        return url, as_model, self
+
+    def _throttle(self, url, priority):
+        if self.rate_limit is not None:
+            self.rate_limit.acquire(priority)
+        bucket = host_bucket(url)
+        if bucket is not None:
+            bucket.acquire(priority)
+
+    async def _aio_throttle(self, url, priority):
+        if self.rate_limit is not None:
+            await self.rate_limit.aio_acquire(priority)
+        bucket = host_bucket(url)
+        if bucket is not None:
+            await bucket.aio_acquire(priority)
+
+    def _relative_path(self, url):
+        return url[len(self.api_host):] if url.startswith(self.api_host) else url
+
+    def _request(self, method, url, priority=Priority.READ, **kwargs):
+        if self.cassette is not None and self.cassette.replaying:
+            return self.cassette.replay(method, self._relative_path(url), kwargs.get('json'))
+        self._throttle(url, priority)
+        response = self.session.request(method, url, **kwargs)
+        if self.cassette is not None:
+            self.cassette.record(method, self._relative_path(url), kwargs.get('json'), response)
+        return response
+
+    def _call(self, method, url, priority, as_model, trusted, kwargs):
+        start = time.perf_counter()
+        nbytes, error = 0, None
+        try:
+            response = self._request(method, url, priority, **kwargs)
+            nbytes = len(response.content)
+            return self._process_response(response, as_model=as_model, trusted=trusted)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.metrics.observe(method, self._relative_path(url), time.perf_counter() - start, nbytes, error)
+
+    async def _aio_call(self, method, url, priority, as_model, trusted, kwargs):
+        start = time.perf_counter()
+        nbytes, error = 0, None
+        try:
+            if self.cassette is not None and self.cassette.replaying:
+                response = self.cassette.replay(method, self._relative_path(url), kwargs.get('json'))
+                nbytes = len(response.content)
+                return self._process_response(response, as_model=as_model, trusted=trusted)
+            await self._aio_throttle(url, priority)
+            async with self.aio_session.request(method, url, **kwargs) as response:
+                content = await response.read()
+                nbytes = len(content)
+                if self.cassette is not None:
+                    self.cassette.record_content(method, self._relative_path(url), kwargs.get('json'),
+                                                 response.status, content)
+                return await self._aio_process_response(response, as_model=as_model, trusted=trusted)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self.metrics.observe(method, self._relative_path(url), time.perf_counter() - start, nbytes, error)
+
+    def get_data(self, url, as_model=None, *, priority=Priority.READ, trusted=False, fresh=False, **kwargs):
+        # fresh: never joins a request already in flight, which may have started before our own order
         url = self._process_url(url)
-        kwargs.setdefault('timeout', 10)
-        response = self.session.get(url, **kwargs)
-        return self._process_response(response, as_model=as_model)
+        kwargs.setdefault('timeout', self.transport.timeout)
+
+        def attempt():
+            return self._call('GET', url, priority, as_model, trusted, kwargs)
+
+        def retrying():
+            return self.transport.retrying(attempt, RETRY_ON)
 
-    def post_data(self, url, data=None, as_model=None, **kwargs):
+        key = None if fresh else self._flight_key(url, as_model, kwargs)
+        if key is None:
+            return retrying()
+        return self.single_flight.do(key, retrying)
+
+    def post_data(self, url, data=None, as_model=None, *, priority=Priority.WRITE, trusted=False, **kwargs):
         url = self._process_url(url)
-        kwargs.setdefault('timeout', 10)
+        kwargs.setdefault('timeout', self.transport.timeout)
         kwargs.setdefault('json', data)
-        response = self.session.post(url, **kwargs)
-        return self._process_response(response, as_model=as_model)
+        return self._call('POST', url, priority, as_model, trusted, kwargs)
 
     @property
     def aio_session(self):
@@ -115,6 +270,8 @@ class Player:
             return self._aio_session
 
         session = aiohttp.ClientSession(
+            connector=self.transport.aio_connector(),
+            timeout=self.transport.aio_timeout,
             cookies=http.cookies.SimpleCookie({'.AspNetCore.Identity.Application': self.identity}),
             headers={
                 'User-Agent': 'bgmtinygrail/beta',
@@ -126,5 +283,31 @@ class Player:
 
         return session
 
+    async def aio_get_data(self, url, as_model=None, *, priority=Priority.READ, trusted=False, fresh=False,
+                           **kwargs):
+        url = self._process_url(url)
+
+        def attempt():
+            return self._aio_call('GET', url, priority, as_model, trusted, kwargs)
+
+        def retrying():
+            return self.transport.aio_retrying(attempt, AIO_RETRY_ON)
+
+        key = None if fresh else self._flight_key(url, as_model, kwargs)
+        if key is None:
+            return await retrying()
+        return await self.single_flight.aio_do(key, retrying)
+
+    async def aio_post_data(self, url, data=None, as_model=None, *, priority=Priority.WRITE, trusted=False,
+                            **kwargs):
+        url = self._process_url(url)
+        kwargs.setdefault('json', data)
+        return await self._aio_call('POST', url, priority, as_model, trusted, kwargs)
+
+    async def aio_close(self):
+        if self._aio_session is not None:
+            await self._aio_session.close()
+            self._aio_session = None
+
 
 dummy_player = Player('')
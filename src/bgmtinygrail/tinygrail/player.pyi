@@ -1,3 +1,4 @@
+import threading
 from typing import *
 
 import aiohttp
@@ -5,6 +6,12 @@ import requests
 from pydantic import BaseModel
 from requests import Response
 
+from .cassette import Cassette
+from .metrics import Metrics
+from .rate_limit import Priority, TokenBucket
+from .single_flight import SingleFlight
+from .transport import Transport
+
 _MT = TypeVar("_MT", bound=BaseModel)
 
 
@@ -22,43 +29,122 @@ class ServerSentError(Exception):
     message: str
 
 
+RETRY_ON: Tuple[Type[BaseException], ...]
+AIO_RETRY_ON: Tuple[Type[BaseException], ...]
+
+
 class Player:
     identity: str
     on_identity_refresh: List[Callable[[str], None]]
     api_host: str
+    transport: Transport
+    rate_limit: Optional[TokenBucket]
+    single_flight: SingleFlight
+    cassette: Optional[Cassette]
+    metrics: Metrics
     _session: Optional[requests.Session]
     _aio_session: Optional[aiohttp.ClientSession]
+    _lock: threading.Lock
 
     def __init__(self,
                  identity: str,
                  on_identity_refresh: Callable[[str], None] = None,
-                 api_host: Optional[str] = "https://tinygrail.com/api/"): ...
+                 api_host: Optional[str] = "https://tinygrail.com/api/",
+                 *,
+                 transport: Optional[Transport] = None,
+                 rate_limit: Optional[TokenBucket] = None,
+                 single_flight: Optional[SingleFlight] = None,
+                 cassette: Optional[Cassette] = None,
+                 metrics: Optional[Metrics] = None): ...
 
     @property
     def session(self) -> requests.Session: ...
 
+    def _new_session(self) -> requests.Session: ...
+
+    def _refresh_identity(self, new_identity: Optional[str]) -> None: ...
+
+    @overload
+    def _process_data(self, response: Any, rd: dict, *, as_model: Type[_MT], trusted: bool = False) -> _MT: ...
+
     @overload
-    def _process_response(self, response: Response, *, as_model: Type[_MT]) -> _MT: ...
+    def _process_data(self, response: Any, rd: dict, *, as_model: None = None, trusted: bool = False) -> dict: ...
+
+    @staticmethod
+    def _decode(content: bytes, trusted: bool) -> Any: ...
 
     @overload
-    def _process_response(self, response: Response, *, as_model: None = None) -> dict: ...
+    def _process_response(self, response: Response, *, as_model: Type[_MT], trusted: bool = False) -> _MT: ...
+
+    @overload
+    def _process_response(self, response: Response, *, as_model: None = None, trusted: bool = False) -> dict: ...
 
     def _process_url(self, url: str) -> str: ...
 
+    def _flight_key(self, url: str, as_model: Optional[Type[BaseModel]], kwargs: dict) -> Optional[tuple]: ...
+
+    def _throttle(self, url: str, priority: Priority) -> None: ...
+
+    async def _aio_throttle(self, url: str, priority: Priority) -> None: ...
+
+    def _relative_path(self, url: str) -> str: ...
+
+    def _request(self, method: str, url: str, priority: Priority = Priority.READ, **kwargs) -> Response: ...
+
+    def _call(self, method: str, url: str, priority: Priority, as_model: Optional[Type[BaseModel]], trusted: bool,
+              kwargs: dict) -> Any: ...
+
+    async def _aio_call(self, method: str, url: str, priority: Priority, as_model: Optional[Type[BaseModel]],
+                        trusted: bool, kwargs: dict) -> Any: ...
+
+    @overload
+    def get_data(self, url: str, as_model: Type[_MT],
+                 *, priority: Priority = Priority.READ, trusted: bool = False, fresh: bool = False,
+                 **kwargs) -> _MT: ...
+
     @overload
-    def get_data(self, url: str, as_model: Type[_MT], **kwargs) -> _MT: ...
+    def get_data(self, url: str, as_model: None = None,
+                 *, priority: Priority = Priority.READ, trusted: bool = False, fresh: bool = False,
+                 **kwargs) -> dict: ...
 
     @overload
-    def get_data(self, url: str, as_model: None = None, **kwargs) -> dict: ...
+    def post_data(self, url, data, as_model: Type[_MT],
+                  *, priority: Priority = Priority.WRITE, trusted: bool = False, **kwargs) -> _MT: ...
 
     @overload
-    def post_data(self, url, data, as_model: Type[_MT], **kwargs) -> _MT: ...
+    def post_data(self, url, data, as_model: None = None,
+                  *, priority: Priority = Priority.WRITE, trusted: bool = False, **kwargs) -> dict: ...
 
     @overload
-    def post_data(self, url, data, as_model: None = None, **kwargs) -> dict: ...
+    async def _aio_process_response(self, response: aiohttp.ClientResponse, *,
+                                    as_model: Type[_MT], trusted: bool = False) -> _MT: ...
+
+    @overload
+    async def _aio_process_response(self, response: aiohttp.ClientResponse, *,
+                                    as_model: None = None, trusted: bool = False) -> dict: ...
 
     @property
     def aio_session(self) -> aiohttp.ClientSession: ...
 
+    @overload
+    async def aio_get_data(self, url: str, as_model: Type[_MT],
+                           *, priority: Priority = Priority.READ, trusted: bool = False, fresh: bool = False,
+                           **kwargs) -> _MT: ...
+
+    @overload
+    async def aio_get_data(self, url: str, as_model: None = None,
+                           *, priority: Priority = Priority.READ, trusted: bool = False, fresh: bool = False,
+                           **kwargs) -> dict: ...
+
+    @overload
+    async def aio_post_data(self, url, data, as_model: Type[_MT],
+                            *, priority: Priority = Priority.WRITE, trusted: bool = False, **kwargs) -> _MT: ...
+
+    @overload
+    async def aio_post_data(self, url, data, as_model: None = None,
+                            *, priority: Priority = Priority.WRITE, trusted: bool = False, **kwargs) -> dict: ...
+
+    async def aio_close(self) -> None: ...
+
 
 dummy_player: Player
@@ -0,0 +1,89 @@
+"""finding what orders fill at from the depth, instead of probing with orders
+
+Placing and cancelling 1-share asks costs three requests a step. The depth
+shows the same counter orders at once, so one order is placed from it and its
+outcome checked. Hidden orders do not show in the depth; when the outcome does
+not match what the depth promised, the probing is still there to fall back on.
+"""
+import logging
+from typing import *
+
+from .bigc import BigC
+from .model import TAsk, TBid
+
+__all__ = ['Fill', 'sell_fill', 'buy_fill', 'fast_sell', 'probe_sell', 'fast_buy', 'probe_buy']
+
+logger = logging.getLogger('price_discovery')
+
+
+class Fill(NamedTuple):
+    price: float  # limit of the one order taking all of it
+    amount: int
+
+
+def sell_fill(bids: Iterable[TBid], amount: int, low: float) -> Fill:
+    """what an ask of up to ``amount``, at no less than ``low``, sells to the ``bids``"""
+    price, filled = low, 0
+    for bid in sorted(bids, key=lambda b: b.price, reverse=True):
+        if filled >= amount or bid.price < low:
+            break
+        price = bid.price
+        filled += min(bid.amount, amount - filled)
+    return Fill(price, filled)
+
+
+def buy_fill(asks: Iterable[TAsk], price: float) -> Fill:
+    """what a bid at ``price`` buys from the ``asks``"""
+    return Fill(price, sum(ask.amount for ask in asks if ask.price <= price))
+
+
+def probe_sell(big_c: BigC, amount: int, low: float, high: float) -> int:
+    """sells one share at a time at golden section pins between ``low`` and ``high``, returns how many are left"""
+    while amount:
+        pin = round(0.618 * high + 0.382 * low, 2)
+        if pin == high or pin == low:
+            break
+        big_c.ensure_asks([TAsk(Price=pin, Amount=1)])
+        if big_c.my_asks:
+            big_c.ensure_asks([])
+            high = pin
+        else:
+            low = pin
+            amount -= 1
+    return amount
+
+
+def fast_sell(big_c: BigC, amount: int, low: float, high: float) -> int:
+    """sells to the bids at no less than ``low`` with one ask, returns how many are left
+
+    Probes when the ask did not fill as the depth showed.
+    """
+    fill = sell_fill(big_c.all_bids, amount, low)
+    if not fill.amount:
+        return amount
+    big_c.ensure_asks([TAsk(Price=fill.price, Amount=fill.amount)])
+    unfilled = sum(ask.amount for ask in big_c.my_asks)
+    if unfilled:
+        logger.info(f"#{big_c.character:<5} | {unfilled} of {fill.amount} unsold at {fill.price}, probing")
+        big_c.ensure_asks([])
+        return probe_sell(big_c, amount - fill.amount + unfilled, low, high)
+    return amount - fill.amount
+
+
+def probe_buy(big_c: BigC, price: float, amount: int = 100):
+    """bids at ``price`` with doubling amounts until a bid stays on the market"""
+    while not big_c.my_bids:
+        big_c.ensure_bids([TBid(Price=price, Amount=amount)])
+        amount *= 2
+
+
+def fast_buy(big_c: BigC, price: float, margin: int = 100):
+    """buys all asks at no more than ``price`` with one bid, ``margin`` more than the depth shows stays on the market
+
+    Probes when nothing stays, that is when there were hidden asks.
+    """
+    fill = buy_fill(big_c.all_asks, price)
+    big_c.ensure_bids([TBid(Price=price, Amount=fill.amount + margin)])
+    if not big_c.my_bids:
+        logger.info(f"#{big_c.character:<5} | {fill.amount + margin} all bought at {price}, probing")
+        probe_buy(big_c, price, (fill.amount + margin) * 2)
@@ -0,0 +1,98 @@
+"""client-side token buckets, per host and per account"""
+import asyncio
+import threading
+from enum import IntEnum
+from time import monotonic
+from typing import *
+from urllib.parse import urlsplit
+
+__all__ = ['Priority', 'TokenBucket', 'host_rates', 'configure_host', 'host_bucket']
+
+
+class Priority(IntEnum):
+    WRITE = 0  # bids, asks, cancels
+    READ = 1
+    BACKGROUND = 2  # bulk scans like all_holders, iter_history
+
+
+class TokenBucket:
+    rate: float  # tokens per second
+    burst: int
+
+    def __init__(self, rate: float, burst: int):
+        if rate <= 0 or burst < 1:
+            raise ValueError("rate must be positive and burst at least 1")
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last = monotonic()
+        self._waiting = [0] * len(Priority)
+        self._cond = threading.Condition()
+
+    def _refill(self):
+        now = monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _take(self, priority: Priority) -> float:
+        """takes a token and returns 0, or returns seconds to wait before trying again"""
+        self._refill()
+        if any(self._waiting[:priority]):
+            return 1 / self.rate
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return 0
+        return (1 - self._tokens) / self.rate
+
+    def acquire(self, priority: Priority = Priority.READ):
+        with self._cond:
+            wait = self._take(priority)
+            if not wait:
+                return
+            self._waiting[priority] += 1
+            try:
+                while wait:
+                    self._cond.wait(wait)
+                    wait = self._take(priority)
+            finally:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+    async def aio_acquire(self, priority: Priority = Priority.READ):
+        with self._cond:
+            wait = self._take(priority)
+            if not wait:
+                return
+            self._waiting[priority] += 1
+        try:
+            while wait:
+                await asyncio.sleep(wait)
+                with self._cond:
+                    wait = self._take(priority)
+        finally:
+            with self._cond:
+                self._waiting[priority] -= 1
+                self._cond.notify_all()
+
+
+# host -> (rate, burst), `None` disables limiting for that host
+host_rates: Dict[str, Optional[Tuple[float, int]]] = {
+    'tinygrail.com': (10, 20),
+}
+_host_buckets: Dict[str, Optional[TokenBucket]] = {}
+_host_buckets_lock = threading.Lock()
+
+
+def configure_host(host: str, rate: Optional[float], burst: int = 1):
+    with _host_buckets_lock:
+        host_rates[host] = None if rate is None else (rate, burst)
+        _host_buckets.pop(host, None)
+
+
+def host_bucket(url: str) -> Optional[TokenBucket]:
+    host = urlsplit(url).hostname or url
+    with _host_buckets_lock:
+        if host not in _host_buckets:
+            rate = host_rates.get(host)
+            _host_buckets[host] = None if rate is None else TokenBucket(*rate)
+        return _host_buckets[host]
@@ -0,0 +1,98 @@
+"""turning the orders of a character into the wanted ones with as few operations as possible
+
+Orders are compared per price level, by the total amount at a price. Orders
+already on a level are kept as long as they fit, so they keep their place in the
+queue; a level short of its amount gets one order of the difference. There is no
+endpoint to change an order, so shrinking a level still cancels.
+
+Cancels run first, then creates, as creates may need the balance or the shares
+cancels free. Operations of one phase run concurrently.
+"""
+import logging
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import *
+
+from .model import TAsk, TBid
+
+__all__ = ['Op', 'Reconciliation', 'plan', 'reconcile', 'RECONCILE_WORKERS']
+
+logger = logging.getLogger('reconcile')
+
+RECONCILE_WORKERS = 4
+
+Order = Union[TBid, TAsk]
+
+
+class Op(NamedTuple):
+    kind: str  # 'cancel' or 'create'
+    order: Order
+
+    def __repr__(self):
+        return f"{self.kind} {self.order.amount}@{self.order.price}"
+
+
+class Reconciliation(NamedTuple):
+    ops: List[Op]
+    kept: int  # orders left as they were
+    seconds: float
+
+    def __str__(self):
+        return f"{len(self.ops)} ops, {self.kept} kept in {self.seconds:.3f}s: {self.ops!r}"
+
+
+def _levels(orders: Iterable[Order]) -> DefaultDict[Tuple[float, int], List[Order]]:
+    levels = defaultdict(list)
+    for order in orders:
+        levels[order.price, order.type].append(order)
+    return levels
+
+
+def plan(current: List[Order], target: List[Order], model: Type[Order] = TBid) -> Tuple[List[Op], int]:
+    """operations turning ``current`` into ``target``, cancels first, and how many orders are kept"""
+    now = _levels(current)
+    wanted = {key: sum(order.amount for order in orders) for key, orders in _levels(target).items()}
+    cancels, creates, kept = [], [], 0
+    for key in sorted(now.keys() | wanted.keys()):
+        price, order_type = key
+        want = wanted.get(key, 0)
+        have = 0
+        for order in sorted(now.get(key, ()), key=lambda o: o.amount, reverse=True):
+            if have + order.amount <= want:
+                have += order.amount
+                kept += 1
+            else:
+                cancels.append(Op('cancel', order))
+        if want > have:
+            creates.append(Op('create', model(Price=price, Amount=want - have, Type=order_type)))
+    return cancels + creates, kept
+
+
+def _run(calls: List[Callable[[], Any]], workers: int):
+    if len(calls) <= 1 or workers <= 1:
+        for call in calls:
+            call()
+        return
+    with ThreadPoolExecutor(max_workers=min(workers, len(calls))) as executor:
+        futures = [executor.submit(call) for call in calls]
+    # all have finished here, the first error is raised
+    for future in futures:
+        future.result()
+
+
+def reconcile(big_c, side: str, target: List[Order], *, workers: int = None) -> Reconciliation:
+    """makes the ``side`` (``'bids'`` or ``'asks'``) of own orders of ``big_c`` match ``target``"""
+    workers = RECONCILE_WORKERS if workers is None else workers
+    start = time.monotonic()
+    if side == 'bids':
+        current, cancel, create, model = big_c.my_bids, big_c.cancel_bid, big_c.create_bid, TBid
+    else:
+        current, cancel, create, model = big_c.my_asks, big_c.cancel_ask, big_c.create_ask, TAsk
+    ops, kept = plan(current, target, model)
+    _run([lambda o=op.order: cancel(o) for op in ops if op.kind == 'cancel'], workers)
+    _run([lambda o=op.order: create(o) for op in ops if op.kind == 'create'], workers)
+    result = Reconciliation(ops, kept, time.monotonic() - start)
+    if ops:
+        logger.info(f"#{big_c.character:<5} {side}: {result}")
+    return result
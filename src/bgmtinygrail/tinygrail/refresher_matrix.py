@@ -1,5 +1,7 @@
+from array import array
 from collections import defaultdict
-from datetime import datetime, timedelta
+from datetime import timedelta
+from time import monotonic
 from typing import *
 from weakref import WeakMethod
 
@@ -12,19 +14,33 @@ class InvalidRefreshToken(ValueError):
 
 
 class RefreshMatrix:
+    """tokens of cached data, each filled by a refresher, stale after its interval
+
+    ``last_refresh`` holds :func:`time.monotonic` stamps. A refresher fills every
+    token it is registered for, so refreshing several tokens runs each distinct
+    refresher once. Intervals apply from the next refresh on.
+    """
     tokens: Set[Token]
-    last_refresh: DefaultDict[Token, Optional[datetime]]
-    interval: DefaultDict[Token, Optional[timedelta]]
-    refresher_pairs: List[Tuple[Token, 'WeakMethod[Refresher]']]
+    last_refresh: Dict[Token, float]
+    interval: Dict[Token, Optional[timedelta]]
+    default_interval: Optional[timedelta]
 
     def __init__(self, tokens: List[str], *,
-                 default_interval: timedelta = timedelta(2),
+                 default_interval: Optional[timedelta] = timedelta(2),
                  allow_new_token_on_register: bool = False):
         self.tokens = set(tokens)
-        self.last_refresh = defaultdict(lambda: None)
-        self.interval = defaultdict(lambda: default_interval)
-        self.refresher_pairs = []
+        self.last_refresh = {}
+        self.interval = {}
+        self.default_interval = default_interval
         self.allow_new_token_on_register = allow_new_token_on_register
+        self._refreshers: List['WeakMethod[Refresher]'] = []
+        self._refreshers_of: DefaultDict[Token, List[int]] = defaultdict(list)  # token -> refresher indices
+        self._tokens_of: List[List[Token]] = []  # refresher index -> tokens
+        self._fresh_until: Dict[Token, float] = {}
+
+    @property
+    def refresher_pairs(self) -> List[Tuple[Token, 'WeakMethod[Refresher]']]:
+        return [(token, self._refreshers[i]) for token, indices in self._refreshers_of.items() for i in indices]
 
     def more_tokens(self, *tokens):
         self.tokens.update(tokens)
@@ -35,31 +51,107 @@ class RefreshMatrix:
                 self.tokens.add(token)
             else:
                 raise InvalidRefreshToken(f"Token `{token}` is not a registered token")
-        self.refresher_pairs.append((token, WeakMethod(func)))
+        ref = WeakMethod(func)
+        try:
+            i = self._refreshers.index(ref)
+        except ValueError:
+            i = len(self._refreshers)
+            self._refreshers.append(ref)
+            self._tokens_of.append([])
+        self._refreshers_of[token].append(i)
+        self._tokens_of[i].append(token)
 
     def batch_register(self, batches: List[Tuple[Token, Refresher]]):
         for token, func in batches:
             self.register_refresher(token, func)
 
+    def _refresher(self, token: Token) -> Tuple[int, Refresher]:
+        for i in self._refreshers_of.get(token, ()):
+            refresher = self._refreshers[i]()
+            if refresher is not None:
+                return i, refresher
+        raise InvalidRefreshToken(f"Token `{token}` does not have a refresher")
+
+    def is_stale(self, token: Token) -> bool:
+        return self._fresh_until.get(token, -1.0) < monotonic()
+
     def refreshes(self, *tokens: Token):
         for token in tokens:
-            last_refresh = self.last_refresh.get(token, None)
-            interval = self.interval.get(token, None)
-            if last_refresh is None or (interval is not None
-                                        and last_refresh + interval < datetime.now()):
-                refreshers: List[Refresher] = [wfr() for tok, wfr in self.refresher_pairs
-                                               if tok == token and wfr() is not None]
-                if not refreshers:
-                    raise InvalidRefreshToken(f"Token `{token}` does not have a refresher")
-                refresher = refreshers[0]
+            # checked one by one, as an earlier refresher may have filled this token too
+            if self._fresh_until.get(token, -1.0) < monotonic():
+                i, refresher = self._refresher(token)
                 refresher()
-                for update_token, weak_func_ref in self.refresher_pairs:
-                    if weak_func_ref() == refresher:
-                        self.last_refresh[update_token] = datetime.now()
+                self.mark_refreshed(*self._tokens_of[i])
+
+    def mark_refreshed(self, *tokens: Token):
+        now = monotonic()
+        for token in tokens:
+            self.last_refresh[token] = now
+            interval = self.interval.get(token, self.default_interval)
+            self._fresh_until[token] = now + interval.total_seconds() if interval is not None else float('inf')
 
     def invalidates(self, *tokens):
         for token in tokens:
             self.last_refresh.pop(token, None)
+            self._fresh_until.pop(token, None)
+
+
+class RefreshLayout:
+    """tokens, refreshers and intervals of a class, shared by all its instances
+
+    Refreshers are method names looked up on the instance, so an instance keeps
+    nothing but the array from :meth:`deadlines`, a :func:`time.monotonic` stamp
+    per token until which it is fresh. Refreshing several tokens runs each
+    distinct refresher once, as with :class:`RefreshMatrix`.
+    """
+    __slots__ = ('tokens', 'index', 'interval', '_refresher', '_siblings', '_seconds')
+
+    def __init__(self, refreshers: List[Tuple[Token, str]], *,
+                 interval: Dict[Token, Optional[timedelta]] = None,
+                 default_interval: Optional[timedelta] = timedelta(2)):
+        interval = interval or {}
+        self.tokens = tuple(token for token, _ in refreshers)
+        self.index = {token: i for i, token in enumerate(self.tokens)}
+        if len(self.index) != len(self.tokens):
+            raise InvalidRefreshToken("Tokens can only have one refresher in a layout")
+        self._refresher = tuple(name for _, name in refreshers)
+        self._siblings = tuple(tuple(j for j, other in enumerate(self._refresher) if other == name)
+                               for name in self._refresher)
+        self.interval = {token: interval.get(token, default_interval) for token in self.tokens}
+        self._seconds = tuple(float('inf') if self.interval[token] is None else self.interval[token].total_seconds()
+                              for token in self.tokens)
+
+    def deadlines(self) -> 'array[float]':
+        return array('d', [-1.0]) * len(self.tokens)
+
+    def _index(self, token: Token) -> int:
+        try:
+            return self.index[token]
+        except KeyError:
+            raise InvalidRefreshToken(f"Token `{token}` is not a registered token") from None
+
+    def is_stale(self, deadlines: 'array[float]', token: Token) -> bool:
+        return deadlines[self._index(token)] < monotonic()
+
+    def refreshes(self, owner, deadlines: 'array[float]', *tokens: Token):
+        for token in tokens:
+            i = self._index(token)
+            if deadlines[i] < monotonic():
+                getattr(owner, self._refresher[i])()
+                self._mark(deadlines, self._siblings[i])
+
+    def mark_refreshed(self, deadlines: 'array[float]', *tokens: Token, until: float = None):
+        """``until``, a :func:`time.monotonic` stamp, holds the tokens fresh in place of their interval"""
+        self._mark(deadlines, [self._index(token) for token in tokens], until)
+
+    def _mark(self, deadlines: 'array[float]', indices: Iterable[int], until: float = None):
+        now = monotonic()
+        for i in indices:
+            deadlines[i] = now + self._seconds[i] if until is None else until
+
+    def invalidates(self, deadlines: 'array[float]', *tokens: Token):
+        for token in tokens:
+            deadlines[self._index(token)] = -1.0
 
 
 class RefreshMatrixContained(Protocol):
@@ -0,0 +1,70 @@
+"""coalescing of identical concurrent calls"""
+import asyncio
+import threading
+from typing import *
+
+__all__ = ['SingleFlight', 'default_single_flight']
+
+_TV = TypeVar('_TV')
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error: Optional[BaseException] = None
+
+
+class SingleFlight:
+    """Runs at most one call per key at a time; callers arriving meanwhile share its outcome."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Hashable, _Call] = {}
+        self._aio_calls: Dict[Hashable, asyncio.Future] = {}
+
+    def do(self, key: Hashable, func: Callable[[], _TV]) -> _TV:
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+    async def aio_do(self, key: Hashable, func: Callable[[], Awaitable[_TV]]) -> _TV:
+        key = id(asyncio.get_running_loop()), key
+        future = self._aio_calls.get(key)
+        if future is not None:
+            return await asyncio.shield(future)
+        future = self._aio_calls[key] = asyncio.get_running_loop().create_future()
+        try:
+            result = await func()
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # the leader re-raises by itself, mark as retrieved in case nobody followed
+            future.exception()
+            raise
+        finally:
+            del self._aio_calls[key]
+
+
+default_single_flight = SingleFlight()
@@ -0,0 +1,90 @@
+"""connection pooling, timeouts and retries for :class:`Player`"""
+import asyncio
+from time import sleep
+from typing import *
+
+import aiohttp
+from requests.adapters import HTTPAdapter
+
+__all__ = ['Transport', 'default_transport']
+
+_TV = TypeVar('_TV')
+
+
+class Transport:
+    """Shared HTTP settings.
+
+    Every session mounted by the same transport draws from one connection pool,
+    so players on the same host reuse kept-alive connections.
+    ``pool_maxsize`` bounds the connections kept per host.
+    """
+    pool_connections: int
+    pool_maxsize: int
+    connect_timeout: float
+    read_timeout: float
+    retries: int
+    backoff_factor: float
+    backoff_max: float
+
+    def __init__(self, *,
+                 pool_connections: int = 4,
+                 pool_maxsize: int = 16,
+                 connect_timeout: float = 5,
+                 read_timeout: float = 10,
+                 retries: int = 3,
+                 backoff_factor: float = 0.5,
+                 backoff_max: float = 8):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.backoff_max = backoff_max
+        self._adapter = None
+
+    @property
+    def adapter(self) -> HTTPAdapter:
+        if self._adapter is None:
+            self._adapter = HTTPAdapter(pool_connections=self.pool_connections,
+                                        pool_maxsize=self.pool_maxsize,
+                                        max_retries=0)
+        return self._adapter
+
+    @property
+    def timeout(self) -> Tuple[float, float]:
+        return self.connect_timeout, self.read_timeout
+
+    @property
+    def aio_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+
+    def aio_connector(self) -> aiohttp.TCPConnector:
+        return aiohttp.TCPConnector(limit_per_host=self.pool_maxsize)
+
+    def mount(self, session):
+        session.mount('https://', self.adapter)
+        session.mount('http://', self.adapter)
+
+    def backoff(self, attempt: int) -> float:
+        return min(self.backoff_max, self.backoff_factor * (2 ** attempt))
+
+    def retrying(self, func: Callable[[], _TV], retry_on: Tuple[Type[BaseException], ...]) -> _TV:
+        for attempt in range(self.retries):
+            try:
+                return func()
+            except retry_on:
+                sleep(self.backoff(attempt))
+        return func()
+
+    async def aio_retrying(self, func: Callable[[], Awaitable[_TV]],
+                           retry_on: Tuple[Type[BaseException], ...]) -> _TV:
+        for attempt in range(self.retries):
+            try:
+                return await func()
+            except retry_on:
+                await asyncio.sleep(self.backoff(attempt))
+        return await func()
+
+
+default_transport = Transport()
@@ -1,8 +1,8 @@
 import logging
 from abc import ABCMeta, abstractmethod
-from functools import lru_cache
+from typing import *
 
-from ..tinygrail.bigc import BigC
+from ..tinygrail.bigc_registry import big_c_registry
 from ..tinygrail.model import TAsk, TBid
 from ..tinygrail.player import Player
 
@@ -11,9 +11,8 @@ logger = logging.getLogger('trader')
 __all__ = ['ABCTrader', 'TAsk', 'TBid', 'logger']
 
 
-@lru_cache()
-def big_c(player, cid):
-    return BigC(player, cid)
+def big_c(player, cid, optimistic=False, history=None):
+    return big_c_registry.get(player, cid, optimistic=optimistic, history=history)
 
 
 all_traders = {}
@@ -31,14 +30,18 @@ class TraderMeta(ABCMeta):
 
 class ABCTrader(metaclass=TraderMeta):
     player: Player
+    optimistic: bool = False  # see BigC
+    history: Optional[int] = 0  # bid and ask history kept by BigCs, traders do not read it
 
     def __init__(self, player):
         self.player = player
 
     def big_c(self, cid):
-        res = big_c(self.player, cid)
-        res.update()
-        return res
+        return big_c(self.player, cid, self.optimistic, self.history)
+
+    def importance(self, cid) -> float:
+        """weight of ``cid`` when the daemon schedules characters"""
+        return 1.0
 
     @abstractmethod
     def tick(self, cid):
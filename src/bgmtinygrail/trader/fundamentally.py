@@ -1,4 +1,5 @@
 from ._base import *
+from ..tinygrail.price_discovery import fast_buy, fast_sell
 
 
 class FundamentalTrader(ABCTrader):
@@ -55,36 +56,20 @@ class FundamentalTrader(ABCTrader):
         logger.debug(f"fast forward #{cid:<5} | {price}")
         big_c = self.big_c(cid)
         price = price or self._exchange_price(cid)
-        amount = 100
         big_c.ensure_bids([])
-        big_c.update_user_character(ignore_throttle=True)
-        while not big_c.bids:
-            big_c.ensure_bids([TBid(Price=price, Amount=amount)])
-            big_c.update_user_character(ignore_throttle=True)
-            amount *= 2
+        fast_buy(big_c, price)
         big_c.ensure_bids([TBid(Price=price, Amount=100)])
-        big_c.update_user_character(ignore_throttle=True)
 
     def _fast_seller(self, cid, amount=None, low=10, high=100000):
         logger.debug(f"fast seller #{cid:<5} | ({low}-{high}) / {amount}")
         big_c = self.big_c(cid)
-        big_c.ensure_bids([], force_updates='before')
-        big_c.ensure_asks([], force_updates='after')
+        big_c.ensure_bids([])
+        big_c.ensure_asks([])
         if amount is None:
             amount = big_c.amount
-        while amount:
-            pin = round(0.618 * high + 0.382 * low, 2)
-            if pin == high or pin == low:
-                break
-            big_c.ensure_asks([TAsk(Price=pin, Amount=1)], force_updates='after')
-            if big_c.asks:
-                big_c.ensure_asks([], force_updates='after')
-                high = pin
-            else:
-                low = pin
-                amount -= 1
+        amount = fast_sell(big_c, amount, low, high)
         if amount:
-            big_c.ensure_asks([TAsk(Price=low, Amount=amount)], force_updates='after')
+            big_c.ensure_asks([TAsk(Price=low, Amount=amount)])
 
     def _output_balanced(self, cid):
         exchange_price = self._exchange_price(cid)
@@ -45,6 +45,15 @@ class StrategyMap(dict, Dict[int, ABCCharaStrategy]):
         purge_strategy(cid, self.player_id_str)
 
 
+# scheduling weights, characters being traded on weigh more than those left alone
+STRATEGY_IMPORTANCE = {
+    Strategy.IGNORE: 0.5,
+    Strategy.CLOSE_OUT: 2.0,
+    Strategy.BUY_IN: 1.5,
+    Strategy.SHOW_GRACE: 1.5,
+}
+
+
 class StrategicalTrader(ABCTrader):
     strategy_map: Dict[int, ABCCharaStrategy]
     error_time: List[datetime]
@@ -58,6 +67,13 @@ class StrategicalTrader(ABCTrader):
     def update_internal_rate(self):
         self.internal_rate = 0.1
 
+    def importance(self, cid):
+        # dict.get, characters without a strategy are not loaded just for this
+        strategy = dict.get(self.strategy_map, cid)
+        if strategy is None:
+            return 1.0
+        return STRATEGY_IMPORTANCE.get(strategy.strategy, 1.0)
+
     def tick(self, cid):
         now_state = self.strategy_map[cid]
         next_state = now_state.transition()
@@ -0,0 +1,39 @@
+import pytest
+from sqlalchemy import create_engine
+
+from bgmtinygrail.db._base import CacheBase, DbCacheSession, engine_cache
+from bgmtinygrail.tinygrail.cassette import Interaction, OfflineTinygrail
+from bgmtinygrail.tinygrail.market_cache import market_cache
+from market_data import CHARACTER, CHARTS, DEPTH, value
+
+
+@pytest.fixture
+def offline_market():
+    """an offline tinygrail of character 1, given the user character it starts with"""
+    def offline(user):
+        return OfflineTinygrail([
+            Interaction('GET', 'chara/user/1', None, 200, value(user)),
+            Interaction('GET', 'chara/1', None, 200, value(CHARACTER)),
+            Interaction('GET', 'chara/charts/1/2019-08-08', None, 200, value(CHARTS)),
+            Interaction('GET', 'chara/depth/1', None, 200, value(DEPTH)),
+        ])
+
+    return offline
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    market_cache.clear()
+    yield
+    market_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def charts_store(tmp_path):
+    # the stored charts of the working directory stay untouched
+    engine = create_engine(f"sqlite:///{tmp_path / 'cache.db'}")
+    CacheBase.metadata.create_all(engine)
+    DbCacheSession.configure(bind=engine)
+    yield
+    DbCacheSession.configure(bind=engine_cache)
+    engine.dispose()
@@ -0,0 +1,18 @@
+"""market data the offline tinygrail of the tests serves for character 1"""
+import json
+
+__all__ = ['CHARACTER', 'CHARTS', 'DEPTH', 'value']
+
+CHARACTER = {
+    "CharacterId": 1, "Change": 0, "UserTotal": 10, "UserAmount": 2, "AirDate": "2019-08-08T00:00:00",
+    "Asks": 1, "Bids": 2, "Bonus": 0, "Current": 12.5, "Fluctuation": 0.1, "Icon": "i", "Id": 1,
+    "LastDeal": "2020-01-01T12:00:00+08:00", "LastModifier": 0, "LastOrder": "2020-01-01T12:00:00Z",
+    "Level": 1, "MarketValue": 100, "Name": "n", "Price": 10, "Rate": 1.5, "Sacrifices": 0, "State": 3,
+    "SubjectId": None, "Total": 10000, "Type": 0,
+}
+CHARTS = [{"Time": "2019-08-08T00:00:00", "Begin": 10, "End": 10, "Low": 10, "High": 10, "Amount": 1, "Price": 10}]
+DEPTH = {"Asks": [{"Price": 20, "Amount": 3}], "Bids": [{"Price": 8, "Amount": 10}]}
+
+
+def value(v):
+    return json.dumps({"State": 0, "Value": v})
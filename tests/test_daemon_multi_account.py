@@ -0,0 +1,74 @@
+import pytest
+
+from bgmtinygrail.daemon._base import Cadence, TooMuchExceptionsError
+from bgmtinygrail.daemon.multi_account import MultiAccountDaemon
+from bgmtinygrail.daemon.trader_daemon import TraderDaemon
+from bgmtinygrail.model_link.accounts import translate
+from bgmtinygrail.tinygrail.metrics import Metrics
+from bgmtinygrail.tinygrail.player import Player, ServerSentError
+
+
+@pytest.fixture
+def daemon(mocker):
+    mocker.patch('bgmtinygrail.daemon.trader_daemon.sync_asks_collect')
+    mocker.patch('bgmtinygrail.daemon.trader_daemon.BigC.prefetch')
+    accounts = {}
+    for name in ('a', 'b', 'c'):
+        account = accounts[name] = TraderDaemon(Player(name), None, trader_cls=mocker.Mock())
+        account.trader.importance.return_value = 1.0
+        mocker.patch.object(account, '_update_character_due_to_history', return_value=[])
+    d = MultiAccountDaemon(accounts)
+    d.cadence = Cadence(20, 5, 120)
+    d.start()
+    return d
+
+
+def ticked_order(daemon, mocker):
+    order = []
+    for name, account in daemon.accounts.items():
+        mocker.patch.object(account, 'tick', side_effect=lambda name=name: order.append(name))
+    daemon.tick()
+    return order
+
+
+class TestMultiAccount:
+    def test_turns(self, daemon, mocker):
+        assert ticked_order(daemon, mocker) == ['a', 'b', 'c']
+        assert ticked_order(daemon, mocker) == ['b', 'c', 'a']
+
+    def test_budget_shared(self, daemon):
+        daemon.tick_budget = 3.0
+        daemon.tick()
+        assert [account.tick_budget for account in daemon.accounts.values()] == [1.0, 1.0, 1.0]
+
+    def test_busiest_account_sets_cadence(self, daemon):
+        daemon.accounts['b']._update_character_due_to_history.return_value = [1]
+        daemon.tick()
+        assert daemon.cadence.seconds == 5
+
+    def test_error_budget_per_account(self, daemon):
+        failing = daemon.accounts['b']
+        failing.trader.tick.side_effect = ServerSentError(1, "no")
+        for cid in range(10):
+            failing.scheduler.mark_urgent(cid)
+        daemon.accounts['c'].scheduler.mark_urgent(1)
+        daemon.tick()
+        assert daemon.stopped == {'b'}
+        assert daemon.accounts['c'].trader.tick.called
+        assert daemon.error_time == []
+
+    def test_all_stopped(self, daemon):
+        daemon.stopped = set(daemon.accounts)
+        with pytest.raises(TooMuchExceptionsError):
+            daemon.tick()
+
+    def test_wakes_process(self, daemon):
+        daemon.accounts['a'].wake_up()
+        assert daemon._wake.is_set()
+
+    def test_metrics_per_account(self, mocker):
+        mocker.patch('bgmtinygrail.model_link.accounts.user_info')
+        account = mocker.Mock(id=1, friendly_name='a', chii_auth='', ua='', tinygrail_identity='')
+        metrics = Metrics()
+        assert translate(account, metrics=metrics).tinygrail.metrics is metrics
+        assert translate(account).tinygrail.metrics is not metrics
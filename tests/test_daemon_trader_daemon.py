@@ -0,0 +1,244 @@
+import itertools
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from bgmtinygrail.daemon import scheduler as scheduler_module
+from bgmtinygrail.daemon._base import Cadence, TooMuchExceptionsError
+from bgmtinygrail.daemon.history_poller import EventKind, HistoryPoller, classify
+from bgmtinygrail.daemon.scheduler import CharacterScheduler
+from bgmtinygrail.daemon.trader_daemon import TraderDaemon
+from bgmtinygrail.tinygrail import bigc as bigc_module
+from bgmtinygrail.tinygrail import market_cache as market_cache_module
+from bgmtinygrail.tinygrail import refresher_matrix
+from bgmtinygrail.tinygrail.bigc import BigC
+from bgmtinygrail.tinygrail.model import HistoryParser, TCharacter
+from bgmtinygrail.tinygrail.player import Player, ServerSentError
+from market_data import CHARACTER
+
+
+@pytest.fixture
+def daemon(mocker):
+    mocker.patch('bgmtinygrail.daemon.trader_daemon.sync_asks_collect')
+    mocker.patch('bgmtinygrail.daemon.trader_daemon.BigC.prefetch', return_value={})
+    d = TraderDaemon(Player(''), None, trader_cls=mocker.Mock(), workers=4)
+    d.trader.importance.return_value = 1.0
+    mocker.patch.object(d, '_update_character_due_to_history', return_value=[])
+    return d
+
+
+class TestParallelTick:
+    def test_ticks_concurrently(self, daemon):
+        barrier = threading.Barrier(4, timeout=5)
+        daemon.trader.tick.side_effect = lambda cid: barrier.wait()
+        for cid in (1, 2, 3, 4):
+            daemon.scheduler.mark_urgent(cid)
+        daemon.tick()
+        assert sorted(call.args[0] for call in daemon.trader.tick.call_args_list) == [1, 2, 3, 4]
+        assert daemon.urgent_chars == set()
+
+    def test_character_not_ticked_twice(self, daemon):
+        daemon._character_locks[2].acquire()
+        daemon.scheduler.mark_urgent(1)
+        daemon.scheduler.mark_urgent(2)
+        daemon.tick()
+        assert [call.args[0] for call in daemon.trader.tick.call_args_list] == [1]
+        assert daemon.urgent_chars == {2}
+
+    def test_errors_per_worker(self, daemon):
+        daemon.trader.tick.side_effect = ServerSentError(1, "no")
+        for cid in range(10):
+            daemon.scheduler.mark_urgent(cid)
+        with pytest.raises(TooMuchExceptionsError):
+            daemon.tick()
+        assert all(name.startswith('tick') for name in daemon.worker_errors)
+
+    def test_errors_reported(self, daemon, caplog):
+        daemon.workers = 1
+        daemon.trader.tick.side_effect = [ServerSentError(1, "no"), None]
+        daemon.scheduler.mark_urgent(1)
+        daemon.scheduler.mark_urgent(2)
+        daemon.tick()
+        assert "errors by worker: {'MainThread': 1}" in caplog.text
+        caplog.clear()
+        daemon.trader.tick.side_effect = None
+        daemon.tick()
+        assert "errors by worker" not in caplog.text
+
+
+class TestPrefetch:
+    def test_fresh_through_tick(self, mocker):
+        mocker.patch('bgmtinygrail.daemon.trader_daemon.sync_asks_collect')
+        daemon = TraderDaemon(Player(''), None, trader_cls=mocker.Mock())
+        daemon.trader.importance.return_value = 1.0
+        mocker.patch.object(daemon, '_update_character_due_to_history', return_value=[])
+        cids = [1, 2, 3, 4]
+        big_cs = {cid: BigC(daemon.player, cid) for cid in cids}
+        daemon.trader.big_c.side_effect = big_cs.__getitem__
+        daemon.trader.tick.side_effect = lambda cid: (big_cs[cid].rate, big_cs[cid].my_auction_amount)
+        characters = [TCharacter.parse_obj({**CHARACTER, 'Id': cid, 'CharacterId': cid}) for cid in cids]
+        mocker.patch.object(bigc_module, 'batch_character_info', return_value=characters)
+        mocker.patch.object(bigc_module, 'my_auctions', return_value=[])
+        # each character takes longer than the throttle interval
+        clock = itertools.count(0, 3)
+        mocker.patch.object(refresher_matrix, 'monotonic', side_effect=clock)
+        mocker.patch.object(market_cache_module, 'monotonic', side_effect=clock)
+        for cid in cids:
+            daemon.scheduler.mark_urgent(cid)
+        daemon.tick()
+        assert daemon.trader.tick.call_count == 4
+        assert all(big_c.fetches['character_info'] == big_c.fetches['my_auction'] == 0 for big_c in big_cs.values())
+        assert all(big_c.is_stale('ico_or_character') for big_c in big_cs.values())
+
+
+class TestSafeRun:
+    def test_old_errors_forgotten(self, daemon):
+        daemon.error_time = [datetime.now() - timedelta(hours=1)] * 10
+        daemon.trader.tick.side_effect = ServerSentError(1, "no")
+        daemon.safe_run(daemon.trader.tick, 1)
+        assert len(daemon.error_time) == 1
+
+
+class TestScheduler:
+    def test_order(self, mocker):
+        scheduler = CharacterScheduler(idle_per_tick=2)
+        for cid in range(1, 6):
+            scheduler.track(cid)
+        scheduler.set_value(2, 1e6)
+        scheduler.mark_urgent(5)
+        scheduler.set_weight(3, 0.5)
+        mocker.patch.object(scheduler_module, 'monotonic', return_value=scheduler_module.monotonic() + 600)
+        assert scheduler.schedule() == [5, 2, 1]
+        scheduler.ticked(5)
+        assert scheduler.urgent == set() and len(scheduler) == 4
+
+    def test_ticked_not_tracked_again(self):
+        scheduler = CharacterScheduler()
+        scheduler.mark_urgent(1)
+        scheduler.ticked(1)
+        scheduler.set_weight(1, 2.0)
+        scheduler.set_value(1, 10.0)
+        assert 1 not in scheduler
+
+    def test_budget(self, daemon, mocker):
+        daemon.tick_budget = 1.5
+        daemon.workers = 1
+        daemon.scheduler.mark_urgent(1)
+        daemon.scheduler.mark_urgent(2)
+        # a second passes on every look at the clock
+        mocker.patch('bgmtinygrail.daemon.trader_daemon.time.monotonic', side_effect=itertools.count())
+        daemon.tick()
+        assert daemon.trader.tick.call_count == 1
+        assert daemon.urgent_chars == {2}
+
+
+class TestCadence:
+    def test_back_off_and_busy(self):
+        cadence = Cadence(20, 5, 120)
+        for expected in (40, 80, 120, 120):
+            cadence.idle()
+            assert cadence.seconds == expected
+        cadence.busy()
+        assert cadence.seconds == 5
+        fixed = Cadence(20)
+        fixed.idle()
+        assert fixed.seconds == 20
+
+    def test_tick_reports_activity(self, daemon):
+        daemon.cadence = Cadence(20, 5, 120)
+        daemon.tick()
+        assert daemon.cadence.seconds == 40
+        daemon._update_character_due_to_history.return_value = [1]
+        daemon.tick()
+        assert daemon.cadence.seconds == 5
+
+    def test_busy_while_urgent_left(self, daemon, mocker):
+        daemon.cadence = Cadence(20, 5, 120)
+        daemon.cadence.idle()
+        daemon.tick_budget = 1.5
+        daemon.workers = 1
+        daemon.scheduler.mark_urgent(1)
+        daemon.scheduler.mark_urgent(2)
+        mocker.patch('bgmtinygrail.daemon.trader_daemon.time.monotonic', side_effect=itertools.count())
+        daemon.tick()
+        assert daemon.urgent_chars == {2}
+        assert daemon.cadence.seconds == 5
+
+    def test_wake_up(self, daemon):
+        started = time.monotonic()
+        threading.Timer(0.05, daemon.wake_up).start()
+        daemon._wait(10)
+        assert time.monotonic() - started < 5
+
+
+def bid_deal(history_id, cid):
+    return HistoryParser(History={
+        "Id": history_id, "UserId": 1, "RelatedId": cid, "Change": -10.0, "Amount": 1, "Balance": 100.0,
+        "LogTime": "2020-01-01T00:00:00", "Type": 4, "State": 0,
+        "Description": f"买入委托(1) #{cid}「name」成交1股"}).history
+
+
+class TestHistoryPoller:
+    def test_classify(self):
+        event = classify(bid_deal(1, 42))
+        assert event.kind is EventKind.BID_DEAL
+        assert event.character_id == 42
+
+    def test_poll_oldest_first(self, mocker):
+        get_history = mocker.patch('bgmtinygrail.daemon.history_poller.get_history',
+                                   return_value=[bid_deal(12, 2), bid_deal(11, 1)])
+        poller = HistoryPoller(Player(''), 10)
+        poller.poll()
+        get_history.assert_called_once_with(poller.player, since_id=10)
+        assert poller.last_history_id == 12
+        assert [event.character_id for event in poller.drain()] == [1, 2]
+        assert poller.drain() == []
+
+    def test_tick_takes_queued_events(self, daemon, mocker):
+        daemon.workers = 1
+        poller = daemon.history_poller = HistoryPoller(Player(''), 0)
+        poller.events.put(classify(bid_deal(1, 7)))
+        ticked = []
+
+        def tick(cid):
+            ticked.append(cid)
+            if cid == 7:
+                # filled while the tick is on
+                poller.events.put(classify(bid_deal(2, 9)))
+
+        daemon.trader.tick.side_effect = tick
+        daemon.scheduler.track(3)
+        daemon.tick()
+        assert ticked == [7, 9, 3]
+        daemon._update_character_due_to_history.assert_not_called()
+
+    def test_event_during_own_tick_kept(self, daemon, mocker):
+        daemon.workers = 2
+        poller = daemon.history_poller = HistoryPoller(Player(''), 0)
+        poller.events.put(classify(bid_deal(1, 7)))
+        daemon.scheduler.mark_urgent(3)
+        queued, resubmitted = threading.Event(), threading.Event()
+
+        def tick(cid):
+            if cid == 7:
+                poller.events.put(classify(bid_deal(2, 7)))
+                queued.set()
+                resubmitted.wait(5)
+            else:
+                queued.wait(5)
+
+        tick_locked = daemon._tick_locked
+
+        def tick_locked_watched(cid):
+            tick_locked(cid)
+            if cid == 7 and daemon.trader.tick.call_count == 2:
+                # 7 is still ticking, so this one is skipped
+                resubmitted.set()
+
+        daemon.trader.tick.side_effect = tick
+        mocker.patch.object(daemon, '_tick_locked', side_effect=tick_locked_watched)
+        daemon.tick()
+        assert sorted(call.args[0] for call in daemon.trader.tick.call_args_list) == [3, 7]
+        assert daemon.urgent_chars == {7}
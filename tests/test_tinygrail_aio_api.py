@@ -0,0 +1,122 @@
+import asyncio
+import json
+
+import pytest
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from bgmtinygrail.tinygrail import aio_api
+from bgmtinygrail.tinygrail.cassette import Cassette, Interaction, OfflineTinygrail
+from bgmtinygrail.tinygrail.player import Player, ServerNotReachable, ServerSentError, APIResponseSchemeNotMatch
+from bgmtinygrail.tinygrail.transport import Transport
+
+
+def run_with_server(routes, coroutine_function):
+    async def runner():
+        app = web.Application()
+        app.add_routes(routes)
+        async with TestServer(app) as server:
+            player = Player('identity', api_host=str(server.make_url('/api/')), transport=Transport(retries=0))
+            try:
+                return await coroutine_function(player)
+            finally:
+                await player.aio_close()
+
+    return asyncio.run(runner())
+
+
+DEPTH = {"State": 0, "Value": {"Asks": [{"Price": 10.0, "Amount": 5}], "Bids": []}}
+
+
+class TestAioApi:
+    def test_depth(self):
+        async def handler(request):
+            assert request.cookies['.AspNetCore.Identity.Application'] == 'identity'
+            return web.json_response(DEPTH)
+
+        result = run_with_server([web.get('/api/chara/depth/42', handler)],
+                                 lambda player: aio_api.depth(player, 42))
+        assert result.asks[0].price == 10.0
+        assert result.asks[0].amount == 5
+        assert result.bids == []
+
+    def test_concurrent_batch_character_info(self):
+        calls = []
+
+        async def handler(request):
+            ids = await request.json()
+            calls.append(ids)
+            return web.json_response({"State": 0, "Value": [
+                {"CharacterId": i, "AirDate": "2020-01-01T00:00:00", "Begin": "2020-01-01T00:00:00",
+                 "Bonus": 0, "End": "2020-01-08T00:00:00", "Icon": "", "Id": i, "Last": "2020-01-01T00:00:00",
+                 "Name": str(i), "State": 0, "Total": 0, "Type": 0, "Users": 0}
+                for i in ids]})
+
+        result = run_with_server([web.post('/api/chara/list', handler)],
+                                 lambda player: aio_api.batch_character_info(player, [1, 2, 3, 4, 5], splits=2))
+        assert sorted(calls) == [[1, 2], [3, 4], [5]]
+        assert [c.character_id for c in result] == [1, 2, 3, 4, 5]
+
+    def test_identity_refresh(self):
+        refreshed = []
+
+        async def handler(request):
+            response = web.json_response(DEPTH)
+            response.set_cookie('.AspNetCore.Identity.Application', 'new-identity')
+            return response
+
+        async def call(player):
+            player.on_identity_refresh.append(refreshed.append)
+            await aio_api.depth(player, 42)
+            return player.identity
+
+        assert run_with_server([web.get('/api/chara/depth/42', handler)], call) == 'new-identity'
+        assert refreshed == ['new-identity']
+
+    def test_server_not_reachable(self):
+        async def handler(request):
+            return web.Response(status=502)
+
+        with pytest.raises(ServerNotReachable) as exc_info:
+            run_with_server([web.get('/api/chara/depth/42', handler)],
+                            lambda player: aio_api.depth(player, 42))
+        assert exc_info.value.status_code == 502
+
+    def test_server_sent_error(self):
+        async def handler(request):
+            return web.json_response({"State": 1, "Message": "尚未参加ICO。"})
+
+        with pytest.raises(ServerSentError) as exc_info:
+            run_with_server([web.get('/api/chara/initial/7', handler)],
+                            lambda player: aio_api.get_my_ico(player, 7))
+        assert exc_info.value.message == "尚未参加ICO。"
+
+    def test_scheme_not_match(self):
+        async def handler(request):
+            return web.Response(text="<html></html>")
+
+        with pytest.raises(APIResponseSchemeNotMatch):
+            run_with_server([web.get('/api/chara/depth/42', handler)],
+                            lambda player: aio_api.depth(player, 42))
+
+
+class TestAioCassette:
+    def test_records(self):
+        cassette = Cassette()
+
+        async def handler(request):
+            return web.json_response(DEPTH)
+
+        async def call(player):
+            player.cassette = cassette
+            return await aio_api.depth(player, 42)
+
+        run_with_server([web.get('/api/chara/depth/42', handler)], call)
+        assert [(i.method, i.path, i.status) for i in cassette.interactions] == [('GET', 'chara/depth/42', 200)]
+
+    def test_replays_offline(self):
+        player = Player('', cassette=OfflineTinygrail([
+            Interaction('GET', 'chara/depth/42', None, 200, json.dumps(DEPTH))]))
+        result = asyncio.run(aio_api.depth(player, 42))
+        assert result.asks[0].price == 10.0
+        assert player._aio_session is None
@@ -0,0 +1,226 @@
+import pytest
+
+from bgmtinygrail.db import charts as db_charts
+from bgmtinygrail.tinygrail import bigc as bigc_module, market_cache as market_cache_module, refresher_matrix
+from bgmtinygrail.tinygrail.bigc import BigC
+from bgmtinygrail.tinygrail.cassette import Interaction, OfflineTinygrail
+from bgmtinygrail.tinygrail.market_cache import MarketCache, market_cache
+from bgmtinygrail.tinygrail.model import RString, TAsk, TBid, TCharacter, TMyAuction
+from bgmtinygrail.tinygrail.player import Player
+from bgmtinygrail.tinygrail.refresher_matrix import InvalidRefreshToken, RefreshMatrix
+from bgmtinygrail.trader import FundamentalTrader
+from market_data import CHARACTER, CHARTS, value
+
+
+@pytest.fixture
+def big_c(offline_market):
+    user = {"Bids": [], "Asks": [{"Id": 5, "Price": 15, "Amount": 3, "Type": 0}],
+            "AskHistory": [], "BidHistory": [], "Amount": 0}
+    return BigC(Player('', cassette=offline_market(user)), 1)
+
+
+class TestLazyRefresh:
+    def test_reads_fetch_once(self, big_c):
+        for _ in range(5):
+            assert big_c.amount == 0
+            assert big_c.my_asks[0].price == 15
+            assert big_c.fundamental == 15
+            assert big_c.initial_price == 10
+        assert big_c.fetches == {'user_character': 1, 'character_info': 1, 'charts': 1}
+
+    def test_trade_invalidates_only_its_tokens(self, big_c):
+        big_c.my_bids, big_c.all_bids, big_c.rate
+        big_c.create_bid(TBid(Price=9, Amount=1))
+        assert big_c.my_bids[0].price == 9
+        assert big_c.all_bids[0].price == 9
+        big_c.rate
+        assert big_c.fetches == {'user_character': 2, 'character_info': 1, 'depth': 2}
+
+    def test_interval(self, big_c, mocker):
+        big_c.amount
+        later = refresher_matrix.monotonic() + BigC.refresh_layout.interval['amount'].total_seconds() * 2
+        mocker.patch.object(refresher_matrix, 'monotonic', return_value=later)
+        big_c.amount
+        big_c.my_asks
+        assert big_c.fetches == {'user_character': 2}
+
+    def test_fundamental_trader_tick(self, big_c, mocker):
+        mocker.patch('bgmtinygrail.trader._base.big_c', return_value=big_c)
+        FundamentalTrader(big_c.player).tick(1)
+        # exchange price matches the ask already there, nothing to do
+        assert big_c.fetches == {'user_character': 1, 'character_info': 1, 'charts': 1}
+
+
+class TestRefreshMatrix:
+    class Holder:
+        def __init__(self):
+            self.calls = []
+            self.refresh_matrix = RefreshMatrix(['a', 'b', 'c'], default_interval=None)
+            self.refresh_matrix.batch_register([('a', self.ab), ('b', self.ab), ('c', self.c)])
+
+        def ab(self):
+            self.calls.append('ab')
+
+        def c(self):
+            self.calls.append('c')
+
+    def test_batch_runs_each_refresher_once(self):
+        holder = self.Holder()
+        holder.refresh_matrix.refreshes('a', 'b', 'c', 'a')
+        assert holder.calls == ['ab', 'c']
+        holder.refresh_matrix.invalidates('b')
+        holder.refresh_matrix.refreshes('a', 'b', 'c')
+        assert holder.calls == ['ab', 'c', 'ab']
+
+    def test_missing_refresher(self):
+        matrix = RefreshMatrix(['a'])
+        with pytest.raises(InvalidRefreshToken):
+            matrix.refreshes('a')
+        with pytest.raises(InvalidRefreshToken):
+            matrix.register_refresher('z', lambda: None)
+
+
+class TestMarketCache:
+    def test_shared_across_players(self, big_c):
+        other = BigC(Player('', cassette=big_c.player.cassette), 1)
+        assert big_c.rate == other.rate
+        assert big_c.all_asks == other.all_asks
+        assert big_c.fetches['character_info'] + other.fetches['character_info'] == 1
+        assert big_c.fetches['depth'] + other.fetches['depth'] == 1
+
+    def test_trade_invalidates_for_everyone(self, big_c):
+        other = BigC(Player('', cassette=big_c.player.cassette), 1)
+        other.all_bids
+        big_c.create_bid(TBid(Price=9, Amount=1))
+        other.invalidates('all_bids')
+        assert other.all_bids[0].price == 9
+        assert other.fetches['depth'] == 2
+
+    def test_explicit_update_fetches(self, big_c):
+        other = BigC(Player('', cassette=big_c.player.cassette), 1)
+        big_c.all_asks
+        big_c.update_depth()
+        big_c.update_character_info()
+        assert big_c.fetches == {'depth': 2, 'character_info': 1}
+        other.all_asks
+        assert other.fetches['depth'] == 0
+
+    def test_trade_fetches_fresh(self, big_c, mocker):
+        fetch_depth = mocker.patch.object(bigc_module, 'depth', wraps=bigc_module.depth)
+        big_c.all_bids
+        big_c.create_bid(TBid(Price=9, Amount=1))
+        big_c.all_bids
+        big_c.invalidates('all_bids')
+        market_cache.clear()
+        big_c.all_bids
+        assert [call.kwargs['fresh'] for call in fetch_depth.call_args_list] == [False, True, False]
+
+    def test_ttl(self, mocker):
+        cache = MarketCache({'depth': 2.0})
+        fetch = mocker.Mock(side_effect=[1, 2])
+        assert cache.get('depth', 1, fetch) == cache.get('depth', 1, fetch) == 1
+        mocker.patch.object(market_cache_module, 'monotonic', return_value=market_cache_module.monotonic() + 3)
+        assert cache.get('depth', 1, fetch) == 2
+        assert (cache.hits, cache.misses) == (1, 2)
+
+
+class TestChartsStore:
+    def test_incremental(self):
+        first = [dict(CHARTS[0]), {**CHARTS[0], "Time": "2020-01-01T00:00:00", "End": 11}]
+        later = [{**CHARTS[0], "Time": "2020-01-01T00:00:00", "End": 12},
+                 {**CHARTS[0], "Time": "2020-01-02T00:00:00", "End": 13}]
+        offline = OfflineTinygrail([
+            Interaction('GET', 'chara/charts/1/2019-08-08', None, 200, value(first)),
+            Interaction('GET', 'chara/charts/1/2020-01-01', None, 200, value(later)),
+        ])
+        big_c = BigC(Player('', cassette=offline), 1)
+        assert [c.end for c in big_c.charts] == [10, 11]
+        market_cache.clear()
+        big_c.invalidates('charts')
+        assert [c.end for c in big_c.charts] == [10, 12, 13]
+        assert db_charts.last_time(1) == "2020-01-02T00:00:00"
+
+    def test_initial_price_from_store(self):
+        big_c = BigC(Player('', cassette=OfflineTinygrail()), 1)
+        db_charts.merge(1, None, [{"time": "2019-08-08T00:00:00", "begin": 7, "end": 7, "low": 7, "high": 7,
+                                   "amount": 1, "price": 7}])
+        assert big_c.initial_price == 7
+        assert big_c.fetches == {}
+
+    def test_initial_price_without_charts(self):
+        offline = OfflineTinygrail([
+            Interaction('GET', 'chara/1', None, 200, value(CHARACTER)),
+            Interaction('GET', 'chara/charts/1/2019-08-08', None, 200, value([])),
+        ])
+        big_c = BigC(Player('', cassette=offline), 1)
+        # level 1: 1 * 100000 / (2500 + 7500)
+        assert big_c.initial_price == 10
+        assert big_c.fetches == {'charts': 1, 'character_info': 1}
+
+
+class TestOptimistic:
+    @pytest.fixture
+    def big_c(self, offline_market):
+        user = {"Bids": [], "Asks": [], "AskHistory": [], "BidHistory": [], "Amount": 5}
+        return BigC(Player('', cassette=offline_market(user)), 1, optimistic=True)
+
+    def test_ask_round_trip_fetches_once(self, big_c):
+        assert big_c.amount == 5
+        big_c.ensure_asks([TAsk(Price=15, Amount=2)])
+        assert [(ask.price, ask.amount) for ask in big_c.my_asks] == [(15, 2)]
+        assert big_c.my_asks[0].id is not None
+        assert big_c.amount == 3
+        assert [ask.price for ask in big_c.all_asks] == [15, 20]
+        big_c.ensure_asks([])
+        assert big_c.my_asks == [] and big_c.amount == 5
+        assert [ask.price for ask in big_c.all_asks] == [20]
+        assert big_c.fetches == {'user_character': 1, 'depth': 1}
+
+    def test_possible_fill_refetches(self, big_c):
+        big_c.amount
+        big_c.create_ask(TAsk(Price=8, Amount=1))
+        assert big_c.amount == 4
+        assert big_c.fetches['user_character'] == 2
+
+    def test_reply_without_id_refetches(self, big_c, mocker):
+        big_c.amount
+        mocker.patch('bgmtinygrail.tinygrail.bigc.create_bid', return_value=RString(State=0, Value="ok"))
+        big_c.create_bid(TBid(Price=5, Amount=1))
+        big_c.my_bids
+        assert big_c.fetches['user_character'] == 2
+
+
+class TestCompact:
+    def test_history_trimmed(self, offline_market):
+        entry = {"Amount": 1, "Price": 10, "Id": 1, "CharacterId": 1, "TradeTime": "2020-01-01T00:00:00", "Type": 0}
+        user = {"Bids": [], "Asks": [], "AskHistory": [entry] * 3, "BidHistory": [entry] * 3, "Amount": 0}
+        big_c = BigC(Player('', cassette=offline_market(user)), 1, history=1)
+        assert len(big_c.my_ask_history) == len(big_c.my_bid_history) == 1
+
+    def test_layout_shared(self, big_c):
+        other = BigC(big_c.player, 2)
+        big_c.amount
+        assert not big_c.is_stale('amount') and other.is_stale('amount')
+        assert not hasattr(big_c, '__dict__')
+        with pytest.raises(InvalidRefreshToken):
+            big_c.refreshes('nothing')
+
+
+class TestPrefetch:
+    def test_character_and_auction(self, big_c, mocker):
+        character = TCharacter.parse_obj(CHARACTER)
+        auction = TMyAuction(Price=3, Amount=4, Bid='2020-01-01T00:00', CharacterId=1, Type=0)
+        batch = mocker.patch.object(bigc_module, 'batch_character_info', return_value=[character])
+        auctions = mocker.patch.object(bigc_module, 'my_auctions', return_value=[auction])
+        others = {}
+        instances = BigC.prefetch(big_c.player, [1, 2], big_cs=lambda cid: big_c if cid == 1 else
+                                  others.setdefault(cid, BigC(big_c.player, cid)))
+        assert batch.call_args[0][1] == auctions.call_args[0][1] == [1, 2]
+        assert instances[1] is big_c
+        assert big_c.rate == 1.5 and big_c.my_auction_amount == 4
+        assert others[2].my_auction_amount == 0 and others[2].is_stale('ico_or_character')
+        assert big_c.fetches == {}
+
+    def test_unknown_token(self, big_c):
+        with pytest.raises(InvalidRefreshToken):
+            BigC.prefetch(big_c.player, [1], ['my_bids'])
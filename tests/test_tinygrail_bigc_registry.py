@@ -0,0 +1,40 @@
+from datetime import timedelta
+
+from bgmtinygrail.tinygrail import bigc_registry as module
+from bgmtinygrail.tinygrail.bigc_registry import BigCRegistry
+from bgmtinygrail.tinygrail.player import Player
+
+
+class TestBigCRegistry:
+    def test_shared_and_lru(self):
+        registry = BigCRegistry(2, idle=None)
+        player = Player('')
+        first = registry.get(player, 1)
+        assert registry.get(player, 1) is first
+        registry.get(player, 2)
+        registry.get(player, 1)
+        registry.get(player, 3)  # 2 is the least recently used
+        assert registry.get(player, 1) is first
+        assert registry.stats() == {'size': 2, 'hits': 3, 'misses': 3, 'evictions': 1}
+        registry.get(player, 2)
+        assert registry.misses == 4
+
+    def test_idle(self, mocker):
+        registry = BigCRegistry(idle=timedelta(minutes=1))
+        player = Player('')
+        registry.get(player, 1)
+        registry.get(player, 2)
+        mocker.patch.object(module, 'monotonic', return_value=module.monotonic() + 120)
+        registry.get(player, 2)
+        assert len(registry) == 1 and registry.evictions == 1
+
+    def test_purge(self):
+        registry = BigCRegistry()
+        alice, bob = Player(''), Player('')
+        registry.get(alice, 1, optimistic=True)
+        registry.get(bob, 1)
+        registry.get(bob, 2)
+        assert registry.get(alice, 1).optimistic
+        assert registry.purge(1, bob) == 1
+        assert registry.purge(1) == 1
+        assert len(registry) == 1
@@ -0,0 +1,98 @@
+import json
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+
+from bgmtinygrail.tinygrail.api import *
+from bgmtinygrail.tinygrail.cassette import Cassette, Interaction, OfflineTinygrail
+from bgmtinygrail.tinygrail.model import TAsk, TBid
+from bgmtinygrail.tinygrail.player import Player, ServerSentError
+
+USER = {"Bids": [], "Asks": [{"Id": 5, "Price": 20, "Amount": 3, "Type": 0}],
+        "AskHistory": [], "BidHistory": [], "Amount": 7}
+DEPTH = {"Asks": [{"Price": 12, "Amount": 4}, {"Price": 20, "Amount": 3}], "Bids": [{"Price": 8, "Amount": 10}]}
+
+
+def make_response(content):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    return response
+
+
+def value(v):
+    return json.dumps({"State": 0, "Value": v})
+
+
+@pytest.fixture
+def offline():
+    return OfflineTinygrail([
+        Interaction('GET', 'chara/user/1', None, 200, value(USER)),
+        Interaction('GET', 'chara/depth/1', None, 200, value(DEPTH)),
+    ])
+
+
+class TestCassette:
+    def test_records_and_round_trips(self, mocker: MockerFixture, tmp_path):
+        cassette = Cassette()
+        player = Player('secret', cassette=cassette)
+        mocker.patch.object(player.session, 'request', side_effect=[
+            make_response(b'{"State": 0, "Value": {"Asks": [], "Bids": []}}'),
+            make_response(b'{"State": 0, "Value": "ok"}'),
+        ])
+        depth(player, 1)
+        create_bid(player, 1, TBid(Price=10, Amount=100))
+        assert [(i.method, i.path) for i in cassette.interactions] == [
+            ('GET', 'chara/depth/1'), ('POST', 'chara/bid/1/10.0/100')]
+        cassette.save(tmp_path / 'c.jsonl.gz')
+        assert Cassette.load(tmp_path / 'c.jsonl.gz').interactions == cassette.interactions
+        assert b'secret' not in (tmp_path / 'c.jsonl.gz').read_bytes()
+
+    def test_replays_in_order(self, mocker: MockerFixture):
+        offline = OfflineTinygrail([
+            Interaction('GET', 'chara/1', None, 200, '{"State": 1, "Message": "first"}'),
+            Interaction('GET', 'chara/1', None, 200, '{"State": 1, "Message": "second"}'),
+        ])
+        player = Player('', cassette=offline)
+        request = mocker.patch.object(player.session, 'request')
+        messages = [player.get_data('chara/1')['Message'] for _ in range(3)]
+        assert messages == ['first', 'second', 'second']
+        request.assert_not_called()
+
+    def test_not_recorded(self):
+        with pytest.raises(ServerSentError):
+            character_info(Player('', cassette=OfflineTinygrail()), 1)
+
+
+class TestOfflineOrders:
+    def test_bid_fills_against_depth(self, offline):
+        player = Player('', cassette=offline)
+        create_bid(player, 1, TBid(Price=15, Amount=6))
+        uc = user_character(player, 1)
+        assert uc.amount == 11
+        assert [(b.price, b.amount) for b in uc.bids] == [(15, 2)]
+        assert [(h.price, h.amount) for h in uc.bid_history] == [(12, 4)]
+        d = depth(player, 1)
+        assert [(a.price, a.amount) for a in d.asks] == [(20, 3)]
+        assert [(b.price, b.amount) for b in d.bids] == [(15, 2), (8, 10)]
+
+    def test_cancel(self, offline):
+        player = Player('', cassette=offline)
+        create_bid(player, 1, TBid(Price=9, Amount=1))
+        bid, = user_character(player, 1).bids
+        cancel_bid(player, bid)
+        assert user_character(player, 1).bids == []
+        with pytest.raises(ServerSentError):
+            cancel_bid(player, bid)
+
+    def test_ask_and_cancel_return_holding(self, offline):
+        player = Player('', cassette=offline)
+        create_ask(player, 1, TAsk(Price=30, Amount=7))
+        uc = user_character(player, 1)
+        assert uc.amount == 0
+        assert sorted((a.price, a.amount) for a in uc.asks) == [(20, 3), (30, 7)]
+        with pytest.raises(ServerSentError):
+            create_ask(player, 1, TAsk(Price=30, Amount=1))
+        cancel_ask(player, uc.asks[0])
+        assert user_character(player, 1).amount == 3
@@ -0,0 +1,66 @@
+import threading
+
+import pytest
+from pytest_mock import MockerFixture
+
+from bgmtinygrail.tinygrail.api import batch_character_info
+from bgmtinygrail.tinygrail.chunk_tuner import ChunkTuner
+from bgmtinygrail.tinygrail.model import RCharacterList
+from bgmtinygrail.tinygrail.player import Player, ServerNotReachable, ServerSentError
+from bgmtinygrail.tinygrail.transport import Transport
+
+
+def ico(i):
+    return {"CharacterId": i, "AirDate": "2020-01-01T00:00:00", "Begin": "2020-01-01T00:00:00", "Bonus": 0,
+            "End": "2020-01-08T00:00:00", "Icon": "", "Id": i, "Last": "2020-01-01T00:00:00", "Name": str(i),
+            "State": 0, "Total": 0, "Type": 0, "Users": 0}
+
+
+@pytest.fixture
+def no_sleep(mocker: MockerFixture):
+    return mocker.patch('bgmtinygrail.tinygrail.transport.sleep')
+
+
+class TestChunkTuner:
+    def test_aims_at_target(self):
+        tuner = ChunkTuner(100, target=2.0, minimum=10, maximum=10000)
+        tuner.observe(100, 0.5)
+        assert tuner.size == 400
+        tuner.observe(400, 4.0)
+        assert 200 < tuner.size < 400
+
+    def test_clamps_and_halves(self):
+        tuner = ChunkTuner(100, target=2.0, minimum=10, maximum=1000)
+        tuner.observe(100, 0.001)
+        assert tuner.size == 1000
+        tuner.failed()
+        assert tuner.size == 500
+        for _ in range(10):
+            tuner.failed()
+        assert tuner.size == 10
+
+
+class TestBatchCharacterInfo:
+    def test_in_order_and_retries_only_failed_chunk(self, mocker: MockerFixture, no_sleep):
+        player = Player('', transport=Transport(retries=2))
+        calls = []
+        lock = threading.Lock()
+
+        def post_data(url, data, **kwargs):
+            with lock:
+                calls.append(tuple(data))
+                if data == [3, 4] and calls.count((3, 4)) == 1:
+                    raise ServerNotReachable(502)
+            return RCharacterList(State=0, Value=[ico(i) for i in data])
+
+        mocker.patch.object(player, 'post_data', side_effect=post_data)
+        result = batch_character_info(player, [1, 2, 3, 4, 5, 6, 7], splits=2, workers=3)
+        assert [c.character_id for c in result] == [1, 2, 3, 4, 5, 6, 7]
+        assert sorted(calls) == [(1, 2), (3, 4), (3, 4), (5, 6), (7,)]
+
+    def test_server_error_not_retried(self, mocker: MockerFixture, no_sleep):
+        player = Player('', transport=Transport(retries=2))
+        mocked = mocker.patch.object(player, 'post_data', side_effect=ServerSentError(1, 'no'))
+        with pytest.raises(ServerSentError):
+            batch_character_info(player, [1], splits=2)
+        assert mocked.call_count == 1
@@ -0,0 +1,71 @@
+import json
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+
+from bgmtinygrail.tinygrail.api import depth, create_bid
+from bgmtinygrail.tinygrail.metrics import Metrics, endpoint_template
+from bgmtinygrail.tinygrail.model import TBid
+from bgmtinygrail.tinygrail.player import Player, ServerSentError
+from bgmtinygrail.tinygrail.transport import Transport
+
+
+def make_response(content):
+    response = requests.Response()
+    response.status_code = 200
+    response._content = content
+    return response
+
+
+class TestEndpointTemplate:
+    @pytest.mark.parametrize('path, template', [
+        ("chara/depth/123", "chara/depth/{cid}"),
+        ("chara/123", "chara/{cid}"),
+        ("chara/bid/1/10.5/100/true", "chara/bid/{cid}/{price}/{amount}/true"),
+        ("chara/ask/cancel/42", "chara/ask/cancel/{id}"),
+        ("chara/user/chara/0/1/300", "chara/user/chara/0/{page}/{size}"),
+        ("chara/user/assets", "chara/user/assets"),
+        ("some/7/thing", "some/{n}/thing"),
+    ])
+    def test_template(self, path, template):
+        assert endpoint_template(path) == template
+
+
+class TestMetrics:
+    def test_player_observes(self, mocker: MockerFixture):
+        metrics = Metrics()
+        player = Player('', metrics=metrics, transport=Transport(retries=0))
+        body = b'{"State": 0, "Value": {"Asks": [], "Bids": []}}'
+        mocker.patch.object(player.session, 'request', side_effect=[
+            make_response(body), make_response(body), make_response(b'{"State": 1, "Message": "no"}')])
+        depth(player, 1)
+        depth(player, 2)
+        with pytest.raises(ServerSentError):
+            create_bid(player, 1, TBid(Price=1, Amount=1))
+        d = metrics.stats['GET', 'chara/depth/{cid}']
+        assert d.count == 2 and d.bytes == 2 * len(body) and d.errors == {}
+        assert metrics.stats['POST', 'chara/bid/{cid}/{price}/{amount}'].errors == {'ServerSentError': 1}
+
+    def test_window(self):
+        metrics = Metrics()
+        metrics.observe('GET', 'chara/1', 0.1)
+        before = metrics.snapshot()
+        metrics.observe('GET', 'chara/2', 0.2)
+        metrics.observe('GET', 'chara/depth/2', 0.2)
+        window = metrics - before
+        assert window.stats['GET', 'chara/{cid}'].count == 1
+        assert window.stats['GET', 'chara/depth/{cid}'].count == 1
+        assert metrics.stats['GET', 'chara/{cid}'].count == 2
+
+    def test_exports(self):
+        metrics = Metrics()
+        metrics.observe('GET', 'chara/1', 0.03, 10)
+        metrics.observe('GET', 'chara/1', 3, 10, ValueError())
+        text = metrics.prometheus()
+        assert 'tinygrail_requests_total{method="GET",endpoint="chara/{cid}"} 2' in text
+        assert 'tinygrail_request_errors_total{method="GET",endpoint="chara/{cid}",error="ValueError"} 1' in text
+        assert 'tinygrail_request_duration_seconds_bucket{method="GET",endpoint="chara/{cid}",le="0.05"} 1' in text
+        assert 'tinygrail_request_duration_seconds_bucket{method="GET",endpoint="chara/{cid}",le="+Inf"} 2' in text
+        data = json.loads(metrics.json())
+        assert data['GET chara/{cid}']['bytes'] == 20
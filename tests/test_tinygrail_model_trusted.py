@@ -0,0 +1,77 @@
+import json
+
+import pytest
+import requests
+
+from bgmtinygrail.tinygrail.model import *
+from bgmtinygrail.tinygrail.model._trusted import UntrustedData, trusted_construct
+from bgmtinygrail.tinygrail.player import Player, ServerSentError
+
+CHARACTER = {
+    "CharacterId": 1, "Change": 0, "UserTotal": 10, "UserAmount": 2, "AirDate": "2019-08-08T00:00:00",
+    "Asks": 1, "Bids": 2, "Bonus": 0, "Current": 12.5, "Fluctuation": 0.1, "Icon": "i", "Id": 1,
+    "LastDeal": "2020-01-01T12:00:00+08:00", "LastModifier": 0, "LastOrder": "2020-01-01T12:00:00Z",
+    "Level": 1, "MarketValue": 100, "Name": "n", "Price": 10, "Rate": 1.5, "Sacrifices": 0, "State": 3,
+    "SubjectId": None, "Total": 10000, "Type": 0,
+}
+ICO = {
+    "AirDate": "2019-08-08T00:00:00", "Begin": "2020-01-01T00:00:00", "Bonus": 0, "CharacterId": 2,
+    "End": "2020-01-08T00:00:00", "Icon": "i", "Id": 7, "Last": "2020-01-01T00:00:00", "Name": "ico",
+    "State": 0, "SubjectName": "s", "Total": 1000, "Type": 0, "Users": 3,
+}
+
+
+class TestTrustedConstruct:
+    @pytest.mark.parametrize('model, data', [
+        (RHolding, {"State": 0, "Value": {"TotalItems": 1, "Items": [CHARACTER]}}),
+        (RCharacterList, {"State": 0, "Value": [CHARACTER, ICO]}),
+        (RDepth, {"State": 0, "Value": {"Asks": [{"Price": 1, "Amount": 2}], "Bids": []}}),
+        (RScratchBonus, {"State": 0, "Value": None, "Message": "over"}),
+    ])
+    def test_equals_validated(self, model, data):
+        trusted = trusted_construct(model, data)
+        assert trusted == model(**data)
+        assert trusted.__fields_set__ == model(**data).__fields_set__
+
+    def test_union_picks_first_fitting(self):
+        result = trusted_construct(RCharacterList, {"State": 0, "Value": [ICO, CHARACTER]})
+        assert isinstance(result.value[0], TICO)
+        assert isinstance(result.value[1], TCharacter)
+
+    def test_missing_required(self):
+        with pytest.raises(UntrustedData):
+            trusted_construct(RDepth, {"State": 0, "Value": {"Asks": []}})
+
+    def test_wrong_type(self):
+        with pytest.raises(UntrustedData):
+            trusted_construct(RDepth, {"State": 0, "Value": {"Asks": [{"Price": "1", "Amount": 2}], "Bids": []}})
+
+    def test_validators_not_trusted(self):
+        with pytest.raises(UntrustedData):
+            trusted_construct(RTopWeek, {"State": 0, "Value": []})
+
+
+class TestPlayerTrusted:
+    @staticmethod
+    def _response(data):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = json.dumps(data).encode()
+        return response
+
+    def test_fast_path(self):
+        data = {"State": 0, "Value": {"TotalItems": 1, "Items": [CHARACTER]}}
+        result = Player('')._process_response(self._response(data), as_model=RHolding, trusted=True)
+        assert result == RHolding(**data)
+
+    def test_falls_back_to_error_message(self):
+        with pytest.raises(ServerSentError):
+            Player('')._process_response(self._response({"State": 1, "Message": "oops"}),
+                                         as_model=RHolding, trusted=True)
+
+    def test_falls_back_on_nan(self):
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{"State": 0, "Value": {"Asks": [{"Price": NaN, "Amount": 1}], "Bids": []}}'
+        result = Player('')._process_response(response, as_model=RDepth, trusted=True)
+        assert result.value.asks[0].amount == 1
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import threading
+import time
+
+from bgmtinygrail.tinygrail.aio_api import iter_spoil_holders
+from bgmtinygrail.tinygrail.api import all_holders, spoil_holders
+from bgmtinygrail.tinygrail.cassette import Interaction, OfflineTinygrail
+from bgmtinygrail.tinygrail.paginate import paginate, aio_paginate
+from bgmtinygrail.tinygrail.player import Player
+
+
+class PagedSource:
+    def __init__(self, total, delay=0.0):
+        self.total = total
+        self.delay = delay
+        self.calls = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def page(self, page, page_size):
+        self.calls.append((page, page_size))
+        return self.total, list(range((page - 1) * page_size, min(page * page_size, self.total)))
+
+    def __call__(self, page, page_size):
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay * (page % 3))  # out of order completion
+        with self._lock:
+            self.in_flight -= 1
+        return self.page(page, page_size)
+
+
+class TestPaginate:
+    def test_in_order(self):
+        source = PagedSource(95, delay=0.01)
+        assert list(paginate(source, page_size=10, window=3)) == list(range(95))
+        assert sorted(source.calls) == [(page, 10) for page in range(1, 11)]
+        assert source.max_in_flight <= 3
+
+    def test_single_page(self):
+        source = PagedSource(3)
+        assert list(paginate(source, page_size=10)) == [0, 1, 2]
+        assert source.calls == [(1, 10)]
+
+    def test_empty(self):
+        assert list(paginate(PagedSource(0), page_size=10)) == []
+
+    def test_stream_stops_early(self):
+        source = PagedSource(1000)
+        items = paginate(source, page_size=10, window=2)
+        assert [next(items) for _ in range(15)] == list(range(15))
+        items.close()
+        assert len(source.calls) <= 4
+
+    def test_aio_in_order(self):
+        source = PagedSource(95)
+
+        async def fetch(page, page_size):
+            await asyncio.sleep(0.01 * (page % 3))
+            return source.page(page, page_size)
+
+        async def collect():
+            return [item async for item in aio_paginate(fetch, page_size=10, window=3)]
+
+        assert asyncio.run(collect()) == list(range(95))
+
+
+class TestPagedApi:
+    def test_all_holders(self, mocker):
+        mocker.patch('bgmtinygrail.tinygrail.paginate.PAGE_SIZE', 2)
+        holders = [{"Name": f"u{i}", "Nickname": f"n{i}", "Balance": i, "LastActiveDate": "2020-01-01T00:00:00",
+                    "Avatar": "", "Id": i} for i in range(5)]
+
+        def page(n):
+            return json.dumps({"State": 0, "Value": {"TotalItems": 5, "CurrentPage": n, "TotalPages": 3,
+                                                     "ItemsPerPage": 2, "Items": holders[2 * n - 2:2 * n]}})
+
+        offline = OfflineTinygrail([Interaction('GET', f"chara/users/7/{n}/2", None, 200, page(n))
+                                    for n in (1, 2, 3)])
+        result = all_holders(Player('', cassette=offline), 7)
+        assert [h.name for h in result] == [f"u{i}" for i in range(5)]
+
+
+class TestSpoilHolders:
+    @staticmethod
+    def _offline():
+        holders = [{"Name": f"u{i}", "Nickname": f"n{i}", "Balance": i, "LastActiveDate": "2020-01-01T00:00:00",
+                    "Avatar": "", "Id": i} for i in range(6)]
+        interactions = [Interaction('GET', "chara/users/7/1/200", None, 200, json.dumps(
+            {"State": 0, "Value": {"TotalItems": 6, "CurrentPage": 1, "TotalPages": 1, "ItemsPerPage": 200,
+                                   "Items": holders}}))]
+        for i in range(6):
+            if i == 3:
+                content = {"State": 1, "Message": "hidden"}
+            else:
+                content = {"State": 0, "Value": {"State": 1, "Amount": i, "Bonus": 0, "CharacterId": 7, "Icon": None,
+                                                 "Id": i, "Price": 1, "Sacrifices": 0, "Total": i, "UserId": i}}
+            interactions.append(Interaction('GET', f"chara/user/7/u{i}/false", None, 200, json.dumps(content)))
+        return OfflineTinygrail(interactions)
+
+    def test_skips_refused_and_keeps_order(self):
+        result = spoil_holders(Player('', cassette=self._offline()), 7, concurrency=2)
+        assert [(muc.amount, holder.name) for muc, holder in result] == [(i, f"u{i}") for i in (0, 1, 2, 4, 5)]
+
+    def test_aio_streams(self):
+        player = Player('', cassette=self._offline())
+
+        async def fake_aio_get_data(url, as_model=None, **kwargs):
+            return player.get_data(url, as_model=as_model)
+
+        player.aio_get_data = fake_aio_get_data
+
+        async def collect():
+            return sorted([holder.name async for _, holder in iter_spoil_holders(player, 7, concurrency=2)])
+
+        assert asyncio.run(collect()) == ["u0", "u1", "u2", "u4", "u5"]
@@ -0,0 +1,143 @@
+import threading
+import time
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+from requests.exceptions import ReadTimeout
+
+from bgmtinygrail.tinygrail.model import RDepth
+from bgmtinygrail.tinygrail.player import Player, ServerNotReachable
+from bgmtinygrail.tinygrail.single_flight import SingleFlight
+from bgmtinygrail.tinygrail.transport import Transport
+
+
+def make_response(status_code=200, content=b'{"State": 0, "Value": {"Asks": [], "Bids": []}}'):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = content
+    return response
+
+
+@pytest.fixture
+def no_sleep(mocker: MockerFixture):
+    return mocker.patch('bgmtinygrail.tinygrail.transport.sleep')
+
+
+class TestTransport:
+    def test_backoff(self):
+        transport = Transport(backoff_factor=0.5, backoff_max=3)
+        assert [transport.backoff(i) for i in range(4)] == [0.5, 1, 2, 3]
+
+    def test_shared_pool(self):
+        transport = Transport(pool_maxsize=3)
+        a = Player('a', transport=transport).session
+        b = Player('b', transport=transport).session
+        assert a.get_adapter('https://tinygrail.com/api/') is b.get_adapter('https://tinygrail.com/api/')
+        assert transport.adapter._pool_maxsize == 3
+
+    def test_separate_timeouts(self, mocker: MockerFixture):
+        player = Player('', transport=Transport(connect_timeout=2, read_timeout=7))
+        mocked = mocker.patch.object(player.session, 'request', return_value=make_response())
+        player.get_data('chara/depth/1', as_model=RDepth)
+        assert mocked.call_args.kwargs['timeout'] == (2, 7)
+
+
+class TestRetry:
+    def test_get_retries_server_not_reachable(self, mocker: MockerFixture, no_sleep):
+        player = Player('', transport=Transport(retries=3))
+        mocked = mocker.patch.object(player.session, 'request',
+                                     side_effect=[make_response(502), ReadTimeout(), make_response()])
+        assert player.get_data('chara/depth/1', as_model=RDepth).value.asks == []
+        assert mocked.call_count == 3
+        assert [c.args[0] for c in no_sleep.call_args_list] == [0.5, 1]
+
+    def test_get_gives_up(self, mocker: MockerFixture, no_sleep):
+        player = Player('', transport=Transport(retries=2))
+        mocked = mocker.patch.object(player.session, 'request', return_value=make_response(503))
+        with pytest.raises(ServerNotReachable):
+            player.get_data('chara/depth/1', as_model=RDepth)
+        assert mocked.call_count == 3
+
+    def test_post_not_retried(self, mocker: MockerFixture, no_sleep):
+        player = Player('', transport=Transport(retries=3))
+        mocked = mocker.patch.object(player.session, 'request', return_value=make_response(502))
+        with pytest.raises(ServerNotReachable):
+            player.post_data('chara/bid/1/10/10')
+        assert mocked.call_count == 1
+        no_sleep.assert_not_called()
+
+
+class TestSingleFlight:
+    @staticmethod
+    def _concurrently(*functions):
+        results = [None] * len(functions)
+
+        def run(i):
+            results[i] = functions[i]()
+
+        threads = [threading.Thread(target=run, args=(i,)) for i in range(len(functions))]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    @staticmethod
+    def _slow_response(*args, **kwargs):
+        time.sleep(0.1)
+        return make_response()
+
+    def test_coalesces_public_across_players(self, mocker: MockerFixture):
+        single_flight = SingleFlight()
+        a = Player('a', single_flight=single_flight)
+        b = Player('b', single_flight=single_flight)
+        mocked_a = mocker.patch.object(a.session, 'request', side_effect=self._slow_response)
+        mocked_b = mocker.patch.object(b.session, 'request', side_effect=self._slow_response)
+        ra, rb = self._concurrently(lambda: a.get_data('chara/depth/1', as_model=RDepth),
+                                    lambda: b.get_data('chara/depth/1', as_model=RDepth))
+        assert ra is rb
+        assert mocked_a.call_count + mocked_b.call_count == 1
+
+    def test_keeps_private_apart(self, mocker: MockerFixture):
+        single_flight = SingleFlight()
+        a = Player('a', single_flight=single_flight)
+        b = Player('b', single_flight=single_flight)
+        mocked_a = mocker.patch.object(a.session, 'request', side_effect=self._slow_response)
+        mocked_b = mocker.patch.object(b.session, 'request', side_effect=self._slow_response)
+        self._concurrently(lambda: a.get_data('chara/user/1'), lambda: b.get_data('chara/user/1'))
+        assert mocked_a.call_count == mocked_b.call_count == 1
+
+    def test_fresh_does_not_join(self, mocker: MockerFixture):
+        single_flight = SingleFlight()
+        a = Player('a', single_flight=single_flight)
+        b = Player('b', single_flight=single_flight)
+        mocked_a = mocker.patch.object(a.session, 'request', side_effect=self._slow_response)
+        mocked_b = mocker.patch.object(b.session, 'request', side_effect=self._slow_response)
+
+        def after_own_order():
+            # a's request is in flight by now, it started before the order
+            time.sleep(0.05)
+            return b.get_data('chara/depth/1', as_model=RDepth, fresh=True)
+
+        ra, rb = self._concurrently(lambda: a.get_data('chara/depth/1', as_model=RDepth), after_own_order)
+        assert ra is not rb
+        assert mocked_a.call_count == mocked_b.call_count == 1
+
+    def test_shares_errors(self, mocker: MockerFixture):
+        single_flight = SingleFlight()
+        calls = []
+
+        def fail():
+            calls.append(1)
+            time.sleep(0.1)
+            raise ServerNotReachable(502)
+
+        def call():
+            try:
+                single_flight.do('key', fail)
+            except ServerNotReachable as e:
+                return e.status_code
+
+        assert self._concurrently(call, call) == [502, 502]
+        assert len(calls) == 1
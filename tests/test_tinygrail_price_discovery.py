@@ -0,0 +1,59 @@
+import pytest
+
+from bgmtinygrail.tinygrail import bigc as bigc_module
+from bgmtinygrail.tinygrail.bigc import BigC
+from bgmtinygrail.tinygrail.model import TAsk, TBid
+from bgmtinygrail.tinygrail.player import Player
+from bgmtinygrail.tinygrail.price_discovery import *
+
+
+@pytest.fixture
+def big_c(offline_market):
+    user = {"Bids": [], "Asks": [], "AskHistory": [], "BidHistory": [], "Amount": 5}
+    return BigC(Player('', cassette=offline_market(user)), 1)
+
+
+class TestFill:
+    def test_sell_fill(self):
+        bids = [TBid(Price=8, Amount=2), TBid(Price=12, Amount=1), TBid(Price=3, Amount=9)]
+        assert sell_fill(bids, 2, 5) == Fill(8, 2)
+        assert sell_fill(bids, 5, 5) == Fill(8, 3)
+        assert sell_fill(bids, 5, 20) == Fill(20, 0)
+
+    def test_buy_fill(self):
+        asks = [TAsk(Price=8, Amount=2), TAsk(Price=12, Amount=1)]
+        assert buy_fill(asks, 10) == Fill(10, 2)
+
+
+class TestFastSell:
+    def test_one_ask(self, big_c, mocker):
+        spy = mocker.spy(bigc_module, 'create_ask')
+        assert fast_sell(big_c, 5, 5, 100) == 0
+        assert spy.call_count == 1
+        assert big_c.amount == 0 and big_c.my_asks == []
+
+    def test_nothing_above_low(self, big_c, mocker):
+        spy = mocker.spy(bigc_module, 'create_ask')
+        assert fast_sell(big_c, 5, 9, 100) == 5
+        assert spy.call_count == 0
+
+
+class TestFastBuy:
+    def test_one_bid(self, big_c, mocker):
+        spy = mocker.spy(bigc_module, 'create_bid')
+        fast_buy(big_c, 25)
+        assert spy.call_count == 1
+        assert big_c.amount == 8
+        assert [(bid.price, bid.amount) for bid in big_c.my_bids] == [(25, 100)]
+
+    def test_hidden_asks_probe(self, big_c, mocker):
+        big_c.all_asks
+        big_c.player.cassette._depth(1)["Asks"].append({"Price": 19, "Amount": 500})
+        spy = mocker.spy(bigc_module, 'create_bid')
+        fast_buy(big_c, 25)
+        # 3 shown and 500 hidden: the bid of 3 + 100 and the probe of 206 fill, the probe of 412 buys the rest
+        shown, hidden = 3, 500
+        rest = shown + hidden - 103 - 206
+        assert spy.call_count == 3
+        assert big_c.amount == 5 + shown + hidden
+        assert big_c.my_bids[0].amount == 412 - rest
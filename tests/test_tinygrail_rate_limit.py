@@ -0,0 +1,73 @@
+import threading
+import time
+
+import pytest
+import requests
+from pytest_mock import MockerFixture
+
+from bgmtinygrail.tinygrail.player import Player
+from bgmtinygrail.tinygrail.rate_limit import Priority, TokenBucket, configure_host, host_bucket
+
+
+class TestTokenBucket:
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            TokenBucket(0, 1)
+        with pytest.raises(ValueError):
+            TokenBucket(1, 0)
+
+    def test_burst_then_rate(self):
+        bucket = TokenBucket(50, 5)
+        start = time.monotonic()
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start < 0.05
+        for _ in range(5):
+            bucket.acquire()
+        assert time.monotonic() - start >= 5 / 50 * 0.9
+
+    def test_write_before_background(self):
+        bucket = TokenBucket(20, 1)
+        bucket.acquire()
+        order = []
+
+        def take(priority):
+            bucket.acquire(priority)
+            order.append(priority)
+
+        background = threading.Thread(target=take, args=(Priority.BACKGROUND,))
+        background.start()
+        time.sleep(0.01)
+        write = threading.Thread(target=take, args=(Priority.WRITE,))
+        write.start()
+        background.join()
+        write.join()
+        assert order == [Priority.WRITE, Priority.BACKGROUND]
+
+
+class TestHostBucket:
+    def test_shared_per_host(self):
+        configure_host('example.test', 5, 2)
+        a = host_bucket('https://example.test/api/chara/1')
+        b = host_bucket('https://example.test/api/chara/2')
+        assert a is b
+        assert (a.rate, a.burst) == (5, 2)
+
+    def test_unlimited(self):
+        configure_host('unlimited.test', None)
+        assert host_bucket('https://unlimited.test/api/') is None
+
+    def test_player_acquires_account_and_host(self, mocker: MockerFixture):
+
+        configure_host('limited.test', 100, 10)
+        account = TokenBucket(100, 10)
+        player = Player('', api_host='https://limited.test/api/', rate_limit=account)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = b'{}'
+        mocker.patch.object(player.session, 'request', return_value=response)
+        spy_account = mocker.spy(account, 'acquire')
+        spy_host = mocker.spy(host_bucket('https://limited.test/'), 'acquire')
+        player.post_data('chara/bid/1/1/1')
+        spy_account.assert_called_once_with(Priority.WRITE)
+        spy_host.assert_called_once_with(Priority.WRITE)
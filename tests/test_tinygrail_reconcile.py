@@ -0,0 +1,59 @@
+import threading
+
+import pytest
+
+from bgmtinygrail.tinygrail.model import TAsk, TBid
+from bgmtinygrail.tinygrail.reconcile import *
+
+
+def bid(price, amount, oid=None):
+    return TBid(Price=price, Amount=amount, Id=oid)
+
+
+class TestPlan:
+    def test_keeps_matching(self):
+        ops, kept = plan([bid(10, 5, 1), bid(12, 1, 2)], [bid(10, 5)])
+        assert ops == [Op('cancel', bid(12, 1, 2))]
+        assert kept == 1
+
+    def test_tops_up_level(self):
+        ops, kept = plan([bid(10, 3, 1), bid(10, 2, 2)], [bid(10, 9)])
+        assert [(op.kind, op.order.price, op.order.amount) for op in ops] == [('create', 10, 4)]
+        assert kept == 2
+
+    def test_shrinks_level(self):
+        ops, kept = plan([bid(10, 3, 1), bid(10, 2, 2)], [bid(10, 4)])
+        assert [(op.kind, op.order.amount) for op in ops] == [('cancel', 2), ('create', 1)]
+        assert kept == 1
+
+    def test_model(self):
+        ops, _ = plan([], [TAsk(Price=10, Amount=1, Type=1)], TAsk)
+        assert isinstance(ops[0].order, TAsk) and ops[0].order.type == 1
+
+
+class TestReconcile:
+    @pytest.fixture
+    def big_c(self, mocker):
+        big_c = mocker.Mock(character=1, my_bids=[bid(8, 1, 1), bid(9, 1, 2), bid(10, 1, 3)])
+        big_c.calls = []
+        barrier = threading.Barrier(3, timeout=5)
+
+        def cancel(order):
+            barrier.wait()  # all three cancels are in flight together
+            big_c.calls.append(('cancel', order.id))
+
+        big_c.cancel_bid.side_effect = cancel
+        big_c.create_bid.side_effect = lambda order: big_c.calls.append(('create', order.price))
+        return big_c
+
+    def test_cancels_then_creates(self, big_c):
+        result = reconcile(big_c, 'bids', [bid(11, 1), bid(12, 1)])
+        assert sorted(big_c.calls[:3]) == [('cancel', 1), ('cancel', 2), ('cancel', 3)]
+        assert sorted(big_c.calls[3:]) == [('create', 11), ('create', 12)]
+        assert len(result.ops) == 5 and result.kept == 0 and result.seconds >= 0
+
+    def test_error_raised_after_phase(self, big_c):
+        big_c.create_bid.side_effect = [None, ValueError("no money")]
+        with pytest.raises(ValueError):
+            reconcile(big_c, 'bids', [bid(11, 1), bid(12, 1)])
+        assert big_c.create_bid.call_count == 2